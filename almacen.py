@@ -0,0 +1,217 @@
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+from cambios import cambios_desde, version_actual
+from modelo_riesgo import categoria_riesgo
+
+# --- Almacén Columnar en Memoria para Análisis ---
+# Carga solo las columnas que usan los gráficos, sin descripcion ni textos libres:
+#   * estado_conservacion y tendencia_poblacion como Categorical (códigos int8)
+#   * poblacion_estimada como entero con nulos (Int32, o Int64 si no cabe)
+#   * riesgo (puntuación guardada del modelo, ver modelo_riesgo.py) como float32 con NaN
+#   * países y amenazas como pares (fila, código) en arrays int32/int16; los códigos
+#     son los ids de las tablas normalizadas, con su diccionario de nombres aparte
+# Un millón de especies ocupa unas decenas de MB, frente a cientos de MB de un
+# DataFrame con todas las columnas como objetos de Python (ver benchmark.py).
+# Los conteos se hacen con bincount sobre los códigos, con filtro por países opcional.
+# El almacén guarda la versión de los datos con que se cargó (ver cambios.py); actualizar()
+# aplica solo las especies cambiadas desde entonces, sin volver a leer la tabla completa.
+
+TAMANO_LOTE_ALMACEN = 200000
+# Si cambió más de esta fracción de las especies, sale más a cuenta recargar todo
+FRACCION_RECARGA = 0.1
+
+
+def _unir_categoricas(partes):
+    # Une las categóricas de cada lote (cada una con sus propias categorías) en una sola
+    categorias = sorted(set().union(*(parte.categories for parte in partes)))
+    codigos = [parte.set_categories(categorias).codes for parte in partes]
+    return pd.Categorical.from_codes(np.concatenate(codigos) if codigos else np.array([], dtype=np.int8),
+                                     categories=pd.Index(categorias, dtype=object))
+
+
+def _entero_con_nulos(valores):
+    # Int32 si los valores caben; si no, Int64
+    maximo = valores.max() if valores.notna().any() else 0
+    return valores.astype('Int32' if maximo < 2 ** 31 else 'Int64')
+
+
+def _enlaces(conn, tabla, columna, ids):
+    # (fila en el almacén, código) de cada enlace especie-país o especie-amenaza. Se leen
+    # directamente a un array de enteros, sin pasar por un DataFrame intermedio.
+    enlaces = np.fromiter(chain.from_iterable(conn.execute(f'SELECT especie_id, {columna} FROM {tabla}')),
+                          dtype=np.int64).reshape(-1, 2)
+    fila = np.minimum(np.searchsorted(ids, enlaces[:, 0]), max(len(ids) - 1, 0))
+    # Enlaces de especies que ya no existen (si se borró alguna sin cascada) se descartan
+    validos = ids[fila] == enlaces[:, 0] if len(ids) else np.zeros(len(fila), dtype=bool)
+    fila, codigo = fila[validos].astype(np.int32), enlaces[validos, 1]
+    return fila, _codigos(codigo)
+
+
+def _codigos(codigo):
+    return codigo.astype(np.int16 if len(codigo) == 0 or codigo.max() < 2 ** 15 else np.int32)
+
+
+def _enlaces_de(conn, tabla, columna, especie_ids):
+    # (especie_id, código) de los enlaces de las especies indicadas, 500 ids por consulta
+    enlaces = []
+    for i in range(0, len(especie_ids), 500):
+        tramo = especie_ids[i:i + 500]
+        marcadores = ", ".join("?" for _ in tramo)
+        enlaces.extend(conn.execute(f'SELECT especie_id, {columna} FROM {tabla} WHERE especie_id IN ({marcadores})',
+                                    tramo).fetchall())
+    return np.array(enlaces, dtype=np.int64).reshape(-1, 2)
+
+
+class AlmacenEspecies:
+    def __init__(self, ids, estado, tendencia, poblacion, riesgo, pais_fila, pais_codigo, paises,
+                 amenaza_fila, amenaza_codigo, amenazas, version=0):
+        self.version = version
+        self.ids = ids
+        self.estado = estado
+        self.tendencia = tendencia
+        self.poblacion = poblacion
+        self.riesgo = riesgo
+        self.pais_fila, self.pais_codigo, self.paises = pais_fila, pais_codigo, paises
+        self.amenaza_fila, self.amenaza_codigo, self.amenazas = amenaza_fila, amenaza_codigo, amenazas
+
+    @classmethod
+    def cargar(cls, conn, tamano_lote=TAMANO_LOTE_ALMACEN):
+        # Lee por lotes y convierte cada lote a códigos enseguida: los textos de un lote
+        # son lo único que llega a existir como objetos de Python. La versión se lee antes que
+        # las filas: si alguien escribe entre medias, actualizar() vuelve a aplicar ese cambio.
+        version = version_actual(conn)
+        partes = []
+        for lote in pd.read_sql_query('SELECT id, estado_conservacion, tendencia_poblacion, poblacion_estimada, riesgo '
+                                      'FROM especies WHERE borrado IS NULL ORDER BY id', conn, chunksize=tamano_lote):
+            partes.append((lote['id'].to_numpy(dtype=np.int64),
+                           pd.Categorical(lote['estado_conservacion']),
+                           pd.Categorical(lote['tendencia_poblacion']),
+                           pd.to_numeric(lote['poblacion_estimada'], errors='coerce').astype('Int64'),
+                           pd.to_numeric(lote['riesgo'], errors='coerce').to_numpy(dtype=np.float32)))
+        ids = np.concatenate([p[0] for p in partes]) if partes else np.array([], dtype=np.int64)
+        estado = _unir_categoricas([p[1] for p in partes])
+        tendencia = _unir_categoricas([p[2] for p in partes])
+        poblacion = (_entero_con_nulos(pd.concat([p[3] for p in partes], ignore_index=True)).array if partes
+                     else pd.array([], dtype='Int32'))
+        riesgo = np.concatenate([p[4] for p in partes]) if partes else np.array([], dtype=np.float32)
+        # Ids de SQLite de menos de 2^31 (lo normal) ocupan la mitad
+        ids = ids.astype(np.int32) if len(ids) == 0 or ids.max() < 2 ** 31 else ids
+
+        pais_fila, pais_codigo = _enlaces(conn, 'especie_pais', 'pais_id', ids)
+        amenaza_fila, amenaza_codigo = _enlaces(conn, 'especie_amenaza', 'amenaza_id', ids)
+        paises = dict(conn.execute('SELECT id, nombre FROM paises').fetchall())
+        amenazas = dict(conn.execute('SELECT id, nombre FROM amenazas').fetchall())
+        return cls(ids, estado, tendencia, poblacion, riesgo, pais_fila, pais_codigo, paises,
+                   amenaza_fila, amenaza_codigo, amenazas, version)
+
+    def actualizar(self, conn):
+        # Devuelve un almacén nuevo con los cambios registrados después de self.version (este no se
+        # modifica: otra sesión puede estar leyéndolo). Las especies cambiadas se quitan y se vuelven
+        # a añadir con su estado actual, leyendo de la base solo sus enlaces con países y amenazas.
+        version, cambiadas = self.version, {}
+        while True:
+            version, filas = cambios_desde(conn, version)
+            if not filas:
+                break
+            for fila in filas:
+                cambiadas[fila['id']] = fila.get('especie')
+            if len(cambiadas) > max(len(self), 1000) * FRACCION_RECARGA:
+                return AlmacenEspecies.cargar(conn)
+        if not cambiadas:
+            return self
+        quedan = ~np.isin(self.ids, np.fromiter(cambiadas.keys(), dtype=np.int64))
+        nuevas = [cambiadas[i] for i in sorted(cambiadas) if cambiadas[i] is not None]
+        ids = np.concatenate([self.ids[quedan].astype(np.int64), np.array([e['id'] for e in nuevas], dtype=np.int64)])
+        orden = np.argsort(ids, kind='stable')
+        ids = ids[orden]
+
+        def columna(nombre):
+            return pd.Series([e[nombre] for e in nuevas], dtype=object)
+        estado = _unir_categoricas([self.estado[quedan], pd.Categorical(columna('estado_conservacion'))])[orden]
+        tendencia = _unir_categoricas([self.tendencia[quedan], pd.Categorical(columna('tendencia_poblacion'))])[orden]
+        poblacion = _entero_con_nulos(pd.concat([
+            pd.Series(self.poblacion[quedan], dtype='Int64'),
+            pd.to_numeric(columna('poblacion_estimada'), errors='coerce').astype('Int64')], ignore_index=True)).array[orden]
+        riesgo = np.concatenate([self.riesgo[quedan],
+                                 pd.to_numeric(columna('riesgo'), errors='coerce').to_numpy(dtype=np.float32)])[orden]
+        ids = ids.astype(np.int32) if len(ids) == 0 or ids.max() < 2 ** 31 else ids
+
+        def enlaces(fila, codigo, tabla, nombre):
+            # Los enlaces de las especies que siguen más los de las cambiadas, con su fila en el almacén nuevo
+            siguen = quedan[fila]
+            nuevos = _enlaces_de(conn, tabla, nombre, [e['id'] for e in nuevas])
+            especie = np.concatenate([self.ids[fila[siguen]].astype(np.int64), nuevos[:, 0]])
+            return (np.searchsorted(ids, especie).astype(np.int32),
+                    _codigos(np.concatenate([codigo[siguen].astype(np.int64), nuevos[:, 1]])))
+        pais_fila, pais_codigo = enlaces(self.pais_fila, self.pais_codigo, 'especie_pais', 'pais_id')
+        amenaza_fila, amenaza_codigo = enlaces(self.amenaza_fila, self.amenaza_codigo, 'especie_amenaza', 'amenaza_id')
+        paises = dict(conn.execute('SELECT id, nombre FROM paises').fetchall())
+        amenazas = dict(conn.execute('SELECT id, nombre FROM amenazas').fetchall())
+        return AlmacenEspecies(ids, estado, tendencia, poblacion, riesgo, pais_fila, pais_codigo, paises,
+                               amenaza_fila, amenaza_codigo, amenazas, version)
+
+    def __len__(self):
+        return len(self.ids)
+
+    # --- Memoria ---
+    def memoria(self):
+        # Bytes por columna (incluidos diccionarios de categorías y máscaras de nulos)
+        return {
+            'id': self.ids.nbytes,
+            'estado_conservacion': self.estado.nbytes,
+            'tendencia_poblacion': self.tendencia.nbytes,
+            'poblacion_estimada': self.poblacion.nbytes,
+            'riesgo': self.riesgo.nbytes,
+            'paises': self.pais_fila.nbytes + self.pais_codigo.nbytes,
+            'amenazas': self.amenaza_fila.nbytes + self.amenaza_codigo.nbytes,
+        }
+
+    # --- Filtros ---
+    def mascara_paises(self, paises=None):
+        # Filas con al menos uno de los países indicados (todas si no se indica ninguno)
+        if not paises:
+            return np.ones(len(self), dtype=bool)
+        codigos = [codigo for codigo, nombre in self.paises.items() if nombre in set(paises)]
+        mascara = np.zeros(len(self), dtype=bool)
+        mascara[self.pais_fila[np.isin(self.pais_codigo, codigos)]] = True
+        return mascara
+
+    # --- Agregados del dashboard (mismas columnas que las lecturas de resumenes.py) ---
+    def conteo_estados(self, mascara=None):
+        codigos = self.estado.codes if mascara is None else self.estado.codes[mascara]
+        n = np.bincount(codigos[codigos >= 0], minlength=len(self.estado.categories))
+        tabla = pd.DataFrame({'Estado de Conservación': self.estado.categories.astype(str), 'Número de Especies': n})
+        return (tabla[tabla['Número de Especies'] > 0]
+                .sort_values(['Número de Especies', 'Estado de Conservación'], ascending=[False, True])
+                .reset_index(drop=True))
+
+    def conteo_tendencia_estado(self, mascara=None):
+        tendencia = self.tendencia.codes if mascara is None else self.tendencia.codes[mascara]
+        estado = self.estado.codes if mascara is None else self.estado.codes[mascara]
+        validas = (tendencia >= 0) & (estado >= 0)
+        n_estados = len(self.estado.categories)
+        n = np.bincount(tendencia[validas].astype(np.int64) * n_estados + estado[validas],
+                        minlength=len(self.tendencia.categories) * n_estados)
+        t, e = np.divmod(np.nonzero(n)[0], n_estados)
+        return pd.DataFrame({'tendencia_poblacion': self.tendencia.categories.to_numpy(dtype=object)[t],
+                             'estado_conservacion': self.estado.categories.to_numpy(dtype=object)[e],
+                             'Count': n[n > 0]})
+
+    def top_amenazas(self, limite=5, mascara=None):
+        codigos = self.amenaza_codigo if mascara is None else self.amenaza_codigo[mascara[self.amenaza_fila]]
+        n = np.bincount(codigos)
+        codigo = np.nonzero(n)[0]
+        tabla = pd.DataFrame({'Amenaza': [self.amenazas.get(int(c)) for c in codigo], 'Frecuencia': n[codigo]})
+        return (tabla.sort_values(['Frecuencia', 'Amenaza'], ascending=[False, True])
+                .head(limite).reset_index(drop=True))
+
+    def conteo_riesgo(self, mascara=None):
+        # Riesgo futuro guardado por el modelo, agrupado como resumen_riesgo
+        riesgo = self.riesgo if mascara is None else self.riesgo[mascara]
+        tabla = pd.Series(categoria_riesgo(riesgo)).value_counts().rename_axis('Riesgo').reset_index(name='Número de Especies')
+        return (tabla[tabla['Número de Especies'] > 0]
+                .sort_values(['Número de Especies', 'Riesgo'], ascending=[False, True])
+                .reset_index(drop=True))
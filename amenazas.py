@@ -0,0 +1,149 @@
+import re
+import unicodedata
+
+# --- Taxonomía de Amenazas ---
+# Cada amenaza escrita a mano ("Caza ilegal", "caza furtiva", "Deforestación") se
+# normaliza (minúsculas, sin acentos) y se lleva a una clave canónica del catálogo.
+# Las claves se guardan una vez en la tabla 'amenazas' y cada especie se enlaza
+# por id en 'especie_amenaza', así que ni el clasificador ni el dashboard tienen
+# que volver a partir cadenas.
+
+# clave canónica -> (nombre para mostrar, grupo usado por el clasificador UICN)
+CATALOGO = {
+    "perdida de habitat": ("Pérdida de hábitat", None),
+    "fragmentacion de habitat": ("Fragmentación de hábitat", None),
+    "deforestacion": ("Deforestación", "deforestacion"),
+    "caza furtiva": ("Caza furtiva", "caza"),
+    "caza": ("Caza", "caza"),
+    "trafico ilegal": ("Tráfico ilegal", None),
+    "cambio climatico": ("Cambio climático", None),
+    "contaminacion": ("Contaminación", None),
+    "especies invasoras": ("Especies invasoras", None),
+    "agricultura": ("Agricultura", None),
+    "ganaderia": ("Ganadería", None),
+    "mineria": ("Minería", None),
+    "incendios": ("Incendios", None),
+    "urbanizacion": ("Urbanización", None),
+    "enfermedades": ("Enfermedades", None),
+    "represas": ("Represas", None),
+    "sobrepesca": ("Sobrepesca", None),
+    "pesca incidental": ("Pesca incidental", None),
+    "conflicto con humanos": ("Conflicto con humanos", None),
+    "turismo no regulado": ("Turismo no regulado", None),
+    "pesticidas": ("Pesticidas", None),
+}
+
+# variante normalizada -> clave canónica
+SINONIMOS = {
+    "caza ilegal": "caza furtiva",
+    "caceria": "caza furtiva",
+    "caceria ilegal": "caza furtiva",
+    "furtivismo": "caza furtiva",
+    "tala": "deforestacion",
+    "tala ilegal": "deforestacion",
+    "destruccion de habitat": "perdida de habitat",
+    "perdida del habitat": "perdida de habitat",
+    "degradacion de habitat": "perdida de habitat",
+    "fragmentacion": "fragmentacion de habitat",
+    "fragmentacion del habitat": "fragmentacion de habitat",
+    "comercio ilegal": "trafico ilegal",
+    "trafico de especies": "trafico ilegal",
+    "trafico de fauna": "trafico ilegal",
+    "calentamiento global": "cambio climatico",
+    "especies exoticas invasoras": "especies invasoras",
+    "incendios forestales": "incendios",
+    "redes de pesca": "pesca incidental",
+    "captura incidental": "pesca incidental",
+    "conflicto humano-fauna": "conflicto con humanos",
+    "conflicto con ganaderia": "conflicto con humanos",
+}
+
+_SEPARADORES = re.compile(r"[,;\n]")
+_ESPACIOS = re.compile(r"\s+")
+
+
+def normalizar_texto(texto):
+    # "  Pérdida de  Hábitat " -> "perdida de habitat"
+    sin_acentos = "".join(c for c in unicodedata.normalize("NFKD", texto.casefold())
+                          if not unicodedata.combining(c))
+    return _ESPACIOS.sub(" ", sin_acentos).strip()
+
+
+def clave_amenaza(texto):
+    clave = normalizar_texto(texto)
+    return SINONIMOS.get(clave, clave)
+
+
+def separar_amenazas(amenazas_str):
+    # "Caza ilegal, Deforestación" -> ["caza furtiva", "deforestacion"] (sin vacíos ni repetidos)
+    return [clave for clave, _ in _separar_con_original(amenazas_str)]
+
+
+def _separar_con_original(amenazas_str):
+    if not amenazas_str or not isinstance(amenazas_str, str):
+        return []
+    vistas = {}
+    for original in _SEPARADORES.split(amenazas_str):
+        original = original.strip()
+        clave = clave_amenaza(original) if original else ""
+        if clave and clave not in vistas:
+            vistas[clave] = original
+    return list(vistas.items())
+
+
+def nombre_amenaza(clave, original=None):
+    if clave in CATALOGO:
+        return CATALOGO[clave][0]
+    original = original or clave
+    return original[:1].upper() + original[1:]
+
+
+def grupo_amenaza(clave):
+    # Grupo para el clasificador: el del catálogo o, para amenazas nuevas, por contenido
+    if clave in CATALOGO:
+        return CATALOGO[clave][1]
+    if "caza" in clave:
+        return "caza"
+    if "deforestacion" in clave:
+        return "deforestacion"
+    return None
+
+
+def grupos_amenazas(amenazas_str):
+    return {grupo_amenaza(clave) for clave in separar_amenazas(amenazas_str)} - {None}
+
+
+# --- Persistencia (tablas 'amenazas' y 'especie_amenaza') ---
+def vincular_amenazas_lote(conn, pares):
+    # pares: iterable de (especie_id, amenazas_str). Los triggers de especie_amenaza actualizan resumen_amenaza.
+    enlaces = []
+    nuevas = {}
+    for especie_id, amenazas_str in pares:
+        for clave, original in _separar_con_original(amenazas_str):
+            enlaces.append((especie_id, clave))
+            nuevas.setdefault(clave, (clave, nombre_amenaza(clave, original), grupo_amenaza(clave)))
+    if not enlaces:
+        return
+    conn.executemany('INSERT OR IGNORE INTO amenazas (clave, nombre, grupo) VALUES (?, ?, ?)', nuevas.values())
+    conn.executemany('''
+        INSERT OR IGNORE INTO especie_amenaza (especie_id, amenaza_id)
+        SELECT ?, id FROM amenazas WHERE clave = ?
+    ''', enlaces)
+
+
+def vincular_amenazas(conn, especie_id, amenazas_str):
+    vincular_amenazas_lote(conn, [(especie_id, amenazas_str)])
+
+
+def especies_con_grupo(conn, grupo, desde_id=None, hasta_id=None):
+    # Ids de especies con alguna amenaza del grupo, resuelto con los índices de especie_amenaza
+    sql = '''
+        SELECT DISTINCT ea.especie_id FROM amenazas a
+        JOIN especie_amenaza ea ON ea.amenaza_id = a.id
+        WHERE a.grupo = ?
+    '''
+    params = [grupo]
+    if desde_id is not None:
+        sql += ' AND ea.especie_id BETWEEN ? AND ?'
+        params.extend([desde_id, hasta_id])
+    return {fila[0] for fila in conn.execute(sql, params)}
@@ -1,31 +1,225 @@
 import streamlit as st
-import sqlite3
 import pandas as pd
 import plotly.express as px
-import numpy as np
-import io # Necesario para leer archivos subidos
+import json
+import os
+import threading
+import time
+from clasificacion import clasificar_uicn
+from crear_db import DB_PATH
+from cambios import borrar_especie, restaurar_especie
+from conexion import PoolConexiones, abrir_conexion, escribir, iniciar_instantanea, terminar_instantanea
+from paises import listar_paises
+from resumenes import leer_conteo_estados, leer_conteo_tendencia_estado, leer_top_amenazas, leer_conteo_riesgo
+from almacen import AlmacenEspecies
+from distribucion import distribucion_de, muestra_ocurrencias
+from duplicados import duplicados_de
+from importador import columnas_faltantes, guardar_especie
+from modelo_riesgo import cargar_modelo, puntuar_ids, ruta_modelo
+from consultas import ESTADOS_CONSERVACION, OPCIONES_ORDEN, contar_especies, obtener_pagina_especies
+from exportador import FORMATOS, archivo_exportacion, parquet_disponible
+from metricas import (ConexionMedida, atribuir_a, consultas_lentas, cronometrado, iniciar_pagina, latencias,
+                      leer_metricas, medir, plan_consulta, sin_medir, terminar_pagina)
+from trabajos import DIR_CARGAS, cancelar, encolar, hay_trabajos_activos, lanzar_trabajador, listar_trabajos, reanudar
 
 # --- Funciones de Conexión a la Base de Datos ---
-def get_db_connection():
-    conn = sqlite3.connect('animalitos.db')
-    conn.row_factory = sqlite3.Row
-    return conn
-
-# --- Lógica de IA Simplificada (Clasificación Automática UICN) ---
-# Esto simula un algoritmo basado en reglas para la clasificación UICN
-def clasificar_uicn(poblacion, tendencia, amenazas_str, paises_str):
-    # Reglas simplificadas (¡Un modelo real de la UICN es mucho más complejo!)
-    if poblacion is None: # Manejar caso donde poblacion es nula
-        poblacion = 0
-    if poblacion < 500 and "caza" in amenazas_str.lower() and tendencia == "Decreciendo":
-        return "En Peligro Crítico (Sugerido)"
-    elif poblacion < 2500 and tendencia == "Decreciendo":
-        return "En Peligro (Sugerido)"
-    elif poblacion < 10000 and "deforestacion" in amenazas_str.lower():
-        return "Vulnerable (Sugerido)"
-    else:
-        return "Preocupación Menor (Sugerido)"
+@st.cache_resource
+def obtener_pool():
+    # Un único pool por proceso, compartido por todas las sesiones y reruns.
+    # Las consultas de estas conexiones se cronometran (ver metricas.py)
+    return PoolConexiones(DB_PATH, factory=ConexionMedida)
 
+def get_db_connection():
+    # Uso: with get_db_connection() as conn: ...
+    return obtener_pool().conexion()
+
+def conexion_lectura():
+    # Conexión de solo lectura de cada sesión, fuera del pool: guarda la instantánea de la
+    # ejecución actual de la página (ver más abajo iniciar_instantanea)
+    if "conexion_lectura" not in st.session_state:
+        obtener_pool() # Esquema y migraciones antes de la primera lectura
+        conn = abrir_conexion(DB_PATH, check_same_thread=False, factory=ConexionMedida)
+        conn.execute('PRAGMA query_only = ON')
+        st.session_state["conexion_lectura"] = conn
+    return st.session_state["conexion_lectura"]
+
+# --- Lecturas Cacheadas ---
+# Todas las lecturas de una ejecución de la página usan la misma instantánea (_conn), así que
+# ven los mismos datos aunque otra sesión escriba entre medias. Se guardan con st.cache_data
+# según sus parámetros y la versión de los datos de esa instantánea (ver cambios.py): un cambio
+# en las especies hecho desde otra sesión o proceso cambia la versión y no sirve resultados viejos.
+# Las rutas de escritura llaman además a invalidar_cache(); el TTL cubre lo que no pasa por
+# el registro de cambios (p. ej. censos u ocurrencias importados desde la línea de comandos).
+CACHE_TTL = 300
+
+@st.cache_data(ttl=CACHE_TTL)
+@cronometrado('dataframe')
+def leer_paises(_conn, version):
+    return listar_paises(_conn)
+
+@st.cache_data(ttl=CACHE_TTL)
+@cronometrado('dataframe')
+def leer_hay_especies(_conn, version):
+    return _conn.execute('SELECT 1 FROM especies WHERE borrado IS NULL LIMIT 1').fetchone() is not None
+
+@st.cache_data(ttl=CACHE_TTL)
+@cronometrado('dataframe')
+def leer_total_filtrado(_conn, version, search_query, estado, paises, region=None):
+    return contar_especies(_conn, search_query, estado, list(paises), region)
+
+@st.cache_data(ttl=CACHE_TTL)
+@cronometrado('dataframe')
+def leer_pagina(_conn, version, search_query, estado, paises, sort_by, pagina, items_por_pagina, region=None):
+    filas = [dict(fila) for fila in obtener_pagina_especies(_conn, search_query, estado, list(paises), sort_by,
+                                                            pagina, items_por_pagina, region)]
+    ids = [fila['id'] for fila in filas]
+    duplicados = duplicados_de(_conn, ids)
+    distribucion = distribucion_de(_conn, ids)
+    for fila in filas:
+        fila['posibles_duplicados'] = duplicados.get(fila['id'], [])
+        fila['distribucion'] = distribucion.get(fila['id'])
+    return filas
+
+@st.cache_data(ttl=CACHE_TTL)
+@cronometrado('dataframe')
+def leer_muestra_region(_conn, version, region):
+    # Puntos de ocurrencia de la región para el mapa, leídos del índice R*Tree
+    return muestra_ocurrencias(_conn, region)
+
+@st.cache_data(ttl=CACHE_TTL)
+@cronometrado('dataframe')
+def leer_con_censos(_conn, version):
+    return _conn.execute('SELECT COUNT(*) FROM tendencias_censo').fetchone()[0]
+
+@st.cache_data(ttl=CACHE_TTL)
+@cronometrado('dataframe')
+def leer_modelo_riesgo():
+    # Modelo de riesgo guardado junto a la base (ver modelo_riesgo.py); None si no se ha entrenado
+    return cargar_modelo(ruta_modelo(DB_PATH))
+
+@st.cache_data(ttl=CACHE_TTL)
+@cronometrado('dataframe')
+def leer_resumenes_dashboard(_conn, version):
+    # Sin filtro por países los gráficos salen de las tablas resumen_* (unas pocas filas ya agregadas)
+    return (leer_conteo_estados(_conn), leer_conteo_tendencia_estado(_conn), leer_top_amenazas(_conn, 5),
+            leer_conteo_riesgo(_conn))
+
+# Columnas compactas para filtrar por países (ver almacen.py): un solo almacén por proceso,
+# compartido entre sesiones. Se carga entero la primera vez; después, cuando avanza la versión
+# de los datos, se le aplican solo las especies cambiadas desde la suya (AlmacenEspecies.actualizar),
+# así que una escritura no obliga a recargar la tabla completa.
+@st.cache_resource
+def almacen_compartido():
+    return {'almacen': None, 'cerrojo': threading.Lock()}
+
+@cronometrado('dataframe')
+def obtener_almacen(conn, version):
+    compartido = almacen_compartido()
+    with compartido['cerrojo']:
+        if compartido['almacen'] is None:
+            compartido['almacen'] = AlmacenEspecies.cargar(conn)
+        elif compartido['almacen'].version < version:
+            compartido['almacen'] = compartido['almacen'].actualizar(conn)
+        return compartido['almacen']
+
+_LECTURAS_CACHEADAS = [leer_paises, leer_hay_especies, leer_total_filtrado, leer_pagina, leer_muestra_region,
+                       leer_con_censos, leer_modelo_riesgo, leer_resumenes_dashboard]
+
+def invalidar_cache():
+    for lectura in _LECTURAS_CACHEADAS:
+        lectura.clear()
+
+# --- Exportación bajo demanda ---
+# st.download_button recibe una función: solo se ejecuta (en otro hilo) cuando se
+# pulsa el botón, así que dibujar la página no serializa nada. Las filas se
+# vuelcan del cursor por lotes a un archivo temporal; Streamlit necesita los bytes
+# completos para servir la descarga, así que se leen y el archivo se cierra (y se borra).
+def exportacion_diferida(formato, search_query, estado, paises, sort_by, region=None):
+    pool = obtener_pool()
+    def generar():
+        with atribuir_a("Explorar Especies"), medir('exportacion', formato) as m, pool.conexion() as conn, \
+                archivo_exportacion(conn, formato, search_query, estado, list(paises), sort_by, region) as archivo:
+            datos = archivo.read()
+            m['bytes'] = len(datos)
+        return datos
+    return generar
+
+# --- Trabajos en Segundo Plano ---
+# Importaciones, reclasificaciones y reconstrucciones se encolan en la tabla
+# 'trabajos' y las ejecuta trabajos.py en otro proceso; la app solo consulta su estado.
+@st.cache_resource
+def proceso_trabajador():
+    # Proceso trabajador lanzado por esta app (uno por proceso de Streamlit)
+    return {"proceso": None}
+
+def asegurar_trabajador():
+    estado = proceso_trabajador()
+    if estado["proceso"] is not None and estado["proceso"].poll() is None:
+        return
+    with get_db_connection() as conn:
+        if hay_trabajos_activos(conn):
+            estado["proceso"] = lanzar_trabajador(DB_PATH)
+
+def encolar_trabajo(tipo, parametros=None):
+    with get_db_connection() as conn:
+        trabajo_id = encolar(conn, tipo, parametros)
+    asegurar_trabajador()
+    return trabajo_id
+
+# --- Escrituras ---
+# Van por conexion.escribir: una transacción que toma el bloqueo de escritura desde el principio
+# y reintenta si otra sesión o el trabajador tienen la base ocupada
+def guardar_y_puntuar(conn, datos):
+    especie_id, creada, parecidas = guardar_especie(conn, datos)
+    modelo = cargar_modelo(ruta_modelo(DB_PATH)) # Sin caché: puede haberse entrenado en otro proceso
+    if modelo is not None:
+        puntuar_ids(conn, modelo, [especie_id])
+    return creada, parecidas
+
+def leer_archivo(ruta):
+    def generar():
+        with open(ruta, 'rb') as f:
+            return f.read()
+    return generar
+
+@st.fragment(run_every=2)
+def panel_trabajos():
+    with sin_medir(), get_db_connection() as conn: # Sondeo periódico: no cuenta en las métricas
+        trabajos = [dict(fila) for fila in listar_trabajos(conn, 5)]
+    if not trabajos:
+        return
+    asegurar_trabajador() # Relanza el trabajador si terminó y quedan trabajos pendientes
+    st.subheader("⏳ Trabajos")
+    vistos = st.session_state.setdefault("trabajos_terminados", set())
+    recien_terminados = False
+    for t in trabajos:
+        st.progress(t['progreso'], text=f"#{t['id']} {t['tipo']} · {t['estado']}")
+        if t['mensaje']:
+            st.caption(t['mensaje'])
+        if t['estado'] in ('pendiente', 'en_curso'):
+            if st.button("Cancelar", key=f"cancelar_{t['id']}"):
+                with get_db_connection() as conn:
+                    cancelar(conn, t['id'])
+        elif t['estado'] in ('fallido', 'cancelado'):
+            if st.button("Reanudar", key=f"reanudar_{t['id']}"):
+                with get_db_connection() as conn:
+                    reanudar(conn, t['id'])
+                asegurar_trabajador()
+        elif t['id'] not in vistos:
+            vistos.add(t['id'])
+            recien_terminados = True
+        resultado = json.loads(t['resultado']) if t['resultado'] else {}
+        if t['estado'] == 'completado' and resultado.get('motivos'):
+            st.caption("Filas omitidas por motivo: " + ", ".join(f"{m} ({n})" for m, n in resultado['motivos'].items()))
+        ruta_rechazos = resultado.get('ruta_rechazos')
+        if t['estado'] == 'completado' and ruta_rechazos and os.path.exists(ruta_rechazos):
+            st.download_button("⬇️ Filas rechazadas", data=leer_archivo(ruta_rechazos), file_name="filas_rechazadas.csv",
+                               mime="text/csv", on_click="ignore", key=f"rechazos_{t['id']}")
+    if recien_terminados and st.session_state.get("trabajos_panel_iniciado"):
+        # Un trabajo acaba de terminar durante esta sesión: los datos cambiaron, se redibuja toda la página
+        invalidar_cache()
+        st.rerun()
+    st.session_state["trabajos_panel_iniciado"] = True
 
 # --- Configuración de la Página y Título ---
 st.set_page_config(layout="wide", page_title="BioGuard - Sistema de Clasificación de Especies")
@@ -34,334 +228,378 @@ st.markdown("Una herramienta avanzada para biólogos, conservacionistas y desarr
 
 # --- Barra lateral para Navegación ---
 st.sidebar.title("Menú Principal")
-page_selection = st.sidebar.radio("Navegar", ["Añadir Especie", "Explorar Especies", "Análisis y Predicción", "Cargar Datos (CSV)"])
-
-# --- Sección para Añadir una Nueva Especie ---
-if page_selection == "Añadir Especie":
-    st.header("➕ Registrar Nueva Especie y Clasificar")
-    with st.form("agregar_animal_form"):
-        col1, col2 = st.columns(2)
-        with col1:
-            nombre = st.text_input("Nombre Común:", key="add_nombre")
-            nombre_cientifico = st.text_input("Nombre Científico:", key="add_nombre_cientifico")
-            descripcion = st.text_area("Descripción de la Especie:", key="add_desc")
-            # --- CAMBIO AQUÍ: input de texto para múltiples países ---
-            paises_str = st.text_input("Países donde habita (separar por comas, ej: Perú, Ecuador, Brasil):", key="add_paises")
+paginas = ["Añadir Especie", "Explorar Especies", "Análisis y Predicción", "Cargar Datos (CSV)"]
+if st.query_params.get("admin") == "1":
+    paginas.append("Rendimiento") # Página oculta: se abre con ?admin=1 en la URL
+page_selection = st.sidebar.radio("Navegar", paginas)
+iniciar_pagina(page_selection)
+with st.sidebar:
+    panel_trabajos()
+# Instantánea de lectura de esta ejecución; se cierra al terminar la página, en el finally de abajo
+conn_lectura = conexion_lectura()
+version_datos = iniciar_instantanea(conn_lectura)
+
+try:
+    # --- Sección para Añadir una Nueva Especie ---
+    if page_selection == "Añadir Especie":
+        st.header("➕ Registrar Nueva Especie y Clasificar")
+        if "aviso_guardado" in st.session_state:
+            mensaje, parecidas = st.session_state.pop("aviso_guardado")
+            st.success(mensaje)
+            if parecidas:
+                st.warning("Posible duplicado de: " + ", ".join(parecidas))
+        with st.form("agregar_animal_form"):
+            col1, col2 = st.columns(2)
+            with col1:
+                nombre = st.text_input("Nombre Común:", key="add_nombre")
+                nombre_cientifico = st.text_input("Nombre Científico:", key="add_nombre_cientifico")
+                descripcion = st.text_area("Descripción de la Especie:", key="add_desc")
+                # --- CAMBIO AQUÍ: input de texto para múltiples países ---
+                paises_str = st.text_input("Países donde habita (separar por comas, ej: Perú, Ecuador, Brasil):", key="add_paises")
             
-        with col2:
-            st.subheader("Datos Ecológicos y de Conservación")
-            poblacion_estimada = st.number_input("Población Estimada (ej. 1000):", min_value=0, value=0, key="add_poblacion")
-            tendencia_poblacion_options = ["Decreciendo", "Estable", "Creciendo", "Desconocida"]
-            tendencia_poblacion = st.selectbox("Tendencia de la Población:", tendencia_poblacion_options, key="add_tendencia")
-            amenazas = st.text_area("Principales Amenazas (separar por comas):", key="add_amenazas")
+            with col2:
+                st.subheader("Datos Ecológicos y de Conservación")
+                poblacion_estimada = st.number_input("Población Estimada (ej. 1000):", min_value=0, value=0, key="add_poblacion")
+                tendencia_poblacion_options = ["Decreciendo", "Estable", "Creciendo", "Desconocida"]
+                tendencia_poblacion = st.selectbox("Tendencia de la Población:", tendencia_poblacion_options, key="add_tendencia")
+                amenazas = st.text_area("Principales Amenazas (separar por comas):", key="add_amenazas")
             
-            # Clasificación automática UICN
-            st.markdown("---")
-            st.markdown("**Sugerencia de Clasificación UICN (Automático):**")
-            # Pasamos la cadena de países al clasificador para una posible mejora de IA
-            estado_uicn_sugerido = clasificar_uicn(poblacion_estimada, tendencia_poblacion, amenazas, paises_str)
-            st.info(estado_uicn_sugerido)
+                # Clasificación automática UICN
+                st.markdown("---")
+                st.markdown("**Sugerencia de Clasificación UICN (Automático):**")
+                # Pasamos la cadena de países al clasificador para una posible mejora de IA
+                estado_uicn_sugerido, criterios_uicn = clasificar_uicn(poblacion_estimada, tendencia_poblacion, amenazas, paises_str, explicar=True)
+                st.info(estado_uicn_sugerido)
+                st.caption(f"Criterios: {criterios_uicn}")
             
-            estado_conservacion_options = ["En Peligro Crítico", "En Peligro", "Vulnerable", "Casi Amenazado", "Preocupación Menor", "Datos Insuficientes", "No Evaluado"]
-            estado_conservacion_manual = st.selectbox("Estado de Conservación (Manual - Según Criterios UICN):", estado_conservacion_options, key="add_estado_manual")
-
-        submitted = st.form_submit_button("Guardar Especie")
-
-        if submitted:
-            if nombre and estado_conservacion_manual:
-                conn = get_db_connection()
-                conn.execute('INSERT INTO especies (nombre, nombre_cientifico, descripcion, estado_conservacion, estado_sugerido_uicn, poblacion_estimada, tendencia_poblacion, amenazas, pais) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
-                             (nombre, nombre_cientifico, descripcion, estado_conservacion_manual, estado_uicn_sugerido, poblacion_estimada, tendencia_poblacion, amenazas, paises_str)) # Guardamos la cadena de países
-                conn.commit()
-                conn.close()
-                st.success(f"¡'{nombre}' ha sido registrado!")
-                st.rerun() # Recargar para ver el cambio
-            else:
-                st.error("Por favor, llena al menos el Nombre Común y el Estado de Conservación Manual.")
-
-# --- Sección de Exploración de Especies (Búsqueda, Filtros, Orden, Paginación) ---
-elif page_selection == "Explorar Especies":
-    st.header("🔎 Enciclopedia de Especies por Conservar")
-
-    col_filter1, col_filter2 = st.columns(2)
-    with col_filter1:
-        search_query = st.text_input("Buscar por Nombre Común o Científico:", "").lower()
-    with col_filter2:
-        estados_conservacion_filtro = ["Todos"] + ["En Peligro Crítico", "En Peligro", "Vulnerable", "Casi Amenazado", "Preocupación Menor", "Datos Insuficientes", "No Evaluado"]
-        selected_estado_filtro = st.selectbox("Filtrar por Estado:", estados_conservacion_filtro)
-    
-    # --- CAMBIO AQUÍ: multiselect para varios países ---
-    conn = get_db_connection()
-    # Obtenemos todos los países únicos que aparecen en la base de datos (incluso si están en una cadena)
-    all_paises_raw = conn.execute('SELECT DISTINCT pais FROM especies WHERE pais IS NOT NULL').fetchall()
-    conn.close()
-    
-    # Procesar la cadena de países para obtener una lista única de todos los países mencionados
-    unique_paises = set()
-    for row in all_paises_raw:
-        if row['pais']:
-            for p in row['pais'].split(','):
-                unique_paises.add(p.strip())
+                estado_conservacion_options = ["En Peligro Crítico", "En Peligro", "Vulnerable", "Casi Amenazado", "Preocupación Menor", "Datos Insuficientes", "No Evaluado"]
+                estado_conservacion_manual = st.selectbox("Estado de Conservación (Manual - Según Criterios UICN):", estado_conservacion_options, key="add_estado_manual")
+
+            submitted = st.form_submit_button("Guardar Especie")
+
+            if submitted:
+                if nombre and estado_conservacion_manual:
+                    # Si el nombre científico ya está registrado se actualiza esa especie en lugar de duplicarla
+                    with get_db_connection() as conn:
+                        creada, parecidas = escribir(conn, guardar_y_puntuar, {
+                            'nombre': nombre, 'nombre_cientifico': nombre_cientifico, 'descripcion': descripcion,
+                            'estado_conservacion': estado_conservacion_manual, 'estado_sugerido_uicn': estado_uicn_sugerido,
+                            'poblacion_estimada': poblacion_estimada, 'tendencia_poblacion': tendencia_poblacion,
+                            'amenazas': amenazas, 'pais': paises_str, 'criterios_uicn': criterios_uicn, # Guardamos la cadena de países
+                        })
+                    invalidar_cache()
+                    # Se muestra tras el rerun, arriba del formulario
+                    st.session_state["aviso_guardado"] = (
+                        f"¡'{nombre}' ha sido registrado!" if creada else
+                        f"'{nombre_cientifico}' ya estaba registrado: se actualizaron sus datos.",
+                        [f"{n} (similitud {s:.2f})" for _, n, s, _ in parecidas])
+                    st.rerun() # Recargar para ver el cambio
+                else:
+                    st.error("Por favor, llena al menos el Nombre Común y el Estado de Conservación Manual.")
+
+    # --- Sección de Exploración de Especies (Búsqueda, Filtros, Orden, Paginación) ---
+    elif page_selection == "Explorar Especies":
+        st.header("🔎 Enciclopedia de Especies por Conservar")
+        # Borrar solo marca la especie (ver cambios.py): se puede deshacer
+        if "ultima_borrada" in st.session_state:
+            borrada_id, borrada_nombre = st.session_state["ultima_borrada"]
+            col_aviso, col_deshacer = st.columns([4, 1])
+            col_aviso.success(f"Especie '{borrada_nombre}' eliminada.")
+            if col_deshacer.button("↩️ Deshacer", key="deshacer_borrado"):
+                with get_db_connection() as conn:
+                    escribir(conn, restaurar_especie, borrada_id)
+                invalidar_cache()
+                del st.session_state["ultima_borrada"]
+                st.rerun()
+
+        col_filter1, col_filter2 = st.columns(2)
+        with col_filter1:
+            search_query = st.text_input("Buscar por Nombre, Nombre Científico, Descripción o Amenazas:", "")
+        with col_filter2:
+            estados_conservacion_filtro = ["Todos"] + ESTADOS_CONSERVACION
+            selected_estado_filtro = st.selectbox("Filtrar por Estado:", estados_conservacion_filtro)
     
-    paises_lista_filtro = sorted(list(unique_paises))
-    selected_paises_filtro = st.multiselect("Filtrar por País/Países (selecciona uno o más):", paises_lista_filtro)
-
-    sort_by = st.selectbox("Ordenar por:", ["Nombre (A-Z)", "Nombre (Z-A)", "Estado de Conservación (Más Crítico Primero)", "Población (Menor a Mayor)"])
-
-    conn = get_db_connection()
-    all_especies_raw = conn.execute('SELECT * FROM especies').fetchall()
-    conn.close()
-
-    # Definimos explícitamente los nombres de las columnas en el orden correcto
-    # Asegúrate de que este orden coincida con el orden en crear_db.py
-    column_names = [
-        'id', 'nombre', 'nombre_cientifico', 'descripcion', 
-        'estado_conservacion', 'estado_sugerido_uicn', 'poblacion_estimada', 
-        'tendencia_poblacion', 'amenazas', 'pais'
-    ]
-    df_especies = pd.DataFrame(all_especies_raw, columns=column_names)
-
-    # --- CÓDIGO DE DIAGNÓSTICO (mantenerlo por ahora) ---
- #   st.write(f"DataFrame vacío: {df_especies.empty}")
- #   st.write(f"Columnas del DataFrame: {df_especies.columns.tolist()}")
-    # --- FIN DE CÓDIGO DE DIAGNÓSTICO ---
-
-    # Aplicar filtros
-    if not df_especies.empty:
-        # Búsqueda por nombre común o científico
-        filtered_df = df_especies[
-            df_especies['nombre'].str.lower().str.contains(search_query, na=False) |
-            df_especies['nombre_cientifico'].str.lower().str.contains(search_query, na=False)
-        ]
-        
-        if selected_estado_filtro != "Todos":
-            filtered_df = filtered_df[filtered_df['estado_conservacion'] == selected_estado_filtro]
-        
-        # --- CAMBIO AQUÍ: Filtrado para múltiples países ---
-        if selected_paises_filtro: # Si se seleccionó al menos un país
-            # Filtramos si la columna 'pais' contiene AL MENOS UNO de los países seleccionados
-            filtered_df = filtered_df[
-                filtered_df['pais'].astype(str).apply(
-                    lambda x: any(p.strip() in [country.strip() for country in x.split(',')] for p in selected_paises_filtro)
-                )
-            ]
-
-
-        # Ordenar
-        if sort_by == "Nombre (A-Z)":
-            filtered_df = filtered_df.sort_values(by='nombre', ascending=True)
-        elif sort_by == "Nombre (Z-A)":
-            filtered_df = filtered_df.sort_values(by='nombre', ascending=False)
-        elif sort_by == "Estado de Conservación (Más Crítico Primero)":
-            orden_estados = {"En Peligro Crítico": 1, "En Peligro": 2, "Vulnerable": 3, 
-                             "Casi Amenazado": 4, "Preocupación Menor": 5, 
-                             "Datos Insuficientes": 6, "No Evaluado": 7}
-            # Usar .map y luego sort_values
-            filtered_df['orden_estado'] = filtered_df['estado_conservacion'].map(orden_estados)
-            # Asegurarse de que los valores NaN de orden_estado vayan al final o se manejen
-            filtered_df = filtered_df.sort_values(by='orden_estado', na_position='last').drop(columns='orden_estado')
-        elif sort_by == "Población (Menor a Mayor)":
-            # Asegurarse de que 'poblacion_estimada' sea numérica y manejar NaN
-            filtered_df['poblacion_estimada'] = pd.to_numeric(filtered_df['poblacion_estimada'], errors='coerce')
-            filtered_df = filtered_df.sort_values(by='poblacion_estimada', ascending=True, na_position='last')
-        # --- Botón de Exportar a CSV ---
-        if not filtered_df.empty:
-                    csv_data = filtered_df.to_csv(index=False).encode('utf-8')
+        # --- CAMBIO AQUÍ: multiselect para varios países ---
+        # Las opciones salen de la tabla normalizada 'paises' (consulta indexada, sin partir cadenas)
+        paises_lista_filtro = leer_paises(conn_lectura, version_datos)
+        selected_paises_filtro = st.multiselect("Filtrar por País/Países (selecciona uno o más):", paises_lista_filtro)
+
+        # Filtro por región: especies con puntos de ocurrencia o polígonos de rango dentro del rectángulo,
+        # resuelto con los índices R*Tree (ver distribucion.py)
+        region_filtro = None
+        with st.expander("🗺️ Filtrar por región (mapa)"):
+            filtrar_region = st.checkbox("Solo especies con registros dentro de esta región", key="filtrar_region")
+            col_lat, col_lon = st.columns(2)
+            lat_min = col_lat.number_input("Latitud mínima (sur):", -90.0, 90.0, -60.0, key="region_lat_min")
+            lat_max = col_lat.number_input("Latitud máxima (norte):", -90.0, 90.0, 15.0, key="region_lat_max")
+            lon_min = col_lon.number_input("Longitud mínima (oeste):", -180.0, 180.0, -95.0, key="region_lon_min")
+            lon_max = col_lon.number_input("Longitud máxima (este):", -180.0, 180.0, -30.0, key="region_lon_max")
+            if lat_min > lat_max:
+                st.warning("La latitud mínima no puede ser mayor que la máxima.")
+            else:
+                region = (lon_min, lat_min, lon_max, lat_max)
+                if filtrar_region:
+                    region_filtro = region
+                puntos_region = leer_muestra_region(conn_lectura, version_datos, region)
+                if not puntos_region.empty:
+                    st.map(puntos_region)
+                    st.caption(f"{len(puntos_region)} puntos de ocurrencia en la región (se dibujan como máximo 5000). "
+                               "Si la longitud mínima es mayor que la máxima, la región cruza el meridiano 180°.")
+                else:
+                    st.caption("No hay puntos de ocurrencia registrados en esta región (`python distribucion.py importar`).")
+
+        # Sin elegir orden (None): por relevancia al buscar, por nombre si no
+        sort_by = st.selectbox("Ordenar por:", OPCIONES_ORDEN, index=None,
+                               placeholder="Relevancia al buscar; si no, nombre (A-Z)")
+
+        # Filtros, orden y paginación se resuelven en SQL: solo se leen las filas de la página actual
+        # (los resultados quedan en caché mientras no haya escrituras)
+        paises_filtro = tuple(selected_paises_filtro)
+        hay_especies = leer_hay_especies(conn_lectura, version_datos)
+        total_filtrado = leer_total_filtrado(conn_lectura, version_datos, search_query, selected_estado_filtro,
+                                             paises_filtro, region_filtro)
+
+        if hay_especies:
+            # --- Botones de Exportar (CSV / Parquet) ---
+            if total_filtrado > 0:
+                col_csv, col_parquet = st.columns(2)
+                with col_csv:
+                    nombre_csv, mime_csv = FORMATOS["csv"]
                     st.download_button(
                         label="⬇️ Exportar Especies a CSV",
-                        data=csv_data,
-                        file_name="especies_bioguard.csv",
-                        mime="text/csv",
+                        data=exportacion_diferida("csv", search_query, selected_estado_filtro, paises_filtro, sort_by,
+                                                  region_filtro),
+                        file_name=nombre_csv,
+                        mime=mime_csv,
+                        on_click="ignore",
                         help="Descarga el listado actual de especies con los filtros aplicados."
                     )
-                    st.markdown("---") # Separador para que se vea limpio
-
-        # Paginación
-        items_per_page = 5
-        total_pages = (len(filtered_df) + items_per_page - 1) // items_per_page
-        if total_pages == 0: total_pages = 1 # Para evitar error si no hay elementos
-        current_page = st.number_input("Página:", 1, total_pages, key="pagination_browse")
-
-        start_index = (current_page - 1) * items_per_page
-        end_index = start_index + items_per_page
-        displayed_especies = filtered_df.iloc[start_index:end_index]
-        # --- Visualización de Especies con Botones de Edición/Eliminación ---
-        if not displayed_especies.empty:
-            for index, especie in displayed_especies.iterrows():
-                st.markdown(f"### **{especie['nombre']}** ({especie['nombre_cientifico'] or 'N/A'})")
-                st.write(f"**Estado de Conservación (UICN):** :red[{especie['estado_conservacion']}]" if especie['estado_conservacion'] in ["En Peligro Crítico", "En Peligro", "Vulnerable"] else f"**Estado de Conservación (UICN):** {especie['estado_conservacion']}")
-                st.write(f"**Sugerencia AI:** {especie['estado_sugerido_uicn']}")
-                st.write(f"**Población Estimada:** {especie['poblacion_estimada']} individuos")
-                st.write(f"**Tendencia Poblacional:** {especie['tendencia_poblacion']}")
-                st.write(f"**Países:** {especie['pais']}") # Muestra la cadena de países
-                st.write(f"**Descripción:** {especie['descripcion']}")
-                st.write(f"**Principales Amenazas:** {especie['amenazas']}")
+                with col_parquet:
+                    nombre_parquet, mime_parquet = FORMATOS["parquet"]
+                    st.download_button(
+                        label="⬇️ Exportar a Parquet",
+                        data=exportacion_diferida("parquet", search_query, selected_estado_filtro, paises_filtro, sort_by,
+                                                  region_filtro),
+                        file_name=nombre_parquet,
+                        mime=mime_parquet,
+                        on_click="ignore",
+                        disabled=not parquet_disponible(),
+                        help=("Formato columnar y comprimido para análisis externos." if parquet_disponible()
+                              else "Instala pyarrow para exportar a Parquet.")
+                    )
+                st.markdown("---") # Separador para que se vea limpio
+
+            # Paginación
+            items_per_page = 5
+            total_pages = (total_filtrado + items_per_page - 1) // items_per_page
+            if total_pages == 0: total_pages = 1 # Para evitar error si no hay elementos
+            current_page = st.number_input("Página:", 1, total_pages, key="pagination_browse")
+
+            displayed_especies = leer_pagina(conn_lectura, version_datos, search_query, selected_estado_filtro,
+                                             paises_filtro, sort_by, current_page, items_per_page, region_filtro)
+            # --- Visualización de Especies con Botones de Edición/Eliminación ---
+            if displayed_especies:
+                for especie in displayed_especies:
+                    st.markdown(f"### **{especie['nombre']}** ({especie['nombre_cientifico'] or 'N/A'})")
+                    st.write(f"**Estado de Conservación (UICN):** :red[{especie['estado_conservacion']}]" if especie['estado_conservacion'] in ["En Peligro Crítico", "En Peligro", "Vulnerable"] else f"**Estado de Conservación (UICN):** {especie['estado_conservacion']}")
+                    st.write(f"**Sugerencia AI:** {especie['estado_sugerido_uicn']}")
+                    if especie['criterios_uicn']:
+                        st.caption(f"Criterios UICN: {especie['criterios_uicn']}")
+                    for _, nombre_parecido, similitud, motivo in especie['posibles_duplicados']:
+                        st.warning(f"Posible duplicado de **{nombre_parecido}** ({motivo}, similitud {similitud:.2f})")
+                    st.write(f"**Población Estimada:** {especie['poblacion_estimada']} individuos")
+                    st.write(f"**Tendencia Poblacional:** {especie['tendencia_poblacion']}")
+                    if especie['riesgo'] is not None:
+                        st.write(f"**Riesgo futuro (modelo):** {especie['riesgo']:.0%} de probabilidad de estar amenazada")
+                    st.write(f"**Países:** {especie['pais']}") # Muestra la cadena de países
+                    distribucion = especie['distribucion']
+                    if distribucion:
+                        eoo = f"{distribucion['eoo_km2']:,.0f} km²" if distribucion['eoo_km2'] is not None else "—"
+                        aoo = f"{distribucion['aoo_km2']:,.0f} km²" if distribucion['aoo_km2'] is not None else "—"
+                        st.write(f"**Distribución:** extensión de presencia (EOO) {eoo} · área de ocupación (AOO) {aoo} "
+                                 f"({distribucion['n_ocurrencias']} ocurrencias, {distribucion['n_rangos']} polígonos de rango)")
+                    st.write(f"**Descripción:** {especie['descripcion']}")
+                    st.write(f"**Principales Amenazas:** {especie['amenazas']}")
                
-                col_actions = st.columns(1)
+                    col_actions = st.columns(1)
                 
-                with col_actions[0]:
-                    if st.button(f"🗑️ Eliminar {especie['nombre']}", key=f"delete_{especie['id']}"):
-                        conn = get_db_connection()
-                        conn.execute("DELETE FROM especies WHERE id = ?", (especie['id'],))
-                        conn.commit()
-                        conn.close()
-                        st.success(f"Especie '{especie['nombre']}' eliminada.")
-                        st.rerun()
-                st.markdown("---")       
-        else:
-            st.info("No se encontraron especies con los filtros aplicados.")
-    else:
-        st.info("Aún no hay especies registradas. ¡Añade una!")
-
-# --- Sección de Análisis y Predicción (Ciencia de Datos y Estadísticas) ---
-elif page_selection == "Análisis y Predicción":
-    st.header("📈 Análisis de Datos Ecológicos y Modelos Predictivos")
-
-    conn = get_db_connection()
-    all_especies_analysis = conn.execute('SELECT * FROM especies').fetchall()
-    conn.close()
-
-    if all_especies_analysis:
-        # Definimos explícitamente los nombres de las columnas para el análisis
-        column_names_analysis = [
-                'id', 'nombre', 'nombre_cientifico', 'descripcion', 
-                'estado_conservacion', 'estado_sugerido_uicn', 'poblacion_estimada', 
-                'tendencia_poblacion', 'amenazas', 'pais'
-            ]
-        df_analysis = pd.DataFrame(all_especies_analysis, columns=column_names_analysis)
-
-            # --- CÓDIGO DE DIAGNÓSTICO (opcional aquí, pero puedes agregarlo si quieres confirmar) ---
-            # st.write(f"Análisis DataFrame vacío: {df_analysis.empty}")
-            # st.write(f"Análisis Columnas del DataFrame: {df_analysis.columns.tolist()}")
-            # --- FIN CÓDIGO DE DIAGNÓSTICO ---
-        
-        st.subheader("1. Distribución por Estado de Conservación")
-        estado_counts = df_analysis['estado_conservacion'].value_counts().reset_index()
-        estado_counts.columns = ['Estado de Conservación', 'Número de Especies']
-        fig_estado = px.bar(estado_counts, x='Estado de Conservación', y='Número de Especies',
-                            color='Estado de Conservación',
-                            title='Número de Especies por Estado de Conservación',
-                            labels={'Estado de Conservación': 'Estado', 'Número de Especies': 'Cantidad'})
-        st.plotly_chart(fig_estado, use_container_width=True)
-
-        st.subheader("2. Tendencia Poblacional por Estado de Conservación")
-        df_analysis_filtered = df_analysis.dropna(subset=['tendencia_poblacion'])
-        if not df_analysis_filtered.empty:
-            tendencia_estado_counts = df_analysis_filtered.groupby(['tendencia_poblacion', 'estado_conservacion']).size().reset_index(name='Count')
-            fig_tendencia_estado = px.bar(tendencia_estado_counts, x='tendencia_poblacion', y='Count',
-                                          color='estado_conservacion', barmode='group',
-                                          title='Relación entre Tendencia Poblacional y Estado de Conservación')
-            st.plotly_chart(fig_tendencia_estado, use_container_width=True)
+                    with col_actions[0]:
+                        if st.button(f"🗑️ Eliminar {especie['nombre']}", key=f"delete_{especie['id']}"):
+                            with get_db_connection() as conn:
+                                escribir(conn, borrar_especie, especie['id'])
+                            invalidar_cache()
+                            st.session_state["ultima_borrada"] = (especie['id'], especie['nombre'])
+                            st.rerun()
+                    st.markdown("---")       
+            else:
+                st.info("No se encontraron especies con los filtros aplicados.")
         else:
-            st.info("No hay datos de tendencia poblacional para analizar.")
-
-        st.subheader("3. Análisis de Amenazas Comunes (Simulado)")
-        amenazas_list = df_analysis['amenazas'].dropna().str.lower().str.split(', ').explode().tolist()
-        if amenazas_list:
-            amenazas_df = pd.DataFrame(amenazas_list, columns=['Amenaza'])
-            amenaza_counts = amenazas_df['Amenaza'].value_counts().head(5).reset_index()
-            amenaza_counts.columns = ['Amenaza', 'Frecuencia']
-            fig_amenazas = px.pie(amenaza_counts, values='Frecuencia', names='Amenaza',
-                                  title='Top 5 Amenazas Más Comunes')
-            st.plotly_chart(fig_amenazas, use_container_width=True)
+            st.info("Aún no hay especies registradas. ¡Añade una!")
+
+    # --- Sección de Análisis y Predicción (Ciencia de Datos y Estadísticas) ---
+    elif page_selection == "Análisis y Predicción":
+        st.header("📈 Análisis de Datos Ecológicos y Modelos Predictivos")
+
+        paises_analisis = st.multiselect("Filtrar por país:", leer_paises(conn_lectura, version_datos), key="paises_analisis")
+        if paises_analisis:
+            almacen = obtener_almacen(conn_lectura, version_datos)
+            mascara = almacen.mascara_paises(paises_analisis)
+            st.caption(f"{len(almacen)} especies en memoria: {sum(almacen.memoria().values()) / 1e6:.2f} MB "
+                       f"en columnas compactas (categorías y enteros).")
+            estado_counts, tendencia_estado_counts, amenaza_counts, riesgo_counts = (
+                almacen.conteo_estados(mascara), almacen.conteo_tendencia_estado(mascara),
+                almacen.top_amenazas(5, mascara), almacen.conteo_riesgo(mascara))
         else:
-            st.info("No hay datos de amenazas para analizar.")
-
-        st.subheader("4. Modelo Predictivo (Simulación de Riesgo Futuro)")
-        st.info("Esta sección simula un modelo predictivo. En un sistema real, usaríamos algoritmos de Machine Learning (ej. Regresión Logística, Random Forest) entrenados con datos históricos de poblaciones y amenazas para predecir la probabilidad de cambio en el estado de conservación.")
-        
-        if not df_analysis.empty:
-            df_analysis['riesgo_futuro_simulado'] = df_analysis.apply(lambda row: "Alto" if pd.notna(row['poblacion_estimada']) and row['poblacion_estimada'] < 1000 and row['tendencia_poblacion'] == 'Decreciendo' else "Bajo", axis=1)
-            riesgo_counts = df_analysis['riesgo_futuro_simulado'].value_counts().reset_index()
-            riesgo_counts.columns = ['Riesgo', 'Número de Especies']
-            fig_riesgo = px.bar(riesgo_counts, x='Riesgo', y='Número de Especies',
-                                color='Riesgo', title='Riesgo Futuro de Conservación (Simulado)')
-            st.plotly_chart(fig_riesgo, use_container_width=True)
+            estado_counts, tendencia_estado_counts, amenaza_counts, riesgo_counts = leer_resumenes_dashboard(
+                conn_lectura, version_datos)
+
+        if not estado_counts.empty:
+            st.subheader("1. Distribución por Estado de Conservación")
+            with medir('grafico', 'estados'):
+                fig_estado = px.bar(estado_counts, x='Estado de Conservación', y='Número de Especies',
+                                    color='Estado de Conservación',
+                                    title='Número de Especies por Estado de Conservación',
+                                    labels={'Estado de Conservación': 'Estado', 'Número de Especies': 'Cantidad'})
+            st.plotly_chart(fig_estado, use_container_width=True)
+
+            st.subheader("2. Tendencia Poblacional por Estado de Conservación")
+            if not tendencia_estado_counts.empty:
+                with medir('grafico', 'tendencia_estado'):
+                    fig_tendencia_estado = px.bar(tendencia_estado_counts, x='tendencia_poblacion', y='Count',
+                                                  color='estado_conservacion', barmode='group',
+                                                  title='Relación entre Tendencia Poblacional y Estado de Conservación')
+                st.plotly_chart(fig_tendencia_estado, use_container_width=True)
+            else:
+                st.info("No hay datos de tendencia poblacional para analizar.")
+
+            st.subheader("3. Análisis de Amenazas Comunes (Simulado)")
+            if not amenaza_counts.empty:
+                with medir('grafico', 'amenazas'):
+                    fig_amenazas = px.pie(amenaza_counts, values='Frecuencia', names='Amenaza',
+                                          title='Top 5 Amenazas Más Comunes')
+                st.plotly_chart(fig_amenazas, use_container_width=True)
+            else:
+                st.info("No hay datos de amenazas para analizar.")
+
+            st.subheader("4. Modelo Predictivo (Riesgo Futuro)")
+            st.markdown("Regresión logística entrenada con las especies ya evaluadas: estima la probabilidad de que una especie esté amenazada (Vulnerable o peor) a partir de su población, tendencia, amenazas y número de países. Cada especie guarda su puntuación, que solo se recalcula cuando cambian sus datos o se vuelve a entrenar el modelo; aquí se cuentan las de probabilidad alta (≥ 50 %).")
+            modelo = leer_modelo_riesgo()
+            if modelo is not None:
+                auc = modelo['metricas'].get('auc')
+                st.caption(f"Modelo {modelo['version']} entrenado el {modelo['entrenado'].replace('T', ' ')} con "
+                           f"{modelo['n_entrenamiento']} especies" + (f" · AUC de validación {auc:.3f}" if auc is not None else "") + ".")
+            else:
+                st.info("Todavía no hay un modelo de riesgo entrenado: las especies aparecen sin puntuar.")
+            con_censos = leer_con_censos(conn_lectura, version_datos)
+            if con_censos:
+                st.caption(f"{con_censos} especies usan la tendencia y la población calculadas a partir de su historial de censos (`python censos.py actualizar`).")
+
+            if not riesgo_counts.empty:
+                with medir('grafico', 'riesgo'):
+                    fig_riesgo = px.bar(riesgo_counts, x='Riesgo', y='Número de Especies',
+                                        color='Riesgo', title='Riesgo Futuro de Conservación (Modelo)')
+                st.plotly_chart(fig_riesgo, use_container_width=True)
+            else:
+                st.info("No hay suficientes datos para el modelo predictivo.")
+            if st.button("🧠 Entrenar el modelo y puntuar las especies"):
+                trabajo_id = encolar_trabajo('entrenar_riesgo')
+                st.success(f"Entrenamiento encolado (trabajo #{trabajo_id}).")
+
+            st.subheader("5. Reclasificación Automática UICN")
+            st.markdown("Recalcula la sugerencia UICN de todas las especies registradas con el motor de criterios A–E (evaluación por lotes), guardando qué criterios la justifican. Se ejecuta en segundo plano; el progreso aparece en la barra lateral.")
+            col_reclasificar, col_resumenes = st.columns(2)
+            if col_reclasificar.button("🔄 Reclasificar todas las especies"):
+                trabajo_id = encolar_trabajo('reclasificar')
+                st.success(f"Reclasificación encolada (trabajo #{trabajo_id}).")
+            if col_resumenes.button("🧮 Reconstruir resúmenes del dashboard"):
+                trabajo_id = encolar_trabajo('reconstruir_resumenes')
+                st.success(f"Reconstrucción encolada (trabajo #{trabajo_id}).")
+
+        elif paises_analisis:
+            st.info("No hay especies registradas en los países seleccionados.")
         else:
-            st.info("No hay suficientes datos para la simulación predictiva.")
-
-    else:
-        st.info("No hay suficientes datos para realizar análisis y predicciones. ¡Por favor, añade algunas especies!")
-
-        # --- NUEVA SECCIÓN: Cargar Datos desde CSV ---
-elif page_selection == "Cargar Datos (CSV)":
-            st.header("⬆️ Cargar Datos de Especies desde Archivo CSV")
-            st.markdown("Sube un archivo CSV con tus datos de especies. Las columnas deben coincidir con las de la base de datos (ej. `nombre`, `nombre_cientifico`, `estado_conservacion`, `poblacion_estimada`, etc.).")
-
-            uploaded_file = st.file_uploader("Elige un archivo CSV", type="csv")
-
-            if uploaded_file is not None:
-                try:
-                    # Leer el archivo CSV en un DataFrame de Pandas
-                    df_uploaded = pd.read_csv(uploaded_file)
-                    st.write("Vista previa de los datos cargados:")
-                    st.dataframe(df_uploaded.head())
-
-                    # Validaciones básicas de seguridad y estructura
-                    required_columns = [
-                        'nombre', 'nombre_cientifico', 'descripcion', 'estado_conservacion', 
-                        'estado_sugerido_uicn', 'poblacion_estimada', 'tendencia_poblacion', 
-                        'amenazas', 'pais' 
-                    ]
-                    
-                    # Convertir todos los nombres de columna a minúsculas para una validación sin distinción de mayúsculas
-                    df_uploaded.columns = df_uploaded.columns.str.lower()
-                    
-                    missing_columns = [col for col in required_columns if col not in df_uploaded.columns]
-
-                    if missing_columns:
-                        st.error(f"¡Error! Faltan las siguientes columnas requeridas en tu archivo CSV: {', '.join(missing_columns)}. Por favor, revisa el formato.")
-                    else:
-                        st.success("El archivo CSV parece tener las columnas correctas. ¡Listo para importar!")
+            st.info("No hay suficientes datos para realizar análisis y predicciones. ¡Por favor, añade algunas especies!")
+
+            # --- NUEVA SECCIÓN: Cargar Datos desde CSV ---
+    elif page_selection == "Cargar Datos (CSV)":
+                st.header("⬆️ Cargar Datos de Especies desde Archivo CSV")
+                st.markdown("Sube un archivo CSV con tus datos de especies. Las columnas deben coincidir con las de la base de datos (ej. `nombre`, `nombre_cientifico`, `estado_conservacion`, `poblacion_estimada`, etc.).")
+
+                uploaded_file = st.file_uploader("Elige un archivo CSV", type="csv")
+
+                if uploaded_file is not None:
+                    try:
+                        # Solo se leen unas filas para la vista previa; la importación lee el archivo por lotes
+                        df_uploaded = pd.read_csv(uploaded_file, nrows=5)
+                        uploaded_file.seek(0)
+                        st.write("Vista previa de los datos cargados:")
+                        st.dataframe(df_uploaded)
+
+                        # Validaciones básicas de seguridad y estructura (sin distinción de mayúsculas)
+                        missing_columns = columnas_faltantes(df_uploaded.columns)
+
+                        if missing_columns:
+                            st.error(f"¡Error! Faltan las siguientes columnas requeridas en tu archivo CSV: {', '.join(missing_columns)}. Por favor, revisa el formato.")
+                        else:
+                            st.success("El archivo CSV parece tener las columnas correctas. ¡Listo para importar!")
                         
-                        if st.button("Importar Datos a la Base de Datos"):
-                            conn = get_db_connection()
-                            cursor = conn.cursor()
-                            
-                            rows_inserted = 0
-                            rows_skipped = 0
-
-                            for index, row in df_uploaded.iterrows():
-                                # Preparar los datos para la inserción, asegurando el orden y manejando nulos
-                                try:
-                                    # Asegurarse de que todos los valores son cadenas o None
-                                    # Usar .get(col, None) para manejar columnas que no estén presentes en el CSV pero sí en la DB
-                                    data_to_insert = (
-                                        str(row.get('nombre', '')),
-                                        str(row.get('nombre_cientifico', '')),
-                                        str(row.get('descripcion', '')),
-                                        str(row.get('estado_conservacion', '')),
-                                        str(row.get('estado_sugerido_uicn', clasificar_uicn(row.get('poblacion_estimada'), row.get('tendencia_poblacion'), row.get('amenazas'), row.get('pais')))), # Re-clasificar si no viene sugerido
-                                        int(row.get('poblacion_estimada', 0)) if pd.notna(row.get('poblacion_estimada')) else 0, # Convertir a int, manejar NaN
-                                        str(row.get('tendencia_poblacion', 'Desconocida')),
-                                        str(row.get('amenazas', '')),
-                                        str(row.get('pais', ''))
-                                        
-                                    )
-                                    cursor.execute('''
-                                        INSERT INTO especies (
-                                            nombre, nombre_cientifico, descripcion, estado_conservacion,
-                                            estado_sugerido_uicn, poblacion_estimada, tendencia_poblacion,
-                                            amenazas, pais
-                                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                                    ''', data_to_insert)
-                                    rows_inserted += 1
-                                except Exception as e:
-                                    st.warning(f"Error al procesar la fila {index+1} ({row.get('nombre', 'N/A')}): {e}. Fila omitida.")
-                                    rows_skipped += 1
-                            
-                            conn.commit()
-                            conn.close()
-                            st.success(f"¡Importación completada! Se insertaron {rows_inserted} especies y se omitieron {rows_skipped}.")
-                            st.rerun()
-
-                except pd.errors.EmptyDataError:
-                    st.error("El archivo CSV está vacío.")
-                except pd.errors.ParserError:
-                    st.error("No se pudo analizar el archivo CSV. Asegúrate de que está bien formado.")
-                except Exception as e:
-                    st.error(f"Ocurrió un error inesperado al leer el archivo: {e}")
-
-# --- Footer ---
-st.markdown("---")
-st.markdown("Desarrollado con pasión por la conservación por [Santiago Urdaneta](http://github.com/santiagourdaneta/)")
\ No newline at end of file
+                            buscar_duplicados = st.checkbox("Buscar posibles duplicados al terminar", value=True,
+                                                            help="Compara las especies nuevas con las ya registradas en un trabajo aparte, después de importar.")
+                            if st.button("Importar Datos a la Base de Datos"):
+                                # El archivo se guarda en disco para que el trabajador lo lea (y pueda reanudarlo)
+                                os.makedirs(DIR_CARGAS, exist_ok=True)
+                                base = os.path.abspath(os.path.join(DIR_CARGAS, f"{time.strftime('%Y%m%d_%H%M%S')}_{os.path.basename(uploaded_file.name)}"))
+                                with open(base, 'wb') as f:
+                                    f.write(uploaded_file.getbuffer())
+                                trabajo_id = encolar_trabajo('importar_csv', {
+                                    "ruta": base,
+                                    "ruta_rechazos": os.path.splitext(base)[0] + "_rechazadas.csv",
+                                    "borrar_al_terminar": True,
+                                    "detectar_duplicados": buscar_duplicados,
+                                })
+                                st.success(f"Importación encolada (trabajo #{trabajo_id}). Puedes seguir usando la aplicación; el progreso aparece en la barra lateral.")
+
+                    except pd.errors.EmptyDataError:
+                        st.error("El archivo CSV está vacío.")
+                    except pd.errors.ParserError:
+                        st.error("No se pudo analizar el archivo CSV. Asegúrate de que está bien formado.")
+                    except Exception as e:
+                        st.error(f"Ocurrió un error inesperado al leer el archivo: {e}")
+
+    # --- Página oculta de Rendimiento (?admin=1) ---
+    elif page_selection == "Rendimiento":
+        st.header("⏱️ Rendimiento de la Aplicación")
+        st.markdown("Latencias medidas por la instrumentación de `metricas.py` (consultas SQL, DataFrames, gráficos, importaciones y exportaciones).")
+        horas = st.selectbox("Periodo:", [1, 24, 168], index=1, format_func=lambda h: f"Últimas {h} horas")
+        metricas = leer_metricas(DB_PATH, horas)
+
+        if metricas.empty:
+            st.info("Aún no hay mediciones en este periodo. Navega por la aplicación y vuelve aquí.")
+        else:
+            st.subheader("Latencia por página")
+            st.dataframe(latencias(metricas[metricas['categoria'] == 'pagina'], 'pagina'), hide_index=True)
+
+            st.subheader("Desglose por operación")
+            st.dataframe(latencias(metricas[metricas['categoria'] != 'pagina'], ['categoria', 'nombre']), hide_index=True)
+
+            st.subheader("Consultas más lentas")
+            for consulta in consultas_lentas(metricas).itertuples():
+                with st.expander(f"{consulta.duracion_ms:.1f} ms · {consulta.pagina or 'sin página'} · {consulta.nombre}"):
+                    st.code(consulta.detalle, language="sql")
+                    if consulta.parametros and consulta.parametros != "[]":
+                        st.caption(f"Parámetros: {consulta.parametros}")
+                    try:
+                        with get_db_connection() as conn:
+                            st.code(plan_consulta(conn, consulta.detalle, consulta.parametros), language=None)
+                    except Exception as e: # p. ej. una tabla que ya no existe
+                        st.warning(f"No se pudo obtener el plan: {e}")
+
+    # --- Footer ---
+    st.markdown("---")
+    st.markdown("Desarrollado con pasión por la conservación por [Santiago Urdaneta](http://github.com/santiagourdaneta/)")
+finally:
+    # También si la ejecución se corta antes (st.rerun, una excepción): una instantánea abierta
+    # impide los checkpoints del WAL mientras la sesión siga viva, y las mediciones de una
+    # ejecución cortada (p. ej. la que guarda una especie y hace st.rerun) también cuentan
+    terminar_instantanea(conn_lectura)
+    terminar_pagina(DB_PATH) # Registra la duración total de la página y vuelca las mediciones
\ No newline at end of file
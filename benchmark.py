@@ -0,0 +1,360 @@
+import argparse
+import copy
+import json
+import math
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from almacen import AlmacenEspecies
+from cambios import cambios_desde, version_actual
+from clasificacion import clasificar_uicn, clasificar_uicn_lote
+from conexion import abrir_conexion
+from consultas import OPCIONES_ORDEN, contar_especies, obtener_pagina_especies
+from crear_db import crear_tablas
+from distribucion import actualizar_distribucion, especies_en_region
+from generar_datos import escribir_csv, poblar_ocurrencias
+from importador import importar_csv
+from modelo_riesgo import categoria_riesgo, entrenar, leer_entrenamiento, puntuar, puntuar_especies
+from paises import listar_paises
+from amenazas import grupos_amenazas, separar_amenazas
+from resumenes import leer_conteo_estados, leer_conteo_riesgo, leer_conteo_tendencia_estado, leer_top_amenazas
+
+# --- Benchmarks de rendimiento ---
+# Genera N especies sintéticas, las importa y cronometra los caminos calientes de la
+# app (exploración, búsqueda, filtros, orden, análisis, importación, clasificación, modelo de riesgo
+# y sincronización incremental).
+# Los resultados se guardan en JSON para comparar ejecuciones:
+#   python benchmark.py --filas 100000 --salida bench_100k.json
+#   python benchmark.py --filas 100000 --comparar bench_100k.json
+
+BUSQUEDAS = ["tigre", "perdida habitat", "caza furtiva", "rana andino"]
+MUESTRA_POR_FILA = 2000
+# Llamadas a clasificar_uicn (una especie, como en el formulario) que se cronometran
+LLAMADAS_ESCALAR = 200
+# Filas leídas con SELECT * para estimar la memoria de un DataFrame completo
+MUESTRA_MEMORIA = 50000
+# Entradas del registro de cambios que lee la sincronización incremental
+CAMBIOS_RECIENTES = 1000
+
+
+def datos_aleatorios(n, semilla=42):
+    rng = np.random.default_rng(semilla)
+    amenazas = np.array(["Caza furtiva", "deforestacion, minería", "Pérdida de hábitat",
+                         "caza ilegal, deforestacion", "Contaminación", ""], dtype=object)
+    return pd.DataFrame({
+        'poblacion_estimada': rng.integers(0, 20000, n),
+        'tendencia_poblacion': rng.choice(np.array(["Decreciendo", "Estable", "Creciendo", "Desconocida"], dtype=object), n),
+        'amenazas': rng.choice(amenazas, n),
+        'pais': rng.choice(np.array(["Perú", "México, Guatemala", "India"], dtype=object), n),
+    })
+
+
+def _cronometrar(funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return resultado, time.perf_counter() - inicio
+
+
+def medir(funcion, repeticiones=5):
+    tiempos = [_cronometrar(funcion)[1] for _ in range(repeticiones)]
+    return {"mediana_s": statistics.median(tiempos), "min_s": min(tiempos), "repeticiones": repeticiones}
+
+
+def bench_importacion(ruta_db, ruta_csv, filas):
+    conn = sqlite3.connect(ruta_db)
+    try:
+        crear_tablas(conn)
+        resultado, segundos = _cronometrar(lambda: importar_csv(conn, ruta_csv))
+    finally:
+        conn.close()
+    return {"importacion_csv": {"total_s": segundos, "filas": resultado["insertadas"],
+                                "filas_por_s": filas / segundos if segundos else None}}
+
+
+def bench_explorar(conn, repeticiones):
+    resultados = {}
+
+    def pagina(search_query="", estado="Todos", paises=None, sort_by=None, numero=1):
+        contar_especies(conn, search_query, estado, paises)
+        return obtener_pagina_especies(conn, search_query, estado, paises, sort_by, numero, 5)
+
+    resultados["explorar.opciones_paises"] = medir(lambda: listar_paises(conn), repeticiones)
+    resultados["explorar.pagina_inicial"] = medir(lambda: pagina(), repeticiones)
+    resultados["explorar.pagina_1000"] = medir(lambda: pagina(numero=1000), repeticiones)
+    for termino in BUSQUEDAS:
+        resultados[f"explorar.busqueda[{termino}]"] = medir(lambda: pagina(termino), repeticiones)
+    paises = listar_paises(conn)[:3]
+    resultados["explorar.filtro_paises"] = medir(lambda: pagina(paises=paises), repeticiones)
+    resultados["explorar.filtro_estado_y_paises"] = medir(lambda: pagina(estado="Vulnerable", paises=paises), repeticiones)
+    for opcion in OPCIONES_ORDEN:
+        resultados[f"explorar.orden[{opcion}]"] = medir(lambda: pagina(sort_by=opcion), repeticiones)
+    return resultados
+
+
+def bench_analisis(conn, repeticiones):
+    def resumenes():
+        return (leer_conteo_estados(conn), leer_conteo_tendencia_estado(conn),
+                leer_top_amenazas(conn, 5), leer_conteo_riesgo(conn))
+
+    def recalculo_completo():
+        # Lo que hacía antes la página: leer todo y agregar en pandas
+        df = pd.read_sql_query('SELECT * FROM especies', conn)
+        df['estado_conservacion'].value_counts()
+        df.dropna(subset=['tendencia_poblacion']).groupby(['tendencia_poblacion', 'estado_conservacion']).size()
+        df['amenazas'].map(separar_amenazas).explode().value_counts().head(5)
+        pd.Series(categoria_riesgo(df['riesgo'])).value_counts()
+
+    return {
+        "analisis.resumenes": medir(resumenes, repeticiones),
+        "analisis.recalculo_completo": medir(recalculo_completo, max(1, repeticiones // 2)),
+    }
+
+
+def bench_almacen(conn, repeticiones):
+    # Memoria y tiempos del almacén columnar frente a un DataFrame con todas las columnas;
+    # este se mide sobre una muestra (memory_usage deep) y se escala al total de filas
+    almacen, t_carga = _cronometrar(lambda: AlmacenEspecies.cargar(conn))
+    filas = len(almacen)
+    muestra = pd.read_sql_query('SELECT * FROM especies LIMIT ?', conn, params=(MUESTRA_MEMORIA,))
+    bytes_completo = muestra.memory_usage(deep=True).sum() * filas / max(len(muestra), 1)
+    columnas = muestra[['id', 'estado_conservacion', 'tendencia_poblacion', 'poblacion_estimada', 'pais', 'amenazas']]
+    bytes_columnas = columnas.memory_usage(deep=True).sum() * filas / max(len(muestra), 1)
+    bytes_almacen = sum(almacen.memoria().values())
+    assert (almacen.conteo_estados().astype(object).to_numpy() == leer_conteo_estados(conn).astype(object).to_numpy()).all(), \
+        "El almacén no coincide con resumen_estado"
+
+    def agregados():
+        return (almacen.conteo_estados(), almacen.conteo_tendencia_estado(),
+                almacen.top_amenazas(5), almacen.conteo_riesgo())
+
+    # Puesta al día tras escrituras: el mismo almacén con la versión atrasada vuelve a aplicar
+    # las últimas CAMBIOS_RECIENTES entradas del registro (sin escribir en la base)
+    atrasado = copy.copy(almacen)
+    atrasado.version = max(almacen.version - CAMBIOS_RECIENTES, 0)
+    paises = listar_paises(conn)[:3]
+    return {
+        "almacen.carga": {"total_s": t_carga, "filas": filas},
+        "almacen.actualizar": {**medir(lambda: atrasado.actualizar(conn), repeticiones),
+                               "cambios": almacen.version - atrasado.version},
+        "almacen.memoria": {"bytes": int(bytes_almacen), "bytes_dataframe_completo": int(bytes_completo),
+                            "bytes_dataframe_mismas_columnas": int(bytes_columnas),
+                            "reduccion": float(bytes_completo / bytes_almacen) if bytes_almacen else None,
+                            "reduccion_mismas_columnas": float(bytes_columnas / bytes_almacen) if bytes_almacen else None,
+                            "por_columna": almacen.memoria()},
+        "almacen.agregados": medir(agregados, repeticiones),
+        "almacen.agregados_filtro_paises": medir(
+            lambda: [f(mascara=almacen.mascara_paises(paises)) for f in
+                     (almacen.conteo_estados, almacen.conteo_tendencia_estado, almacen.top_amenazas, almacen.conteo_riesgo)],
+            repeticiones),
+    }
+
+
+def bench_distribucion(conn, puntos, repeticiones):
+    # Inserción de puntos (con su índice R*Tree), cálculo de EOO/AOO por lotes y consultas por región
+    _, t_insertar = _cronometrar(lambda: poblar_ocurrencias(conn, puntos))
+    especies, t_actualizar = _cronometrar(lambda: actualizar_distribucion(conn))
+    regiones = {"pequena": (-75, -10, -70, -5), "continental": (-82, -56, -34, 13), "antimeridiano": (170, -50, -170, 10)}
+    resultados = {
+        "distribucion.insertar_puntos": {"total_s": t_insertar, "filas": puntos,
+                                         "filas_por_s": puntos / t_insertar if t_insertar else None},
+        "distribucion.eoo_aoo": {"total_s": t_actualizar, "filas": especies, "puntos": puntos},
+    }
+    for nombre, region in regiones.items():
+        resultados[f"distribucion.region[{nombre}]"] = medir(lambda: especies_en_region(conn, region), repeticiones)
+    return resultados
+
+
+def _clasificar_regla_original(poblacion, tendencia, amenazas_str):
+    # Regla de cuatro ramas anterior al motor de criterios A–E, fila a fila: la línea base de
+    # bench_clasificacion (clasificar_uicn ya es el motor aplicado a una sola fila)
+    if poblacion is None or poblacion != poblacion:
+        poblacion = 0
+    grupos = grupos_amenazas(amenazas_str)
+    if poblacion < 500 and "caza" in grupos and tendencia == "Decreciendo":
+        return "En Peligro Crítico (Sugerido)"
+    elif poblacion < 2500 and tendencia == "Decreciendo":
+        return "En Peligro (Sugerido)"
+    elif poblacion < 10000 and "deforestacion" in grupos:
+        return "Vulnerable (Sugerido)"
+    return "Preocupación Menor (Sugerido)"
+
+
+def _reglas_coinciden(df):
+    # Filas en las que, sin censos ni distribución, la regla original y el motor dan la misma
+    # categoría: En Peligro Crítico (1–50 individuos, caza, decreciendo), En Peligro (51–250,
+    # decreciendo, sin caza), Vulnerable (251–999, deforestación, sin declive) y Preocupación
+    # Menor (10.000 o más)
+    grupos = {texto: grupos_amenazas(texto) for texto in df['amenazas'].unique()}
+    caza = df['amenazas'].map(lambda t: "caza" in grupos[t]).to_numpy(dtype=bool)
+    deforestacion = df['amenazas'].map(lambda t: "deforestacion" in grupos[t]).to_numpy(dtype=bool)
+    decreciendo = (df['tendencia_poblacion'] == "Decreciendo").to_numpy()
+    p = df['poblacion_estimada'].to_numpy()
+    return (((p > 0) & (p <= 50) & caza & decreciendo) | ((p > 50) & (p <= 250) & ~caza & decreciendo)
+            | ((p > 250) & (p < 1000) & deforestacion & ~decreciendo) | (p >= 10000))
+
+
+def bench_clasificacion(n):
+    df = datos_aleatorios(n)
+    original, t_fila = _cronometrar(lambda: df.apply(
+        lambda row: _clasificar_regla_original(row['poblacion_estimada'], row['tendencia_poblacion'], row['amenazas']),
+        axis=1).to_numpy())
+    por_lote, t_lote = _cronometrar(lambda: clasificar_uicn_lote(
+        df['poblacion_estimada'], df['tendencia_poblacion'], df['amenazas'], df['pais']))
+    coinciden = _reglas_coinciden(df)
+    assert (original[coinciden] == por_lote[coinciden]).all(), "El motor no coincide con la regla original donde deberían"
+
+    # Una especie suelta por el motor (la sugerencia del formulario, una vez por ejecución de la página)
+    muestra = df.head(LLAMADAS_ESCALAR)
+    _, t_escalar = _cronometrar(lambda: [clasificar_uicn(*fila) for fila in muestra[
+        ['poblacion_estimada', 'tendencia_poblacion', 'amenazas', 'pais']].itertuples(index=False)])
+
+    return {
+        "clasificacion.regla_original": {"total_s": t_fila, "filas": n},
+        "clasificacion.lote": {"total_s": t_lote, "filas": n, "aceleracion": t_fila / t_lote,
+                               "filas_comparadas": int(coinciden.sum())},
+        "clasificacion.escalar": {"total_s": t_escalar, "llamadas": len(muestra),
+                                  "ms_por_llamada": t_escalar * 1000 / max(len(muestra), 1)},
+    }
+
+
+def bench_modelo(conn, repeticiones, puntuar_base):
+    # Entrenamiento del modelo de riesgo, puntuación en memoria (fila a fila frente a un producto
+    # de matrices) y, si la base es generada, la puntuación guardada de toda la tabla
+    modelo, t_entrenar = _cronometrar(lambda: entrenar(conn))
+    X, _ = leer_entrenamiento(conn, modelo['amenazas'])
+    muestra = X[:MUESTRA_POR_FILA]
+
+    def por_fila():
+        return [1 / (1 + math.exp(-(modelo['intercepto'] + sum(
+            c * (x - m) / e for c, x, m, e in zip(modelo['coeficientes'], fila, modelo['media'], modelo['escala'])))))
+            for fila in muestra.tolist()]
+
+    riesgo_fila, t_muestra = _cronometrar(por_fila)
+    t_fila = t_muestra * len(X) / max(len(muestra), 1)
+    riesgo_lote, t_lote = _cronometrar(lambda: puntuar(modelo, X))
+    assert np.allclose(riesgo_fila, riesgo_lote[:len(muestra)]), "puntuar no coincide con la versión por fila"
+    resultados = {
+        "modelo.entrenar": {"total_s": t_entrenar, "filas": modelo['n_entrenamiento'], "auc": modelo['metricas'].get('auc')},
+        "modelo.puntuar_fila": {"total_s": t_fila, "filas": len(X), "filas_medidas": len(muestra)},
+        "modelo.puntuar_lote": {"total_s": t_lote, "filas": len(X), "aceleracion": t_fila / t_lote if t_lote else None},
+    }
+    if puntuar_base:
+        filas, t_todas = _cronometrar(lambda: puntuar_especies(conn, modelo))
+        _, t_sin_cambios = _cronometrar(lambda: puntuar_especies(conn, modelo))
+        resultados["modelo.puntuar_tabla"] = {"total_s": t_todas, "filas": filas,
+                                              "filas_por_s": filas / t_todas if t_todas else None}
+        resultados["modelo.puntuar_sin_cambios"] = {"total_s": t_sin_cambios}
+    return resultados
+
+
+def bench_cambios(conn, repeticiones):
+    # Sincronización: las especies de los últimos cambios del registro frente a releer la tabla completa
+    version = version_actual(conn)
+    desde = max(version - CAMBIOS_RECIENTES, 0)
+    return {
+        "cambios.desde_recientes": {**medir(lambda: cambios_desde(conn, desde), repeticiones),
+                                    "entradas": version - desde},
+        "cambios.tabla_completa": medir(lambda: conn.execute('SELECT * FROM especies WHERE borrado IS NULL').fetchall(),
+                                        repeticiones),
+    }
+
+
+def _segundos(medicion):
+    return medicion.get("mediana_s", medicion.get("total_s"))
+
+
+def comparar(actual, anterior, tolerancia=0.2):
+    # Devuelve [(nombre, antes, ahora, cociente)] de las mediciones más lentas que 'tolerancia'
+    regresiones = []
+    for nombre, medicion in actual["resultados"].items():
+        previa = anterior.get("resultados", {}).get(nombre)
+        if not previa:
+            continue
+        antes, ahora = _segundos(previa), _segundos(medicion)
+        if antes and ahora and ahora > antes * (1 + tolerancia):
+            regresiones.append((nombre, antes, ahora, ahora / antes))
+    return regresiones
+
+
+def ejecutar(filas, repeticiones=5, ruta_db=None, filas_clasificacion=None, ocurrencias=0):
+    resultados = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        generada = ruta_db is None
+        if generada:
+            ruta_db = os.path.join(tmp_dir, "bench.db")
+            ruta_csv = os.path.join(tmp_dir, "especies.csv")
+            escribir_csv(ruta_csv, filas)
+            resultados.update(bench_importacion(ruta_db, ruta_csv, filas))
+
+        conn = abrir_conexion(ruta_db)
+        try:
+            crear_tablas(conn)
+            filas = conn.execute('SELECT COUNT(*) FROM especies').fetchone()[0]
+            resultados.update(bench_explorar(conn, repeticiones))
+            resultados.update(bench_analisis(conn, repeticiones))
+            resultados.update(bench_almacen(conn, repeticiones))
+            resultados.update(bench_modelo(conn, repeticiones, generada)) # Solo escribe puntuaciones en la base generada
+            resultados.update(bench_cambios(conn, repeticiones))
+            if ocurrencias and generada: # No se escriben puntos en una base existente (--db)
+                resultados.update(bench_distribucion(conn, ocurrencias, repeticiones))
+        finally:
+            conn.close()
+
+    resultados.update(bench_clasificacion(filas_clasificacion or filas))
+    return {
+        "meta": {
+            "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "filas": filas,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "plataforma": platform.platform(),
+        },
+        "resultados": resultados,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de BioGuard con datos sintéticos.")
+    parser.add_argument("--filas", type=int, default=100000, help="Especies sintéticas a generar")
+    parser.add_argument("--db", help="Usar esta base de datos existente en vez de generar una")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--filas-clasificacion", type=int, help="Filas para el benchmark de clasificación (por defecto, --filas)")
+    parser.add_argument("--ocurrencias", type=int, default=0,
+                        help="Puntos de ocurrencia a generar para medir EOO/AOO y consultas por región")
+    parser.add_argument("--salida", help="Guardar los resultados en este archivo JSON")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior para detectar regresiones")
+    args = parser.parse_args(argv)
+
+    informe = ejecutar(args.filas, args.repeticiones, args.db, args.filas_clasificacion, args.ocurrencias)
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            f.write(texto)
+    print(texto)
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            anterior = json.load(f)
+        if anterior.get("meta", {}).get("filas") != informe["meta"]["filas"]:
+            print("Aviso: la ejecución anterior usó otro número de filas; la comparación no es directa.", file=sys.stderr)
+        regresiones = comparar(informe, anterior)
+        for nombre, antes, ahora, cociente in regresiones:
+            print(f"REGRESIÓN {nombre}: {antes:.4f} s -> {ahora:.4f} s (x{cociente:.2f})", file=sys.stderr)
+        if regresiones:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
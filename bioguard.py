@@ -0,0 +1,219 @@
+import argparse
+import json
+import sys
+
+from conexion import abrir_conexion
+from consultas import (ESTADOS_CONSERVACION, OPCIONES_ORDEN, SQL_CONTEO_ESTADOS, SQL_CONTEO_RIESGO,
+                       SQL_CONTEO_TENDENCIA_ESTADO, SQL_TOP_AMENAZAS)
+from crear_db import DB_PATH, crear_tablas
+from exportador import FORMATOS, TAMANO_LOTE_EXPORTAR, exportar_especies, parquet_disponible
+
+# --- Línea de Comandos de BioGuard ---
+# Las mismas consultas y clasificadores que usa app.py, sin Streamlit ni Plotly,
+# para tareas programadas (cron) sobre bases grandes. pandas y numpy solo se
+# cargan en los subcomandos que los necesitan (reclasificar, importar, censos, distribucion, riesgo, resumenes).
+#   python bioguard.py exportar --estado Vulnerable --pais Perú --salida vulnerables.csv
+#   python bioguard.py exportar --formato parquet --salida especies.parquet
+#   python bioguard.py reclasificar
+#   python bioguard.py analisis --formato json
+#   python bioguard.py importar especies.csv --rechazos rechazadas.csv
+#   python bioguard.py censos actualizar
+#   python bioguard.py distribucion importar ocurrencias.csv
+#   python bioguard.py riesgo entrenar
+#   python bioguard.py cambios desde 1500 --salida cambios.jsonl
+#   python bioguard.py exportar --region -80 -20 -60 0 --salida region.csv
+
+
+def analisis(conn, limite_amenazas=5):
+    def filas(sql, params=()):
+        return [dict(fila) for fila in conn.execute(sql, params)]
+
+    return {
+        "estados": filas(SQL_CONTEO_ESTADOS),
+        "tendencia_estado": filas(SQL_CONTEO_TENDENCIA_ESTADO),
+        "top_amenazas": filas(SQL_TOP_AMENAZAS, (limite_amenazas,)),
+        "riesgo": filas(SQL_CONTEO_RIESGO),
+    }
+
+
+def _imprimir_analisis(informe):
+    titulos = {
+        "estados": "Especies por estado de conservación",
+        "tendencia_estado": "Tendencia poblacional por estado",
+        "top_amenazas": "Amenazas más comunes",
+        "riesgo": "Riesgo futuro (modelo)",
+    }
+    for clave, titulo in titulos.items():
+        print(f"== {titulo} ==")
+        if not informe[clave]:
+            print("  (sin datos)")
+        for fila in informe[clave]:
+            *etiquetas, n = fila.values()
+            print(f"  {' / '.join(str(e) for e in etiquetas)}: {n}")
+        print()
+
+
+# --- Subcomandos ---
+def _cmd_exportar(args, conn):
+    filtros = (args.buscar, args.estado, args.pais, args.orden, args.lote)
+    if args.formato == "parquet" and not parquet_disponible():
+        print("La exportación a Parquet necesita pyarrow (pip install pyarrow).", file=sys.stderr)
+        return 2
+    if args.salida:
+        if args.formato == "parquet":
+            filas = exportar_especies(conn, args.salida, "parquet", *filtros, region=args.region)
+        else:
+            with open(args.salida, "w", encoding="utf-8", newline="") as f:
+                filas = exportar_especies(conn, f, "csv", *filtros, region=args.region)
+        print(f"{filas} especies exportadas a {args.salida}", file=sys.stderr)
+    elif args.formato == "parquet":
+        print("La exportación a Parquet necesita --salida.", file=sys.stderr)
+        return 2
+    else:
+        exportar_especies(conn, sys.stdout, "csv", *filtros, region=args.region)
+    return 0
+
+
+def _cmd_reclasificar(args, conn):
+    from clasificacion import reclasificar_especies
+    total = reclasificar_especies(conn, args.lote)
+    print(f"Se reclasificaron {total} especies.")
+    return 0
+
+
+def _cmd_analisis(args, conn):
+    informe = analisis(conn, args.top)
+    if args.formato == "json":
+        print(json.dumps(informe, indent=2, ensure_ascii=False))
+    else:
+        _imprimir_analisis(informe)
+    return 0
+
+
+def _cmd_importar(args):
+    import importador
+    argv = [args.csv, "--db", args.db, "--lote", str(args.lote)]
+    if args.rechazos:
+        argv += ["--rechazos", args.rechazos]
+    if args.duplicados:
+        argv.append("--duplicados")
+    importador.main(argv)
+    return 0
+
+
+def _cmd_censos(args):
+    import censos
+    argv = [args.accion] + ([args.csv] if args.csv else []) + (["--todas"] if args.todas else [])
+    return censos.main(argv + ["--db", args.db])
+
+
+def _cmd_distribucion(args):
+    import distribucion
+    argv = [args.accion] + ([args.archivo] if args.archivo else []) + (["--todas"] if args.todas else [])
+    if args.region:
+        argv += ["--region"] + [str(v) for v in args.region]
+    return distribucion.main(argv + ["--db", args.db])
+
+
+def _cmd_riesgo(args):
+    import modelo_riesgo
+    return modelo_riesgo.main([args.accion] + (["--todas"] if args.todas else []) + ["--db", args.db])
+
+
+def _cmd_cambios(args):
+    import cambios
+    argv = [args.accion] + ([str(args.valor)] if args.valor is not None else []) + ["--dias", str(args.dias)]
+    if args.salida:
+        argv += ["--salida", args.salida]
+    if args.hasta is not None:
+        argv += ["--hasta", str(args.hasta)]
+    return cambios.main(argv + ["--db", args.db])
+
+
+def _cmd_resumenes(args):
+    import resumenes
+    return resumenes.main([args.accion, "--db", args.db])
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(description="Consultas, exportaciones y tareas por lotes de BioGuard sin la interfaz web.")
+    parser.add_argument("--db", default=DB_PATH, help=f"Base de datos SQLite (por defecto: {DB_PATH})")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    p = subparsers.add_parser("exportar", help="Exporta las especies que cumplen los filtros")
+    p.add_argument("--buscar", default="", help="Texto libre (nombre, nombre científico, descripción, amenazas)")
+    p.add_argument("--estado", default="Todos", choices=["Todos"] + ESTADOS_CONSERVACION)
+    p.add_argument("--pais", action="append", help="País; se puede repetir (basta con que coincida uno)")
+    p.add_argument("--orden", default=None, choices=OPCIONES_ORDEN,
+                   help="Por defecto, por relevancia con --buscar y por nombre sin él")
+    p.add_argument("--region", nargs=4, type=float, metavar=("LON_MIN", "LAT_MIN", "LON_MAX", "LAT_MAX"),
+                   help="Solo especies con ocurrencias o rangos en esta región")
+    p.add_argument("--formato", choices=list(FORMATOS), default="csv", help="parquet necesita pyarrow")
+    p.add_argument("--salida", help="Archivo de salida (por defecto, la salida estándar; obligatorio para parquet)")
+    p.add_argument("--lote", type=int, default=TAMANO_LOTE_EXPORTAR, help="Filas leídas por lote")
+    p.set_defaults(funcion=_cmd_exportar)
+
+    p = subparsers.add_parser("reclasificar", help="Recalcula el estado sugerido UICN de todas las especies")
+    p.add_argument("--lote", type=int, default=50000, help="Filas por lote")
+    p.set_defaults(funcion=_cmd_reclasificar)
+
+    p = subparsers.add_parser("analisis", help="Muestra los agregados del dashboard de análisis")
+    p.add_argument("--top", type=int, default=5, help="Número de amenazas más comunes a mostrar")
+    p.add_argument("--formato", choices=["texto", "json"], default="texto")
+    p.set_defaults(funcion=_cmd_analisis)
+
+    p = subparsers.add_parser("importar", help="Importa especies desde un CSV (como importador.py)")
+    p.add_argument("csv", help="Ruta del archivo CSV a importar")
+    p.add_argument("--lote", type=int, default=50000, help="Filas por lote")
+    p.add_argument("--rechazos", help="Archivo CSV donde guardar las filas rechazadas")
+    p.add_argument("--duplicados", action="store_true", help="Buscar casi duplicados entre las especies nuevas")
+    p.set_defaults(funcion=_cmd_importar, sin_conexion=True)
+
+    p = subparsers.add_parser("censos", help="Importa censos y recalcula las tendencias poblacionales")
+    p.add_argument("accion", choices=["importar", "actualizar"])
+    p.add_argument("csv", nargs="?", help="CSV de censos (para 'importar')")
+    p.add_argument("--todas", action="store_true", help="Recalcular todas las especies con censos")
+    p.set_defaults(funcion=_cmd_censos, sin_conexion=True)
+
+    p = subparsers.add_parser("distribucion", help="Importa ocurrencias o rangos y recalcula EOO/AOO")
+    p.add_argument("accion", choices=["importar", "rangos", "actualizar", "region"])
+    p.add_argument("archivo", nargs="?", help="CSV de ocurrencias ('importar') o GeoJSON de rangos ('rangos')")
+    p.add_argument("--region", nargs=4, type=float, metavar=("LON_MIN", "LAT_MIN", "LON_MAX", "LAT_MAX"))
+    p.add_argument("--todas", action="store_true", help="Recalcular todas las especies con registros")
+    p.set_defaults(funcion=_cmd_distribucion, sin_conexion=True)
+
+    p = subparsers.add_parser("riesgo", help="Entrena el modelo de riesgo futuro o puntúa las especies")
+    p.add_argument("accion", choices=["entrenar", "puntuar", "info"])
+    p.add_argument("--todas", action="store_true", help="Volver a puntuar todas las especies")
+    p.set_defaults(funcion=_cmd_riesgo, sin_conexion=True)
+
+    p = subparsers.add_parser("cambios", help="Registro de cambios: sincronización incremental, borradas y auditoría")
+    p.add_argument("accion", choices=["version", "desde", "historial", "borradas", "restaurar", "purgar", "compactar"])
+    p.add_argument("valor", nargs="?", type=int, help="Versión (para 'desde') o id de especie")
+    p.add_argument("--salida", help="Archivo JSON Lines para 'desde' (por defecto, la salida estándar)")
+    p.add_argument("--dias", type=int, default=30, help="Antigüedad mínima del borrado para 'purgar'")
+    p.add_argument("--hasta", type=int, help="Versión hasta la que compactar")
+    p.set_defaults(funcion=_cmd_cambios, sin_conexion=True)
+
+    p = subparsers.add_parser("resumenes", help="Reconstruye o verifica los resúmenes precalculados")
+    p.add_argument("accion", choices=["reconstruir", "verificar"])
+    p.set_defaults(funcion=_cmd_resumenes, sin_conexion=True)
+    return parser
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    if getattr(args, "sin_conexion", False):
+        # Estos subcomandos abren su propia conexión
+        return args.funcion(args)
+
+    conn = abrir_conexion(args.db)
+    try:
+        crear_tablas(conn)
+        return args.funcion(args, conn)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
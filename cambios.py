@@ -0,0 +1,179 @@
+import argparse
+import json
+import sqlite3
+import sys
+
+from amenazas import vincular_amenazas_lote
+from crear_db import DB_PATH, crear_tablas
+from paises import vincular_paises_lote
+
+# --- Registro de Cambios, Borrado Lógico y Sincronización Incremental ---
+# Los triggers de crear_db.crear_cambios anotan en 'cambios' cada alta, modificación,
+# borrado, restauración o eliminación definitiva de una especie, con su fecha y las
+# columnas que cambiaron. La tabla es de solo inserción y su clave 'version' crece con
+# cada cambio confirmado, así que sirve a la vez de auditoría y de cursor de sincronización:
+# un consumidor guarda la última versión que leyó y pide solo lo posterior.
+# Borrar una especie solo marca la columna 'borrado' (se puede restaurar); las consultas
+# y los resúmenes la ignoran desde ese momento. 'purgar' la elimina de verdad.
+#   python cambios.py version                       -> versión actual de los datos
+#   python cambios.py desde 1500 --salida c.jsonl   -> especies cambiadas después de la versión 1500
+#   python cambios.py historial 42                  -> cambios registrados de una especie
+#   python cambios.py borradas | restaurar 42 | purgar --dias 30
+#   python cambios.py compactar --hasta 1500        -> deja un cambio por especie hasta esa versión
+
+LIMITE_CAMBIOS = 10000
+# Formato de fecha de 'borrado' y de cambios.fecha (UTC, con milisegundos)
+_AHORA_SQL = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+
+def version_actual(conn):
+    # Última versión asignada (0 si aún no hay cambios); se lee de sqlite_sequence, sin recorrer 'cambios'
+    fila = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'cambios'").fetchone()
+    return fila[0] if fila else 0
+
+
+# --- Borrado lógico ---
+def borrar_especie(conn, especie_id):
+    # Marca la especie como borrada; los triggers la descuentan de los resúmenes y quitan sus
+    # enlaces a países y amenazas. No hace commit. Devuelve False si no existía o ya estaba borrada.
+    cursor = conn.execute(f'UPDATE especies SET borrado = {_AHORA_SQL} WHERE id = ? AND borrado IS NULL',
+                          (especie_id,))
+    return cursor.rowcount > 0
+
+
+def restaurar_especie(conn, especie_id):
+    # Deshace el borrado lógico y vuelve a enlazar países y amenazas a partir de sus columnas de texto.
+    # No hace commit. Devuelve False si la especie no estaba borrada.
+    fila = conn.execute('SELECT pais, amenazas FROM especies WHERE id = ? AND borrado IS NOT NULL',
+                        (especie_id,)).fetchone()
+    if fila is None:
+        return False
+    conn.execute('UPDATE especies SET borrado = NULL WHERE id = ?', (especie_id,))
+    vincular_paises_lote(conn, [(especie_id, fila[0])])
+    vincular_amenazas_lote(conn, [(especie_id, fila[1])])
+    return True
+
+
+def especies_borradas(conn, limite=100):
+    # Las borradas más recientes primero: [(id, nombre, nombre científico, fecha de borrado)]
+    return conn.execute('SELECT id, nombre, nombre_cientifico, borrado FROM especies WHERE borrado IS NOT NULL '
+                        'ORDER BY borrado DESC LIMIT ?', (limite,)).fetchall()
+
+
+def purgar_borradas(conn, dias=30):
+    # Elimina definitivamente las especies borradas hace más de 'dias' días (con sus censos,
+    # ocurrencias, etc., por los triggers de borrado). No hace commit. Devuelve cuántas.
+    cursor = conn.execute("DELETE FROM especies WHERE borrado IS NOT NULL "
+                          "AND borrado < strftime('%Y-%m-%d %H:%M:%f', 'now', ?)", (f'-{dias} days',))
+    return cursor.rowcount
+
+
+# --- Sincronización incremental ---
+def cambios_desde(conn, version, limite=LIMITE_CAMBIOS):
+    # Especies con cambios posteriores a 'version', en orden de versión, como (ultima_version, filas).
+    # Cada especie sale una vez con su estado actual: 'operacion' es 'guardar' (con 'especie', la fila
+    # completa) o 'borrar' (borrada o eliminada). Se leen como mucho 'limite' entradas del registro;
+    # para la página siguiente se vuelve a llamar con la ultima_version devuelta, y cuando no hay
+    # más cambios devuelve (version, []). Es una sola consulta por la clave primaria de 'cambios',
+    # así que el registro y las filas salen de la misma instantánea.
+    cursor = conn.execute('''
+        WITH pagina AS (
+            SELECT version, especie_id FROM cambios WHERE version > ? ORDER BY version LIMIT ?
+        )
+        SELECT p.version, p.especie_id, e.*
+        FROM (SELECT especie_id, MAX(version) AS version FROM pagina GROUP BY especie_id) p
+        LEFT JOIN especies e ON e.id = p.especie_id
+        ORDER BY p.version
+    ''', (version, limite))
+    columnas = [d[0] for d in cursor.description[2:]]
+    filas = []
+    for fila in cursor:
+        especie = dict(zip(columnas, fila[2:]))
+        if especie['id'] is None or especie['borrado'] is not None:
+            filas.append({'version': fila[0], 'id': fila[1], 'operacion': 'borrar'})
+        else:
+            filas.append({'version': fila[0], 'id': fila[1], 'operacion': 'guardar', 'especie': especie})
+    return (filas[-1]['version'] if filas else version), filas
+
+
+def historial(conn, especie_id):
+    # Cambios registrados de una especie: [(version, operacion, columnas, fecha)]
+    return conn.execute('SELECT version, operacion, columnas, fecha FROM cambios WHERE especie_id = ? '
+                        'ORDER BY version', (especie_id,)).fetchall()
+
+
+def compactar(conn, hasta_version):
+    # Hasta 'hasta_version' deja solo el último cambio de cada especie. Sincronizar desde cualquier
+    # versión sigue dando el mismo resultado (solo importa el último cambio de cada especie), pero
+    # se pierde el detalle de auditoría de ese tramo. No hace commit. Devuelve las entradas borradas.
+    cursor = conn.execute('''
+        DELETE FROM cambios WHERE version <= ? AND version NOT IN (
+            SELECT MAX(version) FROM cambios WHERE version <= ? GROUP BY especie_id)
+    ''', (hasta_version, hasta_version))
+    return cursor.rowcount
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Registro de cambios, borrado lógico y sincronización incremental.")
+    parser.add_argument("accion", choices=["version", "desde", "historial", "borradas", "restaurar", "purgar",
+                                           "compactar"])
+    parser.add_argument("valor", nargs="?", type=int, help="Versión (para 'desde') o id de especie")
+    parser.add_argument("--limite", type=int, default=LIMITE_CAMBIOS, help="Entradas del registro por página")
+    parser.add_argument("--salida", default=None, help="Archivo JSON Lines para 'desde' (por defecto, la consola)")
+    parser.add_argument("--dias", type=int, default=30, help="Antigüedad mínima del borrado para 'purgar'")
+    parser.add_argument("--hasta", type=int, default=None, help="Versión hasta la que compactar")
+    parser.add_argument("--db", default=DB_PATH, help=f"Base de datos SQLite (por defecto: {DB_PATH})")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        crear_tablas(conn)
+        if args.accion == "version":
+            print(version_actual(conn))
+        elif args.accion == "desde":
+            # Todas las páginas hasta la versión actual, una especie por línea
+            version, total = args.valor or 0, 0
+            salida = open(args.salida, 'w', encoding='utf-8') if args.salida else sys.stdout
+            try:
+                while True:
+                    version, filas = cambios_desde(conn, version, args.limite)
+                    if not filas:
+                        break
+                    for fila in filas:
+                        salida.write(json.dumps(fila, ensure_ascii=False) + "\n")
+                    total += len(filas)
+            finally:
+                if args.salida:
+                    salida.close()
+            print(f"{total} especies cambiadas; continúa desde la versión {version}.", file=sys.stderr)
+        elif args.accion == "historial":
+            if args.valor is None:
+                parser.error("indica el id de la especie")
+            for version, operacion, columnas, fecha in historial(conn, args.valor):
+                print(f"{version}\t{fecha}\t{operacion}\t{columnas or ''}")
+        elif args.accion == "borradas":
+            for especie_id, nombre, nombre_cientifico, borrado in especies_borradas(conn):
+                print(f"{especie_id}\t{borrado}\t{nombre} ({nombre_cientifico or 'N/A'})")
+        elif args.accion == "restaurar":
+            if args.valor is None:
+                parser.error("indica el id de la especie")
+            restaurada = restaurar_especie(conn, args.valor)
+            conn.commit()
+            print("Especie restaurada." if restaurada else "La especie no está borrada.")
+        elif args.accion == "purgar":
+            eliminadas = purgar_borradas(conn, args.dias)
+            conn.commit()
+            print(f"{eliminadas} especies eliminadas definitivamente.")
+        elif args.accion == "compactar":
+            if args.hasta is None:
+                parser.error("indica --hasta")
+            borradas = compactar(conn, args.hasta)
+            conn.commit()
+            print(f"{borradas} entradas del registro compactadas.")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
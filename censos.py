@@ -0,0 +1,178 @@
+import argparse
+import sqlite3
+import sys
+
+import numpy as np
+import pandas as pd
+
+from clasificacion import reclasificar_ids
+from crear_db import DB_PATH, crear_tablas
+
+# --- Series Temporales de Censos y Tendencias Poblacionales ---
+# 'censos' guarda cada conteo publicado (especie, fecha, conteo, fuente) y nunca se
+# modifica. Para cada especie se ajusta una regresión log-lineal del conteo contra
+# el tiempo en ventanas de 3 y 10 años antes de su último censo; la pendiente da la
+# tasa de cambio y el declive (fracción perdida en la ventana), que alimentan
+# tendencia_poblacion, poblacion_estimada y el clasificador UICN. La varianza residual
+# a 10 años alimenta el criterio E (probabilidad de extinción).
+# Un trigger anota en 'censos_pendientes' las especies con censos nuevos, así que
+# solo se recalculan esas.
+#   python censos.py importar censos.csv   -> columnas especie_id, fecha, conteo, fuente
+#   python censos.py actualizar            -> recalcula las especies pendientes
+#   python censos.py actualizar --todas    -> recalcula todo el historial
+
+VENTANAS = (3, 10)
+# Cambio anual por debajo del cual la tendencia se considera estable
+UMBRAL_ESTABLE = 0.01
+COLUMNAS_CENSO = ['especie_id', 'fecha', 'conteo', 'fuente']
+
+
+def registrar_censos(conn, filas):
+    # filas: iterable de (especie_id, fecha 'AAAA-MM-DD', conteo, fuente). No hace commit.
+    conn.executemany('INSERT INTO censos (especie_id, fecha, conteo, fuente) VALUES (?, ?, ?, ?)', filas)
+
+
+# --- Regresión agrupada (vectorizada) ---
+def _regresion(especie, x, y, mascara):
+    # Mínimos cuadrados por grupo con sumas agregadas: una sola pasada de groupby por ventana.
+    # Devuelve la pendiente y la varianza residual (la del ruido alrededor de la tendencia).
+    datos = pd.DataFrame({'n': 1, 'x': x, 'y': y, 'xx': x * x, 'xy': x * y, 'yy': y * y})[mascara]
+    s = datos.groupby(especie[mascara]).sum()
+    denominador = s['n'] * s['xx'] - s['x'] ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pendiente = (s['n'] * s['xy'] - s['x'] * s['y']) / denominador
+        ordenada = (s['y'] - pendiente * s['x']) / s['n']
+        residuo = s['yy'] - ordenada * s['y'] - pendiente * s['xy']
+        varianza = (residuo / (s['n'] - 2)).clip(lower=0)
+    # Con una sola fecha en la ventana no hay pendiente; con dos, tampoco varianza
+    pendiente = pendiente.where(denominador > 1e-9)
+    return pendiente, varianza.where(pendiente.notna() & (s['n'] > 2))
+
+
+def calcular_tendencias(censos, ventanas=VENTANAS):
+    # censos: DataFrame con especie_id, fecha, conteo. Devuelve una fila por especie.
+    censos = censos.sort_values(['especie_id', 'fecha'], kind='stable')
+    especie = censos['especie_id'].to_numpy()
+    fecha = pd.to_datetime(censos['fecha'])
+    ultima = fecha.groupby(especie).transform('max')
+    # x: años respecto del último censo de la especie (<= 0); y: log del conteo
+    x = ((fecha - ultima).dt.days / 365.25).to_numpy()
+    y = np.log1p(censos['conteo'].to_numpy(dtype='float64'))
+
+    por_especie = censos.groupby(especie)
+    resultado = pd.DataFrame({
+        'n_censos': por_especie.size(),
+        'ultima_fecha': por_especie['fecha'].last(),
+        'ultimo_conteo': por_especie['conteo'].last(),
+    })
+    for ventana in ventanas:
+        pendiente, varianza = _regresion(pd.Series(especie), x, y, x >= -ventana)
+        resultado[f'pendiente_{ventana}'] = pendiente
+        resultado[f'declive_{ventana}'] = 1 - np.exp(pendiente * ventana)
+        resultado[f'varianza_{ventana}'] = varianza
+
+    # La tendencia sale de la ventana más larga con pendiente; si no, de la más corta
+    pendiente = resultado[f'pendiente_{max(ventanas)}'].fillna(resultado[f'pendiente_{min(ventanas)}'])
+    cambio_anual = np.exp(pendiente) - 1
+    resultado['tendencia'] = np.select(
+        [cambio_anual <= -UMBRAL_ESTABLE, cambio_anual >= UMBRAL_ESTABLE, cambio_anual.notna()],
+        ["Decreciendo", "Creciendo", "Estable"], default=None)
+    resultado.index.name = 'especie_id'
+    return resultado.reset_index()
+
+
+# --- Actualización incremental ---
+def _guardar_tendencias(conn, tendencias):
+    filas = tendencias[['especie_id', 'n_censos', 'ultima_fecha', 'ultimo_conteo', 'pendiente_3', 'declive_3',
+                        'pendiente_10', 'declive_10', 'varianza_10', 'tendencia']].astype(object)
+    filas = filas.where(filas.notna(), None)
+    conn.executemany('''
+        INSERT OR REPLACE INTO tendencias_censo (especie_id, n_censos, ultima_fecha, ultimo_conteo, pendiente_3,
+                                                 declive_3, pendiente_10, declive_10, varianza_10, tendencia)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', filas.itertuples(index=False, name=None))
+    # La especie toma el último conteo y la tendencia calculada; los triggers de resumen
+    # actualizan el dashboard (incluido el riesgo futuro). Solo se tocan las que cambian.
+    conn.executemany('''
+        UPDATE especies SET poblacion_estimada = ?, tendencia_poblacion = COALESCE(?, tendencia_poblacion)
+        WHERE id = ? AND (poblacion_estimada IS NOT ? OR tendencia_poblacion IS NOT COALESCE(?, tendencia_poblacion))
+    ''', [(conteo, tendencia, especie_id, conteo, tendencia)
+          for especie_id, conteo, tendencia in filas[['especie_id', 'ultimo_conteo', 'tendencia']].itertuples(index=False)])
+
+
+def actualizar_tendencias(conn, especie_ids=None, tamano_lote=5000):
+    # Recalcula las especies indicadas o, por defecto, las anotadas en censos_pendientes
+    if especie_ids is None:
+        especie_ids = [fila[0] for fila in conn.execute('SELECT especie_id FROM censos_pendientes')]
+    ids = sorted(set(especie_ids))
+    try:
+        for i in range(0, len(ids), tamano_lote):
+            trozo = ids[i:i + tamano_lote]
+            marcadores = ", ".join("?" for _ in trozo)
+            censos = pd.read_sql_query(f'SELECT especie_id, fecha, conteo FROM censos '
+                                       f'WHERE especie_id IN ({marcadores}) ORDER BY especie_id, fecha, id',
+                                       conn, params=trozo)
+            if not censos.empty:
+                _guardar_tendencias(conn, calcular_tendencias(censos))
+                reclasificar_ids(conn, trozo)
+            conn.executemany('DELETE FROM censos_pendientes WHERE especie_id = ?', ((e,) for e in trozo))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(ids)
+
+
+def importar_censos(conn, origen, tamano_lote=50000):
+    # CSV con COLUMNAS_CENSO; se ignoran filas sin especie conocida, fecha o conteo válidos
+    conocidas = {fila[0] for fila in conn.execute('SELECT id FROM especies WHERE borrado IS NULL')}
+    insertadas = rechazadas = 0
+    try:
+        for lote in pd.read_csv(origen, chunksize=tamano_lote, dtype=str):
+            faltantes = [c for c in COLUMNAS_CENSO[:3] if c not in lote.columns]
+            if faltantes:
+                raise ValueError(f"Faltan columnas en el CSV de censos: {', '.join(faltantes)}")
+            especie_id = pd.to_numeric(lote['especie_id'], errors='coerce')
+            fecha = pd.to_datetime(lote['fecha'], errors='coerce', format='%Y-%m-%d')
+            conteo = pd.to_numeric(lote['conteo'], errors='coerce')
+            validas = especie_id.isin(conocidas) & fecha.notna() & (conteo >= 0)
+            fuente = lote['fuente'] if 'fuente' in lote.columns else pd.Series(None, index=lote.index)
+            registrar_censos(conn, zip(especie_id[validas].astype('int64').tolist(),
+                                       fecha[validas].dt.strftime('%Y-%m-%d').tolist(),
+                                       conteo[validas].astype('int64').tolist(),
+                                       fuente[validas].astype(object).where(fuente[validas].notna(), None).tolist()))
+            insertadas += int(validas.sum())
+            rechazadas += int((~validas).sum())
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return insertadas, rechazadas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Historial de censos y cálculo de tendencias poblacionales.")
+    parser.add_argument("accion", choices=["importar", "actualizar"])
+    parser.add_argument("csv", nargs="?", help="CSV de censos (para 'importar')")
+    parser.add_argument("--todas", action="store_true", help="Recalcular todas las especies con censos")
+    parser.add_argument("--db", default=DB_PATH, help=f"Base de datos SQLite (por defecto: {DB_PATH})")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        crear_tablas(conn)
+        if args.accion == "importar":
+            if not args.csv:
+                parser.error("indica el CSV de censos")
+            insertadas, rechazadas = importar_censos(conn, args.csv)
+            print(f"{insertadas} censos registrados, {rechazadas} filas rechazadas.")
+        ids = [fila[0] for fila in conn.execute('SELECT DISTINCT especie_id FROM censos')] if args.todas else None
+        actualizadas = actualizar_tendencias(conn, ids)
+        print(f"Tendencias recalculadas para {actualizadas} especies.")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+
+from amenazas import especies_con_grupo, grupos_amenazas, separar_amenazas
+from criterios_uicn import evaluar_criterios
+from paises import separar_paises
+
+# --- Clasificación Automática UICN ---
+# Las reglas de los criterios A–E viven en criterios_uicn.py como datos compilados a
+# predicados de NumPy. Aquí se arman sus variables a partir de las columnas de la
+# tabla especies (población, tendencia, amenazas, países) y, si existen, de los
+# censos y la distribución (parámetro 'datos').
+def clasificar_uicn(poblacion, tendencia, amenazas_str, paises_str, datos=None, explicar=False):
+    # Una especie (sugerencia del formulario) por el mismo motor, como lote de una fila: unos 3 ms,
+    # una vez por ejecución de la página (los campos de un formulario no la relanzan al editarse)
+    datos = {k: [v] for k, v in (datos or {}).items()}
+    sugeridos, explicaciones = clasificar_uicn_lote([poblacion], [tendencia], [amenazas_str], [paises_str],
+                                                    datos=datos, explicar=True)
+    return (sugeridos[0], explicaciones[0]) if explicar else sugeridos[0]
+
+
+def _por_valor_unico(textos, funcion):
+    # Las cadenas de amenazas y países se repiten mucho: se evalúan una vez por valor distinto
+    codigos, unicos = pd.factorize(pd.Series(textos).fillna('').astype(str))
+    return np.array([funcion(texto) for texto in unicos])[codigos] if len(unicos) else np.array([])
+
+
+def variables_especies(poblacion, tendencia, amenazas=None, paises=None, datos=None):
+    # Variables del motor de reglas. 'datos' (dict o DataFrame) aporta o reemplaza las que se
+    # conozcan de antemano (p. ej. 'amenazada' y 'perdida_habitat' desde especie_amenaza).
+    variables = dict(datos.items()) if datos is not None else {}
+    variables['poblacion'] = pd.to_numeric(pd.Series(poblacion), errors='coerce').to_numpy(dtype='float64')
+    decreciendo = pd.Series(tendencia).to_numpy(dtype=object) == "Decreciendo"
+    if amenazas is not None:
+        if 'amenazada' not in variables:
+            variables['amenazada'] = _por_valor_unico(amenazas, lambda t: bool(separar_amenazas(t)))
+        if 'perdida_habitat' not in variables:
+            variables['perdida_habitat'] = _por_valor_unico(amenazas, lambda t: "deforestacion" in grupos_amenazas(t))
+    if paises is not None and 'n_localidades' not in variables:
+        variables['n_localidades'] = _por_valor_unico(paises, lambda t: len(separar_paises(t)) or np.nan)
+    perdida_habitat = pd.Series(variables.pop('perdida_habitat', False)).fillna(False).to_numpy(dtype=bool)
+    variables['declive_continuo'] = decreciendo | perdida_habitat
+    return variables
+
+
+# --- Versión por lotes (vectorizada) ---
+# Evalúa todas las especies de una pasada; con explicar=True devuelve también el texto
+# con los criterios que justifican cada sugerencia (columna criterios_uicn).
+def clasificar_uicn_lote(poblacion, tendencia, amenazas=None, paises=None, datos=None, explicar=False):
+    categorias, explicaciones = evaluar_criterios(variables_especies(poblacion, tendencia, amenazas, paises, datos))
+    sugeridos = (pd.Series(categorias, dtype=object) + " (Sugerido)").to_numpy(dtype=object)
+    return (sugeridos, explicaciones) if explicar else sugeridos
+
+
+# Variables guardadas en la base: censos (tendencias_censo), distribución (EOO/AOO),
+# países y amenazas enlazados
+_SQL_RECLASIFICAR = (
+    'SELECT e.id, e.poblacion_estimada, e.tendencia_poblacion, '
+    't.declive_3, t.declive_10, t.pendiente_10, t.varianza_10, d.eoo_km2, d.aoo_km2, '
+    '(SELECT NULLIF(COUNT(*), 0) FROM especie_pais ep WHERE ep.especie_id = e.id) AS n_localidades, '
+    'EXISTS (SELECT 1 FROM especie_amenaza ea WHERE ea.especie_id = e.id) AS amenazada '
+    'FROM especies e LEFT JOIN tendencias_censo t ON t.especie_id = e.id '
+    'LEFT JOIN distribucion_especie d ON d.especie_id = e.id '
+    'WHERE e.borrado IS NULL' # Las borradas no tienen países ni amenazas enlazados: se dejan como estaban
+)
+_VARIABLES_GUARDADAS = ['declive_3', 'declive_10', 'pendiente_10', 'varianza_10', 'eoo_km2', 'aoo_km2',
+                        'n_localidades', 'amenazada']
+
+
+def _reclasificar_lote(conn, lote):
+    # La pérdida de hábitat sale de los ids indexados de especie_amenaza, sin volver a partir texto
+    if lote.empty:
+        return 0
+    ids = lote['id'].to_numpy()
+    desde, hasta = int(ids.min()), int(ids.max())
+    datos = lote[_VARIABLES_GUARDADAS].copy()
+    datos['perdida_habitat'] = np.isin(ids, list(especies_con_grupo(conn, "deforestacion", desde, hasta)))
+    sugeridos, explicaciones = clasificar_uicn_lote(lote['poblacion_estimada'], lote['tendencia_poblacion'],
+                                                    datos=datos, explicar=True)
+    conn.executemany('UPDATE especies SET estado_sugerido_uicn = ?, criterios_uicn = ? WHERE id = ?',
+                     zip(sugeridos.tolist(), explicaciones.tolist(), ids.tolist()))
+    return len(lote)
+
+
+def reclasificar_por_tramos(conn, desde_id=0, tamano_lote=50000):
+    # Generador: reclasifica por tramos de id (> desde_id) y cede (último id, filas) tras cada uno.
+    # No hace commit: quien lo recorre decide cuándo confirmar (p. ej. un trabajo con puntos de control).
+    while True:
+        lote = pd.read_sql_query(f'{_SQL_RECLASIFICAR} AND e.id > ? ORDER BY e.id LIMIT ?', conn,
+                                 params=(desde_id, tamano_lote))
+        if lote.empty:
+            return
+        _reclasificar_lote(conn, lote)
+        desde_id = int(lote['id'].iloc[-1])
+        yield desde_id, len(lote)
+
+
+def reclasificar_especies(conn, tamano_lote=50000):
+    # Recalcula estado_sugerido_uicn de toda la tabla, por lotes y en una sola transacción.
+    actualizadas = 0
+    try:
+        for _, filas in reclasificar_por_tramos(conn, 0, tamano_lote):
+            actualizadas += filas
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return actualizadas
+
+
+def reclasificar_ids(conn, especie_ids, tamano_lote=500):
+    # Solo las especies indicadas; no hace commit (lo usa quien ya tiene la transacción abierta)
+    ids = sorted(set(especie_ids))
+    actualizadas = 0
+    for i in range(0, len(ids), tamano_lote):
+        trozo = ids[i:i + tamano_lote]
+        marcadores = ", ".join("?" for _ in trozo)
+        lote = pd.read_sql_query(f'{_SQL_RECLASIFICAR} AND e.id IN ({marcadores}) ORDER BY e.id', conn, params=trozo)
+        actualizadas += _reclasificar_lote(conn, lote)
+    return actualizadas
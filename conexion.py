@@ -0,0 +1,92 @@
+import queue
+import random
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from cambios import version_actual
+from crear_db import DB_PATH, crear_tablas
+
+# --- Gestión de Conexiones a SQLite ---
+# Conexiones persistentes reutilizables entre reruns y sesiones de Streamlit.
+# Cada conexión se presta a un solo hilo a la vez, así que varias sesiones
+# concurrentes nunca comparten una transacción. WAL permite lectores
+# simultáneos mientras otra sesión escribe.
+# Las escrituras de la app van por escribir(): toman el bloqueo de escritura al
+# empezar (BEGIN IMMEDIATE) y, si la base sigue ocupada pasado el tiempo de espera,
+# reintentan con espera exponencial en lugar de fallar con "database is locked".
+# Las lecturas de una página usan una instantánea (ver iniciar_instantanea).
+
+# Segundos que SQLite espera por un bloqueo antes de devolver "database is locked"
+ESPERA_OCUPADA = 10
+REINTENTOS_ESCRITURA = 3
+ESPERA_REINTENTO = 0.5
+
+
+def abrir_conexion(ruta=DB_PATH, check_same_thread=True, factory=sqlite3.Connection, timeout=ESPERA_OCUPADA):
+    # factory: p. ej. metricas.ConexionMedida para cronometrar las consultas
+    conn = sqlite3.connect(ruta, timeout=timeout, check_same_thread=check_same_thread, factory=factory)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    return conn
+
+
+class PoolConexiones:
+    def __init__(self, ruta=DB_PATH, tamano=4, factory=sqlite3.Connection):
+        self.ruta = ruta
+        self._libres = queue.LifoQueue()
+        for i in range(tamano):
+            conn = abrir_conexion(ruta, check_same_thread=False, factory=factory)
+            if i == 0:
+                crear_tablas(conn) # Esquema y migraciones, una sola vez por proceso
+            self._libres.put(conn)
+
+    @contextmanager
+    def conexion(self):
+        conn = self._libres.get()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback() # No devolver al pool una transacción a medias
+            self._libres.put(conn)
+
+
+# --- Escrituras con reintento ---
+def base_ocupada(error):
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in str(error) or 'busy' in str(error))
+
+
+def escribir(conn, funcion, *args, reintentos=REINTENTOS_ESCRITURA):
+    # Ejecuta funcion(conn, *args) en una transacción y la confirma; devuelve lo que devuelva.
+    # BEGIN IMMEDIATE pide el bloqueo de escritura antes de leer nada: una transacción que empieza
+    # leyendo y luego escribe puede fallar al instante si otra sesión confirmó entre medias.
+    for intento in range(reintentos + 1):
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            resultado = funcion(conn, *args)
+            conn.commit()
+            return resultado
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            if not base_ocupada(e) or intento == reintentos:
+                raise
+        # Espera creciente con algo de azar, para que las sesiones que chocaron no reintenten a la vez
+        time.sleep(ESPERA_REINTENTO * 2 ** intento * random.uniform(0.5, 1.5))
+
+
+# --- Lecturas consistentes ---
+def iniciar_instantanea(conn):
+    # Abre una transacción de lectura: hasta terminar_instantanea, todas las consultas de 'conn'
+    # ven la base tal como estaba al empezar (WAL), aunque otras sesiones confirmen cambios.
+    # Devuelve la versión del registro de cambios de esa instantánea (ver cambios.py).
+    terminar_instantanea(conn)
+    conn.execute('BEGIN')
+    return version_actual(conn) # La primera lectura fija la instantánea
+
+
+def terminar_instantanea(conn):
+    if conn.in_transaction:
+        conn.rollback()
@@ -0,0 +1,138 @@
+import re
+
+# --- Capa de Consultas para "Explorar Especies" ---
+# Traduce la búsqueda, filtros, orden y paginación de la interfaz a una
+# única consulta SQL parametrizada, para que solo viaje a Python la página visible.
+
+ESTADOS_CONSERVACION = ["En Peligro Crítico", "En Peligro", "Vulnerable", "Casi Amenazado",
+                        "Preocupación Menor", "Datos Insuficientes", "No Evaluado"]
+
+OPCIONES_ORDEN = ["Nombre (A-Z)", "Nombre (Z-A)", "Estado de Conservación (Más Crítico Primero)", "Población (Menor a Mayor)",
+                  "Relevancia (Búsqueda)"]
+
+# Orden de gravedad de los estados; los desconocidos van al final
+_ORDEN_ESTADO_SQL = "CASE e.estado_conservacion " + " ".join(
+    f"WHEN '{estado}' THEN {i}" for i, estado in enumerate(ESTADOS_CONSERVACION, start=1)
+) + " ELSE 99 END"
+
+# Columnas de especies que salen en las exportaciones; las de control (clave_cientifica,
+# riesgo_modelo, borrado) son internas
+COLUMNAS_EXPORTAR = ["id", "nombre", "nombre_cientifico", "descripcion", "estado_conservacion",
+                     "estado_sugerido_uicn", "criterios_uicn", "poblacion_estimada", "tendencia_poblacion",
+                     "amenazas", "pais", "riesgo"]
+
+# Pesos bm25 por columna de especies_fts: nombre, nombre_cientifico, descripcion, amenazas
+_RANKING_FTS = "bm25(especies_fts, 10.0, 8.0, 1.0, 2.0)"
+
+_ORDER_BY = {
+    "Nombre (A-Z)": "e.nombre ASC, e.id ASC",
+    "Nombre (Z-A)": "e.nombre DESC, e.id DESC",
+    "Estado de Conservación (Más Crítico Primero)": f"{_ORDEN_ESTADO_SQL}, e.id ASC",
+    "Población (Menor a Mayor)": "e.poblacion_estimada IS NULL, e.poblacion_estimada ASC, e.id ASC",
+}
+
+
+def consulta_fts(search_query):
+    # Convierte el texto libre en una consulta FTS5 segura: cada palabra como prefijo ("tig"*)
+    # y todas obligatorias. Los acentos los ignora el tokenizador (remove_diacritics).
+    palabras = re.findall(r"\w+", search_query or "")
+    return " ".join(f'"{p}"*' for p in palabras)
+
+
+def rectangulos_region(region):
+    # region: (lon mínima, lat mínima, lon máxima, lat máxima), como el 'bbox' de GeoJSON.
+    # Si la lon mínima es mayor que la máxima la región cruza el antimeridiano (180°) y se parte en dos.
+    min_lon, min_lat, max_lon, max_lat = region
+    if min_lon <= max_lon:
+        return [(min_lon, min_lat, max_lon, max_lat)]
+    return [(min_lon, min_lat, 180.0, max_lat), (-180.0, min_lat, max_lon, max_lat)]
+
+
+def filtro_region(region):
+    # Especies con algún punto de ocurrencia o polígono de rango que toque la región,
+    # resuelto con los índices R*Tree (a los polígonos se les compara su rectángulo)
+    subconsultas, params = [], []
+    for tabla in ('ocurrencias_rtree', 'rangos_rtree'):
+        for min_lon, min_lat, max_lon, max_lat in rectangulos_region(region):
+            subconsultas.append(f"SELECT especie_id FROM {tabla} "
+                                "WHERE min_lon <= ? AND max_lon >= ? AND min_lat <= ? AND max_lat >= ?")
+            params.extend([max_lon, min_lon, max_lat, min_lat])
+    return "e.id IN (" + " UNION ALL ".join(subconsultas) + ")", params
+
+
+def construir_filtros(search_query="", estado="Todos", paises=None, region=None):
+    # Devuelve FROM + WHERE (con alias 'e' para especies) y sus parámetros
+    desde = "FROM especies e"
+    condiciones = ["e.borrado IS NULL"] # Las especies con borrado lógico no se listan (ver cambios.py)
+    params = []
+
+    match = consulta_fts(search_query)
+    if match:
+        # Búsqueda de texto completo sobre nombre, nombre científico, descripción y amenazas
+        desde += " JOIN especies_fts ON especies_fts.rowid = e.id"
+        condiciones.append("especies_fts MATCH ?")
+        params.append(match)
+
+    if estado and estado != "Todos":
+        condiciones.append("e.estado_conservacion = ?")
+        params.append(estado)
+
+    if paises:
+        # Especies presentes en AL MENOS UNO de los países, vía el índice de especie_pais
+        marcadores = ", ".join("?" for _ in paises)
+        condiciones.append(f"""e.id IN (
+            SELECT ep.especie_id FROM especie_pais ep JOIN paises p ON p.id = ep.pais_id
+            WHERE p.nombre IN ({marcadores}))""")
+        params.extend(p.strip() for p in paises)
+
+    if region:
+        condicion, params_region = filtro_region(region)
+        condiciones.append(condicion)
+        params.extend(params_region)
+
+    return f"{desde} WHERE {' AND '.join(condiciones)}", params
+
+
+def _order_by(search_query, sort_by):
+    # sort_by None: sin orden elegido, por relevancia si hay búsqueda
+    if sort_by is None or sort_by == "Relevancia (Búsqueda)":
+        # Sin texto de búsqueda no hay ranking: se ordena por nombre
+        return f"{_RANKING_FTS}, e.id ASC" if consulta_fts(search_query) else _ORDER_BY["Nombre (A-Z)"]
+    return _ORDER_BY.get(sort_by, _ORDER_BY["Nombre (A-Z)"])
+
+
+def contar_especies(conn, search_query="", estado="Todos", paises=None, region=None):
+    desde, params = construir_filtros(search_query, estado, paises, region)
+    return conn.execute(f"SELECT COUNT(*) {desde}", params).fetchone()[0]
+
+
+def obtener_pagina_especies(conn, search_query="", estado="Todos", paises=None,
+                            sort_by=None, pagina=1, items_por_pagina=5, region=None):
+    sql, params = consulta_filtrada(search_query, estado, paises, sort_by, region, columnas=["*"])
+    offset = max(pagina - 1, 0) * items_por_pagina
+    return conn.execute(f"{sql} LIMIT ? OFFSET ?", params + [items_por_pagina, offset]).fetchall()
+
+
+def consulta_filtrada(search_query="", estado="Todos", paises=None, sort_by=None, region=None,
+                      columnas=COLUMNAS_EXPORTAR):
+    # SQL completo (sin paginar) con los filtros aplicados; por defecto, con las columnas de exportación
+    desde, params = construir_filtros(search_query, estado, paises, region)
+    seleccion = ", ".join(f"e.{columna}" for columna in columnas)
+    return f"SELECT {seleccion} {desde} ORDER BY {_order_by(search_query, sort_by)}", params
+
+
+# --- Agregados para "Análisis y Predicción" ---
+# Lecturas de las tablas resumen_* (ver resumenes.py). Se comparten entre el
+# dashboard (DataFrames) y la línea de comandos (filas), que no carga pandas.
+SQL_CONTEO_ESTADOS = ('SELECT estado AS "Estado de Conservación", n AS "Número de Especies" '
+                      'FROM resumen_estado WHERE n > 0 ORDER BY n DESC, estado')
+
+SQL_CONTEO_TENDENCIA_ESTADO = ('SELECT tendencia AS tendencia_poblacion, estado AS estado_conservacion, n AS Count '
+                               'FROM resumen_tendencia_estado WHERE n > 0 ORDER BY tendencia, estado')
+
+SQL_TOP_AMENAZAS = ('SELECT a.nombre AS Amenaza, r.n AS Frecuencia '
+                    'FROM resumen_amenaza r JOIN amenazas a ON a.id = r.amenaza_id '
+                    'WHERE r.n > 0 ORDER BY r.n DESC, a.nombre LIMIT ?')
+
+SQL_CONTEO_RIESGO = ('SELECT riesgo AS Riesgo, n AS "Número de Especies" '
+                     'FROM resumen_riesgo WHERE n > 0 ORDER BY n DESC, riesgo')
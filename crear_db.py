@@ -1,21 +1,673 @@
 import sqlite3
 
-conn = sqlite3.connect('animalitos.db')
-c = conn.cursor()
-
-c.execute('''
-    CREATE TABLE IF NOT EXISTS especies (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        nombre TEXT NOT NULL,
-        nombre_cientifico TEXT,
-        descripcion TEXT,
-        estado_conservacion TEXT NOT NULL,
-        estado_sugerido_uicn TEXT,
-        poblacion_estimada INTEGER,
-        tendencia_poblacion TEXT,
-        amenazas TEXT,
-        pais TEXT
-    )
-''')
-conn.commit()
-conn.close()
\ No newline at end of file
+from paises import reconstruir_paises
+
+DB_PATH = 'animalitos.db'
+
+# Versión del esquema guardada en PRAGMA user_version; cada migración la incrementa
+VERSION_ESQUEMA = 10
+
+# Probabilidad a partir de la cual el riesgo futuro (ver modelo_riesgo.py) se cuenta como alto
+UMBRAL_RIESGO_ALTO = 0.5
+# Misma regla que modelo_riesgo.categoria_riesgo, en SQL para los triggers de resumen_riesgo
+RIESGO_SQL = ("CASE WHEN {t}.riesgo IS NULL THEN 'Sin puntuar' "
+              f"WHEN {{t}}.riesgo >= {UMBRAL_RIESGO_ALTO} THEN 'Alto' ELSE 'Bajo' END")
+
+# Rectángulos de un polígono de rango para rangos_rtree, a partir de sus vértices ({vertices}, JSON).
+# Las longitudes se miden respecto a su media circular, como al calcular la EOO (ver distribucion.py):
+# un rango que cruza los 180° da dos rectángulos, uno a cada lado, en lugar de una franja de casi
+# todo el globo. Sus ids en el índice son 2·id y 2·id + 1 del rango.
+SQL_CAJAS_RANGO = '''
+    SELECT 2 * {id} + parte,
+           CASE WHEN parte = 0 THEN MAX(oeste, -180) WHEN oeste < -180 THEN oeste + 360 ELSE -180 END,
+           CASE WHEN parte = 0 THEN MIN(este, 180) WHEN este > 180 THEN este - 360 ELSE 180 END,
+           sur, norte, {especie_id}
+    FROM (
+        SELECT MIN(centro + delta) AS oeste, MAX(centro + delta) AS este, MIN(lat) AS sur, MAX(lat) AS norte
+        FROM (
+            SELECT centro, lat, CASE WHEN lon - centro >= 180 THEN lon - centro - 360
+                                     WHEN lon - centro < -180 THEN lon - centro + 360
+                                     ELSE lon - centro END AS delta
+            FROM (SELECT json_extract(value, '$[0]') AS lon, json_extract(value, '$[1]') AS lat
+                  FROM json_each({vertices})),
+                 (SELECT degrees(atan2(SUM(sin(radians(json_extract(value, '$[0]')))),
+                                       SUM(cos(radians(json_extract(value, '$[0]')))))) AS centro
+                  FROM json_each({vertices}))
+        )
+    ), (SELECT 0 AS parte UNION ALL SELECT 1)
+    WHERE parte = 0 OR oeste < -180 OR este > 180
+'''
+
+# Columnas de especies cuyos cambios quedan en el registro de cambios (ver cambios.py); no se
+# registran las de control (clave_cientifica, clave_nombre, riesgo_modelo)
+COLUMNAS_REGISTRADAS = ['nombre', 'nombre_cientifico', 'descripcion', 'estado_conservacion', 'estado_sugerido_uicn',
+                        'poblacion_estimada', 'tendencia_poblacion', 'amenazas', 'pais', 'criterios_uicn', 'riesgo']
+
+
+# --- Creación del esquema ---
+def crear_tablas(conn):
+    c = conn.cursor()
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS especies (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre TEXT NOT NULL,
+            nombre_cientifico TEXT,
+            descripcion TEXT,
+            estado_conservacion TEXT NOT NULL,
+            estado_sugerido_uicn TEXT,
+            poblacion_estimada INTEGER,
+            tendencia_poblacion TEXT,
+            amenazas TEXT,
+            pais TEXT,
+            criterios_uicn TEXT,
+            clave_cientifica TEXT,
+            clave_nombre TEXT,
+            riesgo REAL,
+            riesgo_modelo TEXT,
+            borrado TEXT
+        )
+    ''')
+    # Índices para filtrar y ordenar en SQL sin recorrer toda la tabla
+    c.execute('CREATE INDEX IF NOT EXISTS idx_especies_nombre ON especies (nombre)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_especies_estado ON especies (estado_conservacion)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_especies_poblacion ON especies (poblacion_estimada)')
+
+    # Países normalizados: un registro por país y una fila por cada par especie-país
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS paises (
+            id INTEGER PRIMARY KEY,
+            nombre TEXT NOT NULL UNIQUE
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS especie_pais (
+            pais_id INTEGER NOT NULL REFERENCES paises (id),
+            especie_id INTEGER NOT NULL REFERENCES especies (id),
+            PRIMARY KEY (pais_id, especie_id)
+        ) WITHOUT ROWID
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_especie_pais_especie ON especie_pais (especie_id)')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_especies_borrar_paises AFTER DELETE ON especies
+        BEGIN
+            DELETE FROM especie_pais WHERE especie_id = OLD.id;
+        END
+    ''')
+
+    # Índice de texto completo (FTS5) sincronizado con especies mediante triggers.
+    # 'remove_diacritics 2' permite encontrar "Pérdida de hábitat" buscando "perdida habitat".
+    c.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS especies_fts USING fts5(
+            nombre, nombre_cientifico, descripcion, amenazas,
+            content='especies', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_especies_fts_insertar AFTER INSERT ON especies
+        BEGIN
+            INSERT INTO especies_fts (rowid, nombre, nombre_cientifico, descripcion, amenazas)
+            VALUES (NEW.id, NEW.nombre, NEW.nombre_cientifico, NEW.descripcion, NEW.amenazas);
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_especies_fts_borrar AFTER DELETE ON especies
+        BEGIN
+            INSERT INTO especies_fts (especies_fts, rowid, nombre, nombre_cientifico, descripcion, amenazas)
+            VALUES ('delete', OLD.id, OLD.nombre, OLD.nombre_cientifico, OLD.descripcion, OLD.amenazas);
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_especies_fts_actualizar
+        AFTER UPDATE OF nombre, nombre_cientifico, descripcion, amenazas ON especies
+        BEGIN
+            INSERT INTO especies_fts (especies_fts, rowid, nombre, nombre_cientifico, descripcion, amenazas)
+            VALUES ('delete', OLD.id, OLD.nombre, OLD.nombre_cientifico, OLD.descripcion, OLD.amenazas);
+            INSERT INTO especies_fts (rowid, nombre, nombre_cientifico, descripcion, amenazas)
+            VALUES (NEW.id, NEW.nombre, NEW.nombre_cientifico, NEW.descripcion, NEW.amenazas);
+        END
+    ''')
+
+    crear_resumenes(conn)
+    crear_censos(conn)
+    crear_trabajos(conn)
+    crear_duplicados(conn)
+    crear_distribucion(conn)
+    crear_riesgo(conn)
+    crear_cambios(conn)
+
+    migrar(conn)
+    # Después de migrar: las bases anteriores a v6 (y v8) no tienen las columnas hasta entonces
+    c.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_especies_clave_cientifica ON especies (clave_cientifica)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_especies_borrado ON especies (borrado) WHERE borrado IS NOT NULL')
+    conn.commit()
+
+
+# --- Agregados del dashboard mantenidos por triggers (ver resumenes.py) ---
+def crear_resumenes(conn):
+    c = conn.cursor()
+    c.execute('CREATE TABLE IF NOT EXISTS resumen_estado (estado TEXT PRIMARY KEY, n INTEGER NOT NULL DEFAULT 0)')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS resumen_tendencia_estado (
+            tendencia TEXT NOT NULL,
+            estado TEXT NOT NULL,
+            n INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (tendencia, estado)
+        )
+    ''')
+    c.execute('CREATE TABLE IF NOT EXISTS resumen_amenaza (amenaza_id INTEGER PRIMARY KEY, n INTEGER NOT NULL DEFAULT 0)')
+    c.execute('CREATE TABLE IF NOT EXISTS resumen_riesgo (riesgo TEXT PRIMARY KEY, n INTEGER NOT NULL DEFAULT 0)')
+    # Taxonomía de amenazas normalizadas (ver amenazas.py) y su relación con cada especie;
+    # las rellenan las rutas de escritura
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS amenazas (
+            id INTEGER PRIMARY KEY,
+            clave TEXT NOT NULL UNIQUE,
+            nombre TEXT NOT NULL,
+            grupo TEXT
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_amenazas_grupo ON amenazas (grupo)')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS especie_amenaza (
+            amenaza_id INTEGER NOT NULL REFERENCES amenazas (id),
+            especie_id INTEGER NOT NULL REFERENCES especies (id),
+            PRIMARY KEY (amenaza_id, especie_id)
+        ) WITHOUT ROWID
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_especie_amenaza_especie ON especie_amenaza (especie_id)')
+
+    sumar_nuevo = f'''
+            INSERT INTO resumen_estado (estado, n) VALUES (NEW.estado_conservacion, 1)
+                ON CONFLICT (estado) DO UPDATE SET n = n + 1;
+            INSERT INTO resumen_tendencia_estado (tendencia, estado, n)
+                SELECT NEW.tendencia_poblacion, NEW.estado_conservacion, 1 WHERE NEW.tendencia_poblacion IS NOT NULL
+                ON CONFLICT (tendencia, estado) DO UPDATE SET n = n + 1;
+    '''
+    restar_viejo = '''
+            UPDATE resumen_estado SET n = n - 1 WHERE estado = OLD.estado_conservacion;
+            UPDATE resumen_tendencia_estado SET n = n - 1
+                WHERE tendencia = OLD.tendencia_poblacion AND estado = OLD.estado_conservacion;
+    '''
+    # El riesgo solo depende de la puntuación guardada: se cuenta aparte para que puntuar
+    # no toque los demás resúmenes
+    sumar_riesgo = f'''
+            INSERT INTO resumen_riesgo (riesgo, n) VALUES ({RIESGO_SQL.format(t="NEW")}, 1)
+                ON CONFLICT (riesgo) DO UPDATE SET n = n + 1;
+    '''
+    restar_riesgo = f'''
+            UPDATE resumen_riesgo SET n = n - 1 WHERE riesgo = {RIESGO_SQL.format(t="OLD")};
+    '''
+    # Las especies con borrado lógico (columna 'borrado', ver cambios.py) no cuentan: se restan al
+    # borrarlas y se vuelven a sumar al restaurarlas
+    vivas = 'OLD.borrado IS NULL AND NEW.borrado IS NULL'
+    c.execute(f'CREATE TRIGGER IF NOT EXISTS trg_resumen_insertar AFTER INSERT ON especies '
+              f'BEGIN {sumar_nuevo} {sumar_riesgo} END')
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_resumen_borrar AFTER DELETE ON especies
+        WHEN OLD.borrado IS NULL
+        BEGIN
+            {restar_viejo}
+            {restar_riesgo}
+            DELETE FROM especie_amenaza WHERE especie_id = OLD.id;
+        END
+    ''')
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_resumen_actualizar
+        AFTER UPDATE OF estado_conservacion, tendencia_poblacion, poblacion_estimada ON especies
+        WHEN {vivas}
+        BEGIN {restar_viejo} {sumar_nuevo} END
+    ''')
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_resumen_riesgo
+        AFTER UPDATE OF riesgo ON especies
+        WHEN {vivas} AND {RIESGO_SQL.format(t="OLD")} IS NOT {RIESGO_SQL.format(t="NEW")}
+        BEGIN {restar_riesgo} {sumar_riesgo} END
+    ''')
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_resumen_ocultar AFTER UPDATE OF borrado ON especies
+        WHEN OLD.borrado IS NULL AND NEW.borrado IS NOT NULL
+        BEGIN {restar_viejo} {restar_riesgo} END
+    ''')
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_resumen_restaurar AFTER UPDATE OF borrado ON especies
+        WHEN OLD.borrado IS NOT NULL AND NEW.borrado IS NULL
+        BEGIN {sumar_nuevo} {sumar_riesgo} END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_especie_amenaza_insertar AFTER INSERT ON especie_amenaza
+        BEGIN
+            INSERT INTO resumen_amenaza (amenaza_id, n) VALUES (NEW.amenaza_id, 1)
+                ON CONFLICT (amenaza_id) DO UPDATE SET n = n + 1;
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_especie_amenaza_borrar AFTER DELETE ON especie_amenaza
+        BEGIN
+            UPDATE resumen_amenaza SET n = n - 1 WHERE amenaza_id = OLD.amenaza_id;
+        END
+    ''')
+
+
+# --- Series temporales de censos (ver censos.py) ---
+def crear_censos(conn):
+    c = conn.cursor()
+    # Historial de conteos de solo inserción: una fila por censo publicado
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS censos (
+            id INTEGER PRIMARY KEY,
+            especie_id INTEGER NOT NULL REFERENCES especies (id),
+            fecha TEXT NOT NULL,
+            conteo INTEGER NOT NULL,
+            fuente TEXT
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_censos_especie_fecha ON censos (especie_id, fecha)')
+    # Tendencias calculadas por especie y especies con censos nuevos pendientes de recalcular
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS tendencias_censo (
+            especie_id INTEGER PRIMARY KEY REFERENCES especies (id),
+            n_censos INTEGER NOT NULL,
+            ultima_fecha TEXT NOT NULL,
+            ultimo_conteo INTEGER NOT NULL,
+            pendiente_3 REAL,
+            declive_3 REAL,
+            pendiente_10 REAL,
+            declive_10 REAL,
+            varianza_10 REAL,
+            tendencia TEXT
+        )
+    ''')
+    c.execute('CREATE TABLE IF NOT EXISTS censos_pendientes (especie_id INTEGER PRIMARY KEY)')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_censos_insertar AFTER INSERT ON censos
+        BEGIN
+            INSERT OR IGNORE INTO censos_pendientes (especie_id) VALUES (NEW.especie_id);
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_censos_solo_insercion BEFORE UPDATE ON censos
+        BEGIN
+            SELECT RAISE(ABORT, 'censos es de solo inserción: registra un censo nuevo');
+        END
+    ''')
+    # Solo se borran censos junto con su especie
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_censos_borrar BEFORE DELETE ON censos
+        WHEN EXISTS (SELECT 1 FROM especies WHERE id = OLD.especie_id)
+        BEGIN
+            SELECT RAISE(ABORT, 'censos es de solo inserción: registra un censo nuevo');
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_especies_borrar_censos AFTER DELETE ON especies
+        BEGIN
+            DELETE FROM censos WHERE especie_id = OLD.id;
+            DELETE FROM tendencias_censo WHERE especie_id = OLD.id;
+            DELETE FROM censos_pendientes WHERE especie_id = OLD.id;
+        END
+    ''')
+
+
+# --- Cola de trabajos en segundo plano (ver trabajos.py) ---
+def crear_trabajos(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS trabajos (
+            id INTEGER PRIMARY KEY,
+            tipo TEXT NOT NULL,
+            parametros TEXT NOT NULL DEFAULT '{}',
+            estado TEXT NOT NULL DEFAULT 'pendiente',
+            progreso REAL NOT NULL DEFAULT 0,
+            mensaje TEXT,
+            resultado TEXT,
+            punto_control INTEGER NOT NULL DEFAULT 0,
+            cancelar INTEGER NOT NULL DEFAULT 0,
+            creado TEXT NOT NULL DEFAULT (datetime('now')),
+            iniciado TEXT,
+            latido TEXT,
+            terminado TEXT
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_trabajos_estado ON trabajos (estado, id)')
+
+
+# --- Detección de duplicados (ver duplicados.py) ---
+def crear_duplicados(conn):
+    c = conn.cursor()
+    # Índice de trigramas de los nombres normalizados (clave_nombre y clave_cientifica, sin
+    # mayúsculas, acentos ni signos: el tokenizador trigram de SQLite no quita los acentos), de modo
+    # que la búsqueda de candidatos y la similitud comparan el mismo texto. Sincronizado con
+    # especies igual que especies_fts.
+    c.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS especies_trigramas USING fts5(
+            clave_nombre, clave_cientifica,
+            content='especies', content_rowid='id',
+            tokenize='trigram'
+        )
+    ''')
+    # Frecuencia de cada trigrama, para buscar primero los más raros
+    c.execute('CREATE VIRTUAL TABLE IF NOT EXISTS especies_trigramas_vocab USING fts5vocab(especies_trigramas, col)')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_especies_trigramas_insertar AFTER INSERT ON especies
+        BEGIN
+            INSERT INTO especies_trigramas (rowid, clave_nombre, clave_cientifica)
+            VALUES (NEW.id, NEW.clave_nombre, NEW.clave_cientifica);
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_especies_trigramas_borrar AFTER DELETE ON especies
+        BEGIN
+            INSERT INTO especies_trigramas (especies_trigramas, rowid, clave_nombre, clave_cientifica)
+            VALUES ('delete', OLD.id, OLD.clave_nombre, OLD.clave_cientifica);
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_especies_trigramas_actualizar
+        AFTER UPDATE OF clave_nombre, clave_cientifica ON especies
+        BEGIN
+            INSERT INTO especies_trigramas (especies_trigramas, rowid, clave_nombre, clave_cientifica)
+            VALUES ('delete', OLD.id, OLD.clave_nombre, OLD.clave_cientifica);
+            INSERT INTO especies_trigramas (rowid, clave_nombre, clave_cientifica)
+            VALUES (NEW.id, NEW.clave_nombre, NEW.clave_cientifica);
+        END
+    ''')
+    # Pares (especie nueva, especie anterior) que probablemente son la misma
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS posibles_duplicados (
+            especie_id INTEGER NOT NULL REFERENCES especies (id),
+            candidato_id INTEGER NOT NULL REFERENCES especies (id),
+            similitud REAL NOT NULL,
+            motivo TEXT,
+            PRIMARY KEY (especie_id, candidato_id)
+        ) WITHOUT ROWID
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_posibles_duplicados_candidato ON posibles_duplicados (candidato_id)')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_especies_borrar_duplicados AFTER DELETE ON especies
+        BEGIN
+            DELETE FROM posibles_duplicados WHERE especie_id = OLD.id OR candidato_id = OLD.id;
+        END
+    ''')
+
+
+# --- Distribución espacial: ocurrencias, polígonos de rango, EOO y AOO (ver distribucion.py) ---
+def crear_distribucion(conn):
+    c = conn.cursor()
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS ocurrencias (
+            id INTEGER PRIMARY KEY,
+            especie_id INTEGER NOT NULL REFERENCES especies (id),
+            latitud REAL NOT NULL,
+            longitud REAL NOT NULL,
+            fuente TEXT
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_ocurrencias_especie ON ocurrencias (especie_id)')
+    # Polígonos de rango: anillo exterior como JSON [[lon, lat], ...]
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS rangos (
+            id INTEGER PRIMARY KEY,
+            especie_id INTEGER NOT NULL REFERENCES especies (id),
+            vertices TEXT NOT NULL,
+            fuente TEXT
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_rangos_especie ON rangos (especie_id)')
+    # Índices espaciales R*Tree (un rectángulo por punto o por polígono) con la especie como
+    # columna auxiliar, para responder "especies en esta región" sin leer las tablas
+    for tabla in ('ocurrencias', 'rangos'):
+        c.execute(f'CREATE VIRTUAL TABLE IF NOT EXISTS {tabla}_rtree USING rtree('
+                  f'id, min_lon, max_lon, min_lat, max_lat, +especie_id)')
+    # EOO y AOO calculados por especie, y especies con registros nuevos pendientes de recalcular
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS distribucion_especie (
+            especie_id INTEGER PRIMARY KEY REFERENCES especies (id),
+            n_ocurrencias INTEGER NOT NULL,
+            n_rangos INTEGER NOT NULL,
+            eoo_km2 REAL,
+            aoo_km2 REAL
+        )
+    ''')
+    c.execute('CREATE TABLE IF NOT EXISTS distribucion_pendientes (especie_id INTEGER PRIMARY KEY)')
+
+    pendiente = 'INSERT OR IGNORE INTO distribucion_pendientes (especie_id) VALUES ({t}.especie_id);'
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_ocurrencias_insertar AFTER INSERT ON ocurrencias
+        BEGIN
+            INSERT INTO ocurrencias_rtree (id, min_lon, max_lon, min_lat, max_lat, especie_id)
+            VALUES (NEW.id, NEW.longitud, NEW.longitud, NEW.latitud, NEW.latitud, NEW.especie_id);
+            {pendiente.format(t="NEW")}
+        END
+    ''')
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_ocurrencias_borrar AFTER DELETE ON ocurrencias
+        BEGIN
+            DELETE FROM ocurrencias_rtree WHERE id = OLD.id;
+            {pendiente.format(t="OLD")}
+        END
+    ''')
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_ocurrencias_actualizar
+        AFTER UPDATE OF especie_id, latitud, longitud ON ocurrencias
+        BEGIN
+            UPDATE ocurrencias_rtree SET min_lon = NEW.longitud, max_lon = NEW.longitud,
+                                         min_lat = NEW.latitud, max_lat = NEW.latitud, especie_id = NEW.especie_id
+            WHERE id = NEW.id;
+            {pendiente.format(t="OLD")}
+            {pendiente.format(t="NEW")}
+        END
+    ''')
+    # El rectángulo de cada polígono (o los dos, si cruza los 180°) sale de sus vértices con las
+    # funciones JSON y matemáticas de SQLite
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_rangos_insertar AFTER INSERT ON rangos
+        BEGIN
+            INSERT INTO rangos_rtree (id, min_lon, max_lon, min_lat, max_lat, especie_id)
+            {SQL_CAJAS_RANGO.format(id="NEW.id", vertices="NEW.vertices", especie_id="NEW.especie_id")};
+            {pendiente.format(t="NEW")}
+        END
+    ''')
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_rangos_borrar AFTER DELETE ON rangos
+        BEGIN
+            DELETE FROM rangos_rtree WHERE id IN (2 * OLD.id, 2 * OLD.id + 1);
+            {pendiente.format(t="OLD")}
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_rangos_solo_insercion BEFORE UPDATE ON rangos
+        BEGIN
+            SELECT RAISE(ABORT, 'para cambiar un rango, bórralo y registra el nuevo');
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_especies_borrar_distribucion AFTER DELETE ON especies
+        BEGIN
+            DELETE FROM ocurrencias WHERE especie_id = OLD.id;
+            DELETE FROM rangos WHERE especie_id = OLD.id;
+            DELETE FROM distribucion_especie WHERE especie_id = OLD.id;
+            DELETE FROM distribucion_pendientes WHERE especie_id = OLD.id;
+        END
+    ''')
+
+
+# --- Riesgo futuro puntuado por el modelo (ver modelo_riesgo.py) ---
+def crear_riesgo(conn):
+    # Si cambian las variables del modelo se borra la versión con la que se puntuó: la especie
+    # queda pendiente de volver a puntuar (conserva su puntuación anterior hasta entonces)
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_riesgo_desactualizar
+        AFTER UPDATE OF poblacion_estimada, tendencia_poblacion, amenazas, pais ON especies
+        WHEN OLD.poblacion_estimada IS NOT NEW.poblacion_estimada
+          OR OLD.tendencia_poblacion IS NOT NEW.tendencia_poblacion
+          OR OLD.amenazas IS NOT NEW.amenazas OR OLD.pais IS NOT NEW.pais
+        BEGIN
+            UPDATE especies SET riesgo_modelo = NULL WHERE id = NEW.id;
+        END
+    ''')
+
+
+# --- Registro de cambios y borrado lógico (ver cambios.py) ---
+def crear_cambios(conn):
+    c = conn.cursor()
+    # Registro de solo inserción: una fila por alta, modificación, borrado lógico, restauración o
+    # eliminación definitiva de una especie. 'version' crece con cada cambio confirmado (AUTOINCREMENT
+    # no reutiliza números), así que "cambios desde la versión N" es un rango de la clave primaria.
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS cambios (
+            version INTEGER PRIMARY KEY AUTOINCREMENT,
+            especie_id INTEGER NOT NULL,
+            operacion TEXT NOT NULL,
+            columnas TEXT,
+            fecha TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_cambios_especie ON cambios (especie_id, version)')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_cambios_insertar AFTER INSERT ON especies
+        BEGIN
+            INSERT INTO cambios (especie_id, operacion) VALUES (NEW.id, 'insertar');
+        END
+    ''')
+    # Solo si algún valor cambió de verdad: reimportar o reclasificar sin cambios no deja rastro.
+    # 'columnas' guarda cuáles cambiaron, separadas por comas.
+    cambiadas = " OR ".join(f"OLD.{col} IS NOT NEW.{col}" for col in COLUMNAS_REGISTRADAS + ['borrado'])
+    columnas = " || ".join(f"CASE WHEN OLD.{col} IS NOT NEW.{col} THEN ',{col}' ELSE '' END"
+                           for col in COLUMNAS_REGISTRADAS)
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_cambios_actualizar
+        AFTER UPDATE OF {", ".join(COLUMNAS_REGISTRADAS)}, borrado ON especies
+        WHEN {cambiadas}
+        BEGIN
+            INSERT INTO cambios (especie_id, operacion, columnas) VALUES (
+                NEW.id,
+                CASE WHEN OLD.borrado IS NULL AND NEW.borrado IS NOT NULL THEN 'borrar'
+                     WHEN OLD.borrado IS NOT NULL AND NEW.borrado IS NULL THEN 'restaurar'
+                     ELSE 'actualizar' END,
+                NULLIF(substr({columnas}, 2), ''));
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_cambios_eliminar AFTER DELETE ON especies
+        BEGIN
+            INSERT INTO cambios (especie_id, operacion) VALUES (OLD.id, 'eliminar');
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_cambios_solo_insercion BEFORE UPDATE ON cambios
+        BEGIN
+            SELECT RAISE(ABORT, 'cambios es de solo inserción');
+        END
+    ''')
+    # Una especie borrada deja de contar en países y amenazas; al restaurarla se vuelven a
+    # enlazar a partir de sus columnas de texto (ver cambios.restaurar_especie)
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_especies_ocultar AFTER UPDATE OF borrado ON especies
+        WHEN OLD.borrado IS NULL AND NEW.borrado IS NOT NULL
+        BEGIN
+            DELETE FROM especie_pais WHERE especie_id = OLD.id;
+            DELETE FROM especie_amenaza WHERE especie_id = OLD.id;
+        END
+    ''')
+
+
+# --- Migraciones de datos existentes ---
+def migrar(conn):
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version >= VERSION_ESQUEMA:
+        return
+    if version < 7:
+        # Columnas de v7 que ya leen los triggers de resumen y su reconstrucción (v3)
+        _agregar_columna(conn, 'especies', 'riesgo', 'REAL')
+        _agregar_columna(conn, 'especies', 'riesgo_modelo', 'TEXT')
+    if version < 8:
+        # Igual con la de v8
+        _agregar_columna(conn, 'especies', 'borrado', 'TEXT')
+    if version < 10:
+        # El índice de trigramas de v6 (nombres sin normalizar) se quita antes de las migraciones que
+        # actualizan especies y se rehace al final (v10) con los nombres normalizados
+        _agregar_columna(conn, 'especies', 'clave_nombre', 'TEXT')
+        for trigger in ('trg_especies_trigramas_insertar', 'trg_especies_trigramas_borrar',
+                        'trg_especies_trigramas_actualizar'):
+            conn.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        conn.execute('DROP TABLE IF EXISTS especies_trigramas_vocab')
+        conn.execute('DROP TABLE IF EXISTS especies_trigramas')
+    if version < 1:
+        # v1: rellenar especie_pais a partir de la columna de texto 'pais'
+        reconstruir_paises(conn)
+    if version < 2:
+        # v2: indexar en FTS5 las especies que ya existían antes de los triggers
+        conn.execute("INSERT INTO especies_fts (especies_fts) VALUES ('rebuild')")
+    if version < 3:
+        # v3: calcular por primera vez los resúmenes del dashboard
+        from resumenes import reconstruir_resumenes
+        reconstruir_resumenes(conn)
+    if version == 3:
+        # v4: las amenazas pasan de texto en minúsculas a ids de la taxonomía normalizada.
+        # Al borrar las tablas viejas se borran también sus triggers; se recrean con el esquema nuevo.
+        conn.execute('DROP TABLE IF EXISTS especie_amenaza')
+        conn.execute('DROP TABLE IF EXISTS resumen_amenaza')
+        crear_resumenes(conn)
+        from resumenes import reconstruir_resumenes
+        reconstruir_resumenes(conn)
+    if version < 5:
+        # v5: explicación por criterio (A–E) junto a la sugerencia UICN y varianza de los censos
+        # para el criterio E; las tendencias existentes quedan pendientes de recalcular
+        _agregar_columna(conn, 'especies', 'criterios_uicn', 'TEXT')
+        _agregar_columna(conn, 'tendencias_censo', 'varianza_10', 'REAL')
+        conn.execute('INSERT OR IGNORE INTO censos_pendientes (especie_id) SELECT DISTINCT especie_id FROM censos')
+    if version < 6:
+        # v6: clave de nombre científico normalizado (los duplicados exactos ya existentes quedan
+        # sin clave y anotados en posibles_duplicados); el índice de trigramas se rellena en v10
+        from duplicados import asignar_claves
+        _agregar_columna(conn, 'especies', 'clave_cientifica', 'TEXT')
+        asignar_claves(conn)
+    if version < 7:
+        # v7: el riesgo futuro deja de ser la regla fija (población < 1000 y decreciendo) y pasa a
+        # ser la puntuación guardada del modelo; las especies quedan sin puntuar hasta entrenarlo.
+        # Los triggers de resumen se recrean para contar la puntuación en lugar de la regla.
+        for trigger in ('trg_resumen_insertar', 'trg_resumen_borrar', 'trg_resumen_actualizar'):
+            conn.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        crear_resumenes(conn)
+        conn.execute('DELETE FROM resumen_riesgo')
+        conn.execute(f'INSERT INTO resumen_riesgo (riesgo, n) '
+                     f'SELECT {RIESGO_SQL.format(t="especies")} AS riesgo, COUNT(*) FROM especies GROUP BY riesgo')
+    if version < 8:
+        # v8: borrado lógico y registro de cambios. Los triggers de resumen se recrean para no contar
+        # las especies borradas. El registro empieza con un alta por cada especie existente, así que
+        # "cambios desde la versión 0" equivale a la tabla completa.
+        for trigger in ('trg_resumen_borrar', 'trg_resumen_actualizar', 'trg_resumen_riesgo'):
+            conn.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        crear_resumenes(conn)
+        conn.execute("INSERT INTO cambios (especie_id, operacion) SELECT id, 'insertar' FROM especies ORDER BY id")
+    if version < 9:
+        # v9: los rangos que cruzan los 180° se indexaban con un rectángulo de casi todo el globo
+        # (mínimo y máximo de las longitudes); se recrean sus triggers y se reindexan todos
+        for trigger in ('trg_rangos_insertar', 'trg_rangos_borrar'):
+            conn.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        crear_distribucion(conn)
+        conn.execute('DELETE FROM rangos_rtree')
+        rangos = conn.execute('SELECT id, vertices, especie_id FROM rangos').fetchall()
+        conn.executemany('INSERT INTO rangos_rtree (id, min_lon, max_lon, min_lat, max_lat, especie_id) '
+                         + SQL_CAJAS_RANGO.format(id=":id", vertices=":vertices", especie_id=":especie_id"),
+                         ({'id': r[0], 'vertices': r[1], 'especie_id': r[2]} for r in rangos))
+    if version < 10:
+        # v10: el índice de trigramas pasa a los nombres normalizados ("Búfo búfo" y "Bufo bufo"
+        # comparten trigramas); se calcula clave_nombre de las especies existentes y se reindexa
+        from duplicados import asignar_claves_nombre
+        asignar_claves_nombre(conn)
+        crear_duplicados(conn)
+        conn.execute("INSERT INTO especies_trigramas (especies_trigramas) VALUES ('rebuild')")
+    conn.execute(f'PRAGMA user_version = {VERSION_ESQUEMA}')
+
+
+def _agregar_columna(conn, tabla, columna, tipo):
+    columnas = {fila[1] for fila in conn.execute(f'PRAGMA table_info({tabla})')}
+    if columna not in columnas:
+        conn.execute(f'ALTER TABLE {tabla} ADD COLUMN {columna} {tipo}')
+
+
+if __name__ == "__main__":
+    conn = sqlite3.connect(DB_PATH)
+    crear_tablas(conn)
+    conn.close()
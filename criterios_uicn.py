@@ -0,0 +1,218 @@
+import numpy as np
+import pandas as pd
+
+# --- Motor de Reglas UICN (criterios A–E) ---
+# Las reglas se declaran como datos (REGLAS) y se compilan una vez en predicados
+# de NumPy que evalúan todas las especies de una pasada. Cada especie recibe la
+# categoría más grave que cumple y la explicación de los criterios que la justifican.
+# Variables que usan las reglas (columnas de 'datos'; si falta una, sus reglas no se cumplen):
+#   poblacion            individuos maduros (0 o vacío = sin dato)
+#   declive_3/declive_10 fracción de población perdida en 3 y 10 años (tabla tendencias_censo)
+#   declive_continuo     tendencia "Decreciendo" o pérdida de hábitat por deforestación
+#   fluctuacion_extrema  variación de los censos de un orden de magnitud
+#   n_localidades        número de países donde habita (aproximación a "localidades", solo en B)
+#   eoo_km2/aoo_km2      extensión de presencia y área de ocupación
+#   amenazada            tiene alguna amenaza registrada (amenaza plausible del criterio D2)
+#   prob_extincion_10/20/100  probabilidad de extinción en 10, 20 y 100 años (criterio E)
+
+CATEGORIAS = ["En Peligro Crítico", "En Peligro", "Vulnerable"]
+SIN_CATEGORIA = "Preocupación Menor"
+SIN_DATOS = "Datos Insuficientes"
+
+# Cada regla: criterio, categoría, texto de la explicación y condiciones.
+#   "todas":    [(variable, operador, umbral), ...] que deben cumplirse a la vez
+#   "al_menos": (k, [condiciones]) de las que deben cumplirse k o más
+REGLAS = [
+    # A2: reducción observada de la población en 10 años
+    {"criterio": "A2", "categoria": "En Peligro Crítico", "texto": "reducción ≥ 80% en 10 años",
+     "todas": [("declive_10", ">=", 0.80)]},
+    {"criterio": "A2", "categoria": "En Peligro", "texto": "reducción ≥ 50% en 10 años",
+     "todas": [("declive_10", ">=", 0.50)]},
+    {"criterio": "A2", "categoria": "Vulnerable", "texto": "reducción ≥ 30% en 10 años",
+     "todas": [("declive_10", ">=", 0.30)]},
+
+    # B1/B2: distribución restringida y al menos dos de (a) pocas localidades, (b) declive continuo,
+    # (c) fluctuaciones extremas
+    {"criterio": "B1ab", "categoria": "En Peligro Crítico", "texto": "extensión de presencia < 100 km² y 2 de a/b/c",
+     "todas": [("eoo_km2", "<", 100)],
+     "al_menos": (2, [("n_localidades", "<=", 1), ("declive_continuo", "==", True), ("fluctuacion_extrema", "==", True)])},
+    {"criterio": "B1ab", "categoria": "En Peligro", "texto": "extensión de presencia < 5.000 km² y 2 de a/b/c",
+     "todas": [("eoo_km2", "<", 5000)],
+     "al_menos": (2, [("n_localidades", "<=", 5), ("declive_continuo", "==", True), ("fluctuacion_extrema", "==", True)])},
+    {"criterio": "B1ab", "categoria": "Vulnerable", "texto": "extensión de presencia < 20.000 km² y 2 de a/b/c",
+     "todas": [("eoo_km2", "<", 20000)],
+     "al_menos": (2, [("n_localidades", "<=", 10), ("declive_continuo", "==", True), ("fluctuacion_extrema", "==", True)])},
+    {"criterio": "B2ab", "categoria": "En Peligro Crítico", "texto": "área de ocupación < 10 km² y 2 de a/b/c",
+     "todas": [("aoo_km2", "<", 10)],
+     "al_menos": (2, [("n_localidades", "<=", 1), ("declive_continuo", "==", True), ("fluctuacion_extrema", "==", True)])},
+    {"criterio": "B2ab", "categoria": "En Peligro", "texto": "área de ocupación < 500 km² y 2 de a/b/c",
+     "todas": [("aoo_km2", "<", 500)],
+     "al_menos": (2, [("n_localidades", "<=", 5), ("declive_continuo", "==", True), ("fluctuacion_extrema", "==", True)])},
+    {"criterio": "B2ab", "categoria": "Vulnerable", "texto": "área de ocupación < 2.000 km² y 2 de a/b/c",
+     "todas": [("aoo_km2", "<", 2000)],
+     "al_menos": (2, [("n_localidades", "<=", 10), ("declive_continuo", "==", True), ("fluctuacion_extrema", "==", True)])},
+
+    # C1: población pequeña con declive cuantificado (las ventanas de 1 y 2 generaciones se aproximan con 3 años)
+    {"criterio": "C1", "categoria": "En Peligro Crítico", "texto": "< 250 individuos y declive ≥ 25% en 3 años",
+     "todas": [("poblacion", "<", 250), ("declive_3", ">=", 0.25)]},
+    {"criterio": "C1", "categoria": "En Peligro", "texto": "< 2.500 individuos y declive ≥ 20% en 3 años",
+     "todas": [("poblacion", "<", 2500), ("declive_3", ">=", 0.20)]},
+    {"criterio": "C1", "categoria": "Vulnerable", "texto": "< 10.000 individuos y declive ≥ 10% en 10 años",
+     "todas": [("poblacion", "<", 10000), ("declive_10", ">=", 0.10)]},
+    # C2a(i): población pequeña en declive continuo y ninguna subpoblación mayor que el umbral
+    # (sin datos de subpoblaciones se toma la población total como la mayor)
+    {"criterio": "C2a", "categoria": "En Peligro Crítico", "texto": "≤ 50 individuos en declive continuo",
+     "todas": [("poblacion", "<=", 50), ("declive_continuo", "==", True)]},
+    {"criterio": "C2a", "categoria": "En Peligro", "texto": "≤ 250 individuos en declive continuo",
+     "todas": [("poblacion", "<=", 250), ("declive_continuo", "==", True)]},
+    {"criterio": "C2a", "categoria": "Vulnerable", "texto": "≤ 1.000 individuos en declive continuo",
+     "todas": [("poblacion", "<=", 1000), ("declive_continuo", "==", True)]},
+
+    # D: población muy pequeña o restringida
+    {"criterio": "D", "categoria": "En Peligro Crítico", "texto": "< 50 individuos maduros",
+     "todas": [("poblacion", "<", 50)]},
+    {"criterio": "D", "categoria": "En Peligro", "texto": "< 250 individuos maduros",
+     "todas": [("poblacion", "<", 250)]},
+    {"criterio": "D1", "categoria": "Vulnerable", "texto": "< 1.000 individuos maduros",
+     "todas": [("poblacion", "<", 1000)]},
+    {"criterio": "D2", "categoria": "Vulnerable", "texto": "área de ocupación < 20 km² con amenaza plausible",
+     "todas": [("aoo_km2", "<", 20), ("amenazada", "==", True)]},
+
+    # E: análisis cuantitativo (probabilidad de extinción según la serie de censos)
+    {"criterio": "E", "categoria": "En Peligro Crítico", "texto": "probabilidad de extinción ≥ 50% en 10 años",
+     "todas": [("prob_extincion_10", ">=", 0.50)]},
+    {"criterio": "E", "categoria": "En Peligro", "texto": "probabilidad de extinción ≥ 20% en 20 años",
+     "todas": [("prob_extincion_20", ">=", 0.20)]},
+    {"criterio": "E", "categoria": "Vulnerable", "texto": "probabilidad de extinción ≥ 10% en 100 años",
+     "todas": [("prob_extincion_100", ">=", 0.10)]},
+]
+
+# Variables que, si faltan todas, dejan a la especie en "Datos Insuficientes"
+VARIABLES_EVIDENCIA = ["poblacion", "declive_10", "declive_3", "eoo_km2", "aoo_km2"]
+
+_OPERADORES = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "==": np.equal,
+}
+
+
+# --- Compilación ---
+def _compilar_condicion(variable, operador, umbral):
+    funcion = _OPERADORES[operador]
+
+    def predicado(variables, n):
+        valores = variables.get(variable)
+        if valores is None:
+            return np.zeros(n, dtype=bool)
+        with np.errstate(invalid='ignore'):
+            return funcion(valores, umbral) # NaN nunca cumple la condición
+    return predicado
+
+
+def compilar_regla(regla):
+    todas = [_compilar_condicion(*c) for c in regla.get("todas", [])]
+    minimo, opciones = regla.get("al_menos", (0, []))
+    opciones = [_compilar_condicion(*c) for c in opciones]
+
+    def predicado(variables, n):
+        cumple = np.ones(n, dtype=bool)
+        for condicion in todas:
+            cumple &= condicion(variables, n)
+        if opciones:
+            cumplidas = sum(condicion(variables, n).astype(np.int8) for condicion in opciones)
+            cumple &= cumplidas >= minimo
+        return cumple
+    return regla["criterio"], CATEGORIAS.index(regla["categoria"]), regla["texto"], predicado
+
+
+def compilar_reglas(reglas=REGLAS):
+    return [compilar_regla(regla) for regla in reglas]
+
+
+REGLAS_COMPILADAS = compilar_reglas()
+
+
+# --- Variables derivadas ---
+def _log_phi(z):
+    # log de la función de distribución normal estándar, estable también en la cola izquierda
+    z = np.asarray(z, dtype='float64')
+    x = np.abs(z) / np.sqrt(2.0) # Φ(-|z|) = erfc(x) / 2
+    t = 1.0 / (1.0 + 0.5 * x)
+    # Aproximación de Numerical Recipes (erfc con error relativo < 1.2e-7), en logaritmos
+    log_erfc = (-x * x - 1.26551223 + t * (1.00002368 + t * (0.37409196 + t * (0.09678418 + t * (
+        -0.18628806 + t * (0.27886807 + t * (-1.13520398 + t * (1.48851587 + t * (-0.82215223 + t * 0.17087277)))))))))
+    log_cola = np.log(t) + log_erfc - np.log(2.0) # log Φ(z) para z < 0
+    with np.errstate(over='ignore', invalid='ignore'):
+        return np.where(z < 0, log_cola, np.log1p(-np.exp(np.minimum(log_cola, 0))))
+
+
+def probabilidad_extincion(poblacion, pendiente, varianza, anios, umbral=1.0):
+    # Aproximación de difusión (Dennis et al. 1991): el log de la población sigue un
+    # paseo aleatorio con deriva 'pendiente' y varianza 'varianza' por año.
+    d = np.log(np.asarray(poblacion, dtype='float64') / umbral)
+    mu = np.asarray(pendiente, dtype='float64')
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        s = np.sqrt(np.asarray(varianza, dtype='float64') * anios)
+        primero = np.exp(_log_phi((-d - mu * anios) / s))
+        segundo = np.exp(-2 * mu * d / varianza + _log_phi((-d + mu * anios) / s))
+        prob = np.clip(primero + segundo, 0, 1)
+    return np.where((d > 0) & (s > 0), prob, np.nan)
+
+
+def variables_derivadas(datos):
+    # Completa 'datos' (dict de arrays) con las variables calculadas a partir de otras
+    variables = dict(datos)
+    poblacion = np.asarray(variables.get("poblacion", np.nan), dtype='float64')
+    variables["poblacion"] = np.where(poblacion > 0, poblacion, np.nan)
+    if "varianza_10" in variables and "fluctuacion_extrema" not in variables:
+        # Fluctuación de un orden de magnitud: desviación típica del log-conteo ≥ ln(10) / 2
+        with np.errstate(invalid='ignore'):
+            variables["fluctuacion_extrema"] = np.asarray(variables["varianza_10"], dtype='float64') >= (np.log(10) / 2) ** 2
+    if "pendiente_10" in variables and "varianza_10" in variables:
+        for anios in (10, 20, 100):
+            variables.setdefault(f"prob_extincion_{anios}", probabilidad_extincion(
+                variables["poblacion"], variables["pendiente_10"], variables["varianza_10"], anios))
+    return variables
+
+
+# --- Evaluación ---
+def evaluar_criterios(datos, reglas=None):
+    # datos: DataFrame o dict de columnas. Devuelve (categorías, explicaciones) como arrays de objetos.
+    reglas = REGLAS_COMPILADAS if reglas is None else reglas
+    if isinstance(datos, pd.DataFrame):
+        datos = {col: datos[col] for col in datos.columns}
+    # Todo se evalúa como float64: los vacíos quedan en NaN y los booleanos en 0/1
+    variables = variables_derivadas({k: pd.to_numeric(pd.Series(v), errors='coerce').to_numpy(dtype='float64')
+                                     for k, v in datos.items()})
+    n = len(variables["poblacion"])
+
+    # Nivel: 0 = En Peligro Crítico ... len(CATEGORIAS) = ninguna
+    nivel = np.full(n, len(CATEGORIAS))
+    cumplidas = []
+    for criterio, categoria, texto, predicado in reglas:
+        cumple = predicado(variables, n)
+        nivel = np.where(cumple, np.minimum(nivel, categoria), nivel)
+        cumplidas.append((criterio, categoria, texto, cumple))
+
+    # Explicación: los criterios que cumplen la categoría asignada, p. ej. "A2: reducción ≥ 50%...; D: ..."
+    explicacion = np.full(n, "", dtype=object)
+    for criterio, categoria, texto, cumple in cumplidas:
+        usar = cumple & (nivel == categoria)
+        if usar.any():
+            separador = np.where(explicacion[usar] == "", "", "; ")
+            explicacion[usar] = explicacion[usar] + separador + f"{criterio}: {texto}"
+
+    hay_evidencia = np.zeros(n, dtype=bool)
+    for variable in VARIABLES_EVIDENCIA:
+        if variable in variables:
+            hay_evidencia |= pd.notna(variables[variable])
+    sin_categoria = nivel == len(CATEGORIAS)
+    categorias = np.array(CATEGORIAS + [SIN_CATEGORIA], dtype=object)[nivel]
+    categorias[sin_categoria & ~hay_evidencia] = SIN_DATOS
+    explicacion[sin_categoria] = np.where(hay_evidencia[sin_categoria],
+                                          "ningún criterio A–E alcanza el umbral de Vulnerable",
+                                          "sin población, censos ni distribución para evaluar")
+    return categorias, explicacion
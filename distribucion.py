@@ -0,0 +1,328 @@
+import argparse
+import json
+import sqlite3
+import sys
+
+import numpy as np
+import pandas as pd
+
+from clasificacion import reclasificar_ids
+from consultas import filtro_region, rectangulos_region
+from crear_db import DB_PATH, crear_tablas
+from importador import configurar_pragmas
+
+# --- Distribución Espacial: Extensión de Presencia (EOO) y Área de Ocupación (AOO) ---
+# Cada especie puede tener puntos de ocurrencia (tabla 'ocurrencias') y polígonos de
+# rango ('rangos'); los triggers los indexan en R*Tree y anotan la especie en
+# 'distribucion_pendientes'. Para recalcular se leen solo los puntos de un lote de
+# especies cada vez (índice por especie), nunca la tabla entera:
+#   * EOO: área de la envolvente convexa de puntos y vértices de los polígonos, en una
+#     proyección cilíndrica equivalente de Lambert (conserva las áreas) centrada en la
+#     especie. Como pide la UICN, si queda por debajo del AOO se iguala al AOO.
+#   * AOO: celdas de 2×2 km ocupadas por algún punto, en una cuadrícula fija de esa
+#     proyección. Los polígonos no cuentan: un mapa de rango sobrestima la ocupación.
+# Los resultados van a 'distribucion_especie' y alimentan los criterios B1/B2/D2.
+#   python distribucion.py importar ocurrencias.csv   -> columnas especie_id, latitud, longitud, fuente
+#   python distribucion.py rangos rangos.geojson      -> polígonos con la propiedad especie_id
+#   python distribucion.py actualizar [--todas]
+#   python distribucion.py region --region -80 -20 -60 0   -> especies con registros en lon/lat mín./máx.
+
+RADIO_TIERRA_KM = 6371.0088
+CELDA_AOO_KM = 2.0
+COLUMNAS_OCURRENCIA = ['especie_id', 'latitud', 'longitud', 'fuente']
+# Nombres alternativos habituales (p. ej. descargas de GBIF en Darwin Core)
+_ALIAS_COLUMNAS = {'lat': 'latitud', 'lon': 'longitud', 'decimallatitude': 'latitud', 'decimallongitude': 'longitud'}
+# Direcciones de los 8 puntos extremos que descartan puntos interiores (heurística de Akl–Toussaint)
+_DIRECCIONES = [(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)]
+
+
+# --- Registro e importación ---
+def registrar_ocurrencias(conn, filas):
+    # filas: iterable de (especie_id, latitud, longitud, fuente). No hace commit.
+    conn.executemany('INSERT INTO ocurrencias (especie_id, latitud, longitud, fuente) VALUES (?, ?, ?, ?)', filas)
+
+
+def registrar_rango(conn, especie_id, vertices, fuente=None):
+    # vertices: anillo exterior [(lon, lat), ...]. No hace commit.
+    conn.execute('INSERT INTO rangos (especie_id, vertices, fuente) VALUES (?, ?, ?)',
+                 (especie_id, json.dumps([[float(lon), float(lat)] for lon, lat in vertices]), fuente))
+
+
+def _coordenadas_validas(latitud, longitud):
+    return latitud.between(-90, 90) & longitud.between(-180, 180)
+
+
+def importar_ocurrencias(conn, origen, tamano_lote=100000):
+    # CSV con COLUMNAS_OCURRENCIA; se ignoran filas sin especie conocida o coordenadas válidas.
+    # Cada punto se indexa en el R*Tree al insertarlo (~25-50 µs por punto): la caché grande
+    # de configurar_pragmas evita releer del disco los nodos del árbol.
+    configurar_pragmas(conn)
+    conocidas = {fila[0] for fila in conn.execute('SELECT id FROM especies WHERE borrado IS NULL')}
+    insertadas = rechazadas = 0
+    try:
+        for lote in pd.read_csv(origen, chunksize=tamano_lote, dtype=str):
+            lote = lote.rename(columns=lambda c: _ALIAS_COLUMNAS.get(c.strip().lower(), c.strip().lower()))
+            faltantes = [c for c in COLUMNAS_OCURRENCIA[:3] if c not in lote.columns]
+            if faltantes:
+                raise ValueError(f"Faltan columnas en el CSV de ocurrencias: {', '.join(faltantes)}")
+            especie_id = pd.to_numeric(lote['especie_id'], errors='coerce')
+            latitud = pd.to_numeric(lote['latitud'], errors='coerce')
+            longitud = pd.to_numeric(lote['longitud'], errors='coerce')
+            validas = especie_id.isin(conocidas) & _coordenadas_validas(latitud, longitud)
+            fuente = lote['fuente'] if 'fuente' in lote.columns else pd.Series(None, index=lote.index)
+            registrar_ocurrencias(conn, zip(especie_id[validas].astype('int64').tolist(),
+                                            latitud[validas].tolist(), longitud[validas].tolist(),
+                                            fuente[validas].astype(object).where(fuente[validas].notna(), None).tolist()))
+            insertadas += int(validas.sum())
+            rechazadas += int((~validas).sum())
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return insertadas, rechazadas
+
+
+def _anillos(geometria):
+    # Anillos exteriores de un Polygon o MultiPolygon de GeoJSON (los huecos no cambian la EOO)
+    if not geometria:
+        return []
+    if geometria.get('type') == 'Polygon':
+        return geometria['coordinates'][:1]
+    if geometria.get('type') == 'MultiPolygon':
+        return [poligono[0] for poligono in geometria['coordinates'] if poligono]
+    return []
+
+
+def importar_rangos(conn, origen):
+    # GeoJSON (FeatureCollection) con polígonos de rango y la propiedad 'especie_id'
+    with open(origen, encoding='utf-8') as f:
+        datos = json.load(f)
+    conocidas = {fila[0] for fila in conn.execute('SELECT id FROM especies WHERE borrado IS NULL')}
+    insertados = rechazados = 0
+    try:
+        for rasgo in datos.get('features', []):
+            especie_id = (rasgo.get('properties') or {}).get('especie_id')
+            fuente = (rasgo.get('properties') or {}).get('fuente')
+            anillos = _anillos(rasgo.get('geometry'))
+            if especie_id not in conocidas or not anillos:
+                rechazados += 1
+                continue
+            for anillo in anillos:
+                vertices = np.asarray(anillo, dtype='float64')[:, :2] if len(anillo) else np.empty((0, 2))
+                if len(vertices) < 3 or not _coordenadas_validas(pd.Series(vertices[:, 1]), pd.Series(vertices[:, 0])).all():
+                    rechazados += 1
+                    continue
+                registrar_rango(conn, especie_id, vertices.tolist(), fuente)
+                insertados += 1
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return insertados, rechazados
+
+
+# --- Geometría por lotes (vectorizada) ---
+def proyectar(longitud, latitud, longitud_central=0.0):
+    # Cilíndrica equivalente de Lambert en km: áreas correctas en todo el globo
+    delta = (np.asarray(longitud, dtype='float64') - longitud_central + 180.0) % 360.0 - 180.0
+    return RADIO_TIERRA_KM * np.radians(delta), RADIO_TIERRA_KM * np.sin(np.radians(latitud))
+
+
+def _longitud_central(grupo, longitud, n_grupos):
+    # Media circular de la longitud por especie, para que un rango que cruza los 180° no se parta
+    radianes = np.radians(longitud)
+    seno = np.bincount(grupo, np.sin(radianes), n_grupos)
+    coseno = np.bincount(grupo, np.cos(radianes), n_grupos)
+    return np.degrees(np.arctan2(seno, coseno))
+
+
+def _candidatos_envolvente(grupo, x, y, n_grupos):
+    # Descarta, para todas las especies a la vez, los puntos estrictamente dentro del octógono
+    # formado por sus puntos extremos en 8 direcciones: no pueden ser vértices de la envolvente
+    vx, vy = np.empty((8, n_grupos)), np.empty((8, n_grupos))
+    for k, (a, b) in enumerate(_DIRECCIONES):
+        orden = np.lexsort((a * x + b * y, grupo))
+        ultimos = orden[np.r_[np.flatnonzero(np.diff(grupo[orden])), len(orden) - 1]]
+        vx[k], vy[k] = x[ultimos], y[ultimos]
+    dentro = np.ones(len(x), dtype=bool)
+    for k in range(8):
+        x0, y0 = vx[k][grupo], vy[k][grupo]
+        x1, y1 = vx[(k + 1) % 8][grupo], vy[(k + 1) % 8][grupo]
+        # Lados de longitud cero (dos extremos en el mismo punto) no limitan nada
+        dentro &= ((x1 - x0) * (y - y0) - (y1 - y0) * (x - x0) > 0) | ((x0 == x1) & (y0 == y1))
+    return ~dentro
+
+
+def _cruz(o, a, b):
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def area_envolvente(x, y):
+    # Área de la envolvente convexa (cadena monótona de Andrew) de unos pocos puntos
+    puntos = sorted(set(zip(x, y)))
+    if len(puntos) < 3:
+        return 0.0
+    inferior, superior = [], []
+    for p in puntos:
+        while len(inferior) >= 2 and _cruz(inferior[-2], inferior[-1], p) <= 0:
+            inferior.pop()
+        inferior.append(p)
+    for p in reversed(puntos):
+        while len(superior) >= 2 and _cruz(superior[-2], superior[-1], p) <= 0:
+            superior.pop()
+        superior.append(p)
+    envolvente = inferior[:-1] + superior[:-1]
+    return abs(sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in zip(envolvente, envolvente[1:] + envolvente[:1]))) / 2
+
+
+def calcular_distribucion(puntos, vertices=None):
+    # puntos: DataFrame especie_id, latitud, longitud. vertices: lo mismo más rango_id (polígonos).
+    # Devuelve una fila por especie con n_ocurrencias, n_rangos, aoo_km2 y eoo_km2.
+    if vertices is None:
+        vertices = pd.DataFrame(columns=['especie_id', 'rango_id', 'latitud', 'longitud'])
+    todos = pd.concat([puntos[['especie_id', 'latitud', 'longitud']], vertices[['especie_id', 'latitud', 'longitud']]],
+                      ignore_index=True)
+    if todos.empty:
+        return pd.DataFrame(columns=['especie_id', 'n_ocurrencias', 'n_rangos', 'eoo_km2', 'aoo_km2'])
+    grupo, especies = pd.factorize(todos['especie_id'], sort=True)
+    n_grupos = len(especies)
+    longitud = todos['longitud'].to_numpy(dtype='float64')
+    latitud = todos['latitud'].to_numpy(dtype='float64')
+    es_punto = np.arange(len(todos)) < len(puntos)
+
+    # AOO: celdas distintas (especie, columna, fila) de la cuadrícula global, solo con puntos
+    x, y = proyectar(longitud[es_punto], latitud[es_punto])
+    celdas = pd.DataFrame({'g': grupo[es_punto], 'cx': np.floor(x / CELDA_AOO_KM).astype(np.int64),
+                           'cy': np.floor(y / CELDA_AOO_KM).astype(np.int64)}).drop_duplicates()
+    n_celdas = np.bincount(celdas['g'].to_numpy(), minlength=n_grupos)
+    n_ocurrencias = np.bincount(grupo[es_punto], minlength=n_grupos)
+    aoo = np.where(n_ocurrencias > 0, n_celdas * CELDA_AOO_KM ** 2, np.nan)
+
+    # EOO: envolvente convexa en la proyección centrada en cada especie
+    x, y = proyectar(longitud, latitud, _longitud_central(grupo, longitud, n_grupos)[grupo])
+    candidatos = _candidatos_envolvente(grupo, x, y, n_grupos)
+    g, cx, cy = grupo[candidatos], x[candidatos], y[candidatos]
+    orden = np.argsort(g, kind='stable')
+    g, cx, cy = g[orden], cx[orden], cy[orden]
+    cortes = np.flatnonzero(np.diff(g)) + 1
+    eoo = np.zeros(n_grupos)
+    for indice, xs, ys in zip(g[np.r_[0, cortes]], np.split(cx, cortes), np.split(cy, cortes)):
+        eoo[indice] = area_envolvente(xs.tolist(), ys.tolist())
+    eoo = np.fmax(eoo, aoo)
+
+    n_rangos = (vertices.groupby('especie_id')['rango_id'].nunique()
+                .reindex(especies, fill_value=0).to_numpy() if not vertices.empty else np.zeros(n_grupos, dtype=int))
+    return pd.DataFrame({'especie_id': especies, 'n_ocurrencias': n_ocurrencias, 'n_rangos': n_rangos,
+                         'eoo_km2': eoo, 'aoo_km2': aoo})
+
+
+# --- Actualización incremental ---
+def _leer_vertices(conn, marcadores, trozo):
+    filas = []
+    for rango_id, especie_id, texto in conn.execute(
+            f'SELECT id, especie_id, vertices FROM rangos WHERE especie_id IN ({marcadores})', trozo):
+        anillo = np.asarray(json.loads(texto), dtype='float64').reshape(-1, 2)
+        filas.append(pd.DataFrame({'especie_id': especie_id, 'rango_id': rango_id,
+                                   'longitud': anillo[:, 0], 'latitud': anillo[:, 1]}))
+    return pd.concat(filas, ignore_index=True) if filas else None
+
+
+def _guardar_distribucion(conn, trozo, distribucion):
+    marcadores = ", ".join("?" for _ in trozo)
+    conn.execute(f'DELETE FROM distribucion_especie WHERE especie_id IN ({marcadores})', trozo)
+    filas = distribucion.astype(object).where(distribucion.notna(), None)
+    conn.executemany('INSERT INTO distribucion_especie (especie_id, n_ocurrencias, n_rangos, eoo_km2, aoo_km2) '
+                     'VALUES (?, ?, ?, ?, ?)',
+                     filas[['especie_id', 'n_ocurrencias', 'n_rangos', 'eoo_km2', 'aoo_km2']].itertuples(index=False, name=None))
+
+
+def actualizar_distribucion(conn, especie_ids=None, tamano_lote=2000):
+    # Recalcula EOO/AOO de las especies indicadas o, por defecto, las de distribucion_pendientes.
+    # En memoria solo están los puntos de 'tamano_lote' especies a la vez.
+    if especie_ids is None:
+        especie_ids = [fila[0] for fila in conn.execute('SELECT especie_id FROM distribucion_pendientes')]
+    ids = sorted(set(especie_ids))
+    try:
+        for i in range(0, len(ids), tamano_lote):
+            trozo = ids[i:i + tamano_lote]
+            marcadores = ", ".join("?" for _ in trozo)
+            puntos = pd.read_sql_query(f'SELECT especie_id, latitud, longitud FROM ocurrencias '
+                                       f'WHERE especie_id IN ({marcadores})', conn, params=trozo)
+            _guardar_distribucion(conn, trozo, calcular_distribucion(puntos, _leer_vertices(conn, marcadores, trozo)))
+            reclasificar_ids(conn, trozo)
+            conn.executemany('DELETE FROM distribucion_pendientes WHERE especie_id = ?', ((e,) for e in trozo))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(ids)
+
+
+# --- Consultas por región ---
+def especies_en_region(conn, region):
+    # Ids de las especies con algún registro dentro de region = (lon mín., lat mín., lon máx., lat máx.)
+    condicion, params = filtro_region(region)
+    return [fila[0] for fila in conn.execute(f'SELECT e.id FROM especies e WHERE e.borrado IS NULL AND {condicion} ORDER BY e.id', params)]
+
+
+def muestra_ocurrencias(conn, region, limite=5000):
+    # Hasta 'limite' puntos de la región para dibujar en un mapa (del índice R*Tree, sin tocar la tabla)
+    filas = []
+    for min_lon, min_lat, max_lon, max_lat in rectangulos_region(region):
+        filas += conn.execute('SELECT min_lat, min_lon FROM ocurrencias_rtree '
+                              'WHERE min_lon <= ? AND max_lon >= ? AND min_lat <= ? AND max_lat >= ? LIMIT ?',
+                              (max_lon, min_lon, max_lat, min_lat, limite - len(filas))).fetchall()
+        if len(filas) >= limite:
+            break
+    return pd.DataFrame(filas, columns=['lat', 'lon'])
+
+
+def distribucion_de(conn, ids):
+    # id -> {n_ocurrencias, n_rangos, eoo_km2, aoo_km2} para mostrar en la app
+    if not ids:
+        return {}
+    marcadores = ", ".join("?" for _ in ids)
+    return {fila[0]: dict(zip(('n_ocurrencias', 'n_rangos', 'eoo_km2', 'aoo_km2'), fila[1:])) for fila in conn.execute(
+        f'SELECT especie_id, n_ocurrencias, n_rangos, eoo_km2, aoo_km2 FROM distribucion_especie '
+        f'WHERE especie_id IN ({marcadores})', list(ids))}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ocurrencias, rangos y cálculo de EOO/AOO por especie.")
+    parser.add_argument("accion", choices=["importar", "rangos", "actualizar", "region"])
+    parser.add_argument("archivo", nargs="?", help="CSV de ocurrencias ('importar') o GeoJSON de rangos ('rangos')")
+    parser.add_argument("--region", nargs=4, type=float, metavar=("LON_MIN", "LAT_MIN", "LON_MAX", "LAT_MAX"),
+                        help="Región para 'region' (si lon mín. > lon máx. cruza el antimeridiano)")
+    parser.add_argument("--todas", action="store_true", help="Recalcular todas las especies con registros")
+    parser.add_argument("--db", default=DB_PATH, help=f"Base de datos SQLite (por defecto: {DB_PATH})")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        crear_tablas(conn)
+        if args.accion == "region":
+            if not args.region:
+                parser.error("indica la región con --region LON_MIN LAT_MIN LON_MAX LAT_MAX")
+            ids = especies_en_region(conn, args.region)
+            print(f"{len(ids)} especies con registros en la región.")
+            for especie_id in ids:
+                print(especie_id)
+            return 0
+        if args.accion in ("importar", "rangos"):
+            if not args.archivo:
+                parser.error("indica el archivo a importar")
+            importar = importar_ocurrencias if args.accion == "importar" else importar_rangos
+            insertadas, rechazadas = importar(conn, args.archivo)
+            print(f"{insertadas} registros guardados, {rechazadas} rechazados.")
+        ids = None
+        if args.todas:
+            ids = [fila[0] for fila in conn.execute('SELECT especie_id FROM ocurrencias UNION SELECT especie_id FROM rangos')]
+        actualizadas = actualizar_distribucion(conn, ids)
+        print(f"EOO y AOO recalculados para {actualizadas} especies.")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+import math
+import re
+
+from amenazas import normalizar_texto
+
+# --- Detección de Especies Duplicadas ---
+# Dos mecanismos:
+#  * Duplicados exactos: 'clave_cientifica' es el nombre científico normalizado (sin
+#    mayúsculas, acentos ni signos) y tiene un índice UNIQUE; importar o guardar una
+#    especie con una clave ya existente actualiza esa especie en lugar de duplicarla.
+#  * Casi duplicados ("Panthera onca" / "Pantera onca"): el índice FTS5 'especies_trigramas'
+#    (tokenizador trigram sobre los nombres normalizados 'clave_nombre' y 'clave_cientifica')
+#    devuelve candidatos que comparten trigramas sin recorrer la
+#    tabla, y se confirman con el coeficiente de Dice entre trigramas. Los pares se
+#    anotan en 'posibles_duplicados' para revisarlos; nunca se borra nada automáticamente.
+
+UMBRAL_SIMILITUD = 0.7
+CANDIDATOS_POR_FILA = 20
+
+_NO_ALFANUMERICO = re.compile(r"[^0-9a-z ]+")
+_NUMEROS = re.compile(r"\d+")
+
+
+def normalizar_nombre(texto):
+    # "  Panthera  Onca (Linnaeus)" -> "panthera onca linnaeus"; None si queda vacío
+    if not isinstance(texto, str):
+        return None
+    clave = " ".join(_NO_ALFANUMERICO.sub(" ", normalizar_texto(texto)).split())
+    return clave or None
+
+
+def _trigramas(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def similitud(a, b):
+    # Coeficiente de Dice entre los trigramas de los nombres normalizados ("panthera onca" /
+    # "pantera onca" = 0.76; "panthera onca" / "panthera uncia" = 0.61). Si llevan números distintos
+    # (poblaciones o registros numerados) se consideran especies distintas.
+    a, b = normalizar_nombre(a) or "", normalizar_nombre(b) or ""
+    if _NUMEROS.findall(a) != _NUMEROS.findall(b):
+        return 0.0
+    ta, tb = _trigramas(a), _trigramas(b)
+    if not ta or not tb:
+        return 0.0
+    return 2 * len(ta & tb) / (len(ta) + len(tb))
+
+
+# --- Búsqueda de candidatos en el índice de trigramas ---
+def frecuencias_trigramas(conn, terminos, frecuencias=None):
+    # Trigrama -> {columna: número de especies que lo contienen}, leyendo del vocabulario solo
+    # los trigramas que aún no están en 'frecuencias' (una pasada de detección reutiliza el mismo
+    # diccionario). Las cifras solo ordenan los trigramas de la consulta, así que no importa
+    # que queden algo desfasadas durante la pasada.
+    frecuencias = {} if frecuencias is None else frecuencias
+    faltan = [t for t in terminos if t not in frecuencias]
+    for i in range(0, len(faltan), 500):
+        tramo = faltan[i:i + 500]
+        for termino in tramo:
+            frecuencias[termino] = {}
+        marcadores = ", ".join("?" for _ in tramo)
+        for termino, columna, n in conn.execute(
+                f'SELECT term, col, doc FROM especies_trigramas_vocab WHERE term IN ({marcadores})', tramo):
+            frecuencias[termino][columna] = n
+    return frecuencias
+
+
+def _consulta_trigramas(conn, clave, columna, frecuencias, umbral):
+    # clave: el nombre ya normalizado, igual que lo que guarda el índice y lo que compara similitud.
+    # Filtro de prefijo: si el Dice con un candidato es >= umbral, comparten al menos
+    # m = ceil(umbral * n / (2 - umbral)) de los n trigramas, así que al menos uno de los
+    # n - m + 1 menos frecuentes. Basta buscar esos, que tienen las listas de apariciones más cortas.
+    terminos = _trigramas(clave)
+    if not terminos:
+        return None
+    frecuencias_trigramas(conn, terminos, frecuencias)
+    prefijo = len(terminos) - math.ceil(umbral * len(terminos) / (2 - umbral)) + 1
+    raros = sorted(terminos, key=lambda t: (frecuencias[t].get(columna, 0), t))[:prefijo]
+    consulta = f"{columna} : (" + " OR ".join('"' + t.replace('"', '""') + '"' for t in raros) + ")"
+    # Con números distintos no hay duplicado (ver similitud): se exigen los mismos números
+    # (el tokenizador solo busca subcadenas de 3 caracteres o más)
+    for numero in _NUMEROS.findall(clave):
+        if len(numero) >= 3:
+            consulta += f' AND {columna} : "{numero}"'
+    return consulta
+
+
+def buscar_parecidas(conn, nombre, nombre_cientifico, frecuencias=None, umbral=UMBRAL_SIMILITUD, antes_de_id=None):
+    # Especies con nombre científico parecido (o, si no hay, nombre común parecido).
+    # antes_de_id limita a especies más antiguas. Devuelve [(id, nombre, similitud, motivo)].
+    clave_cientifica = normalizar_nombre(nombre_cientifico)
+    columna, clave = ('clave_cientifica', clave_cientifica) if clave_cientifica else ('clave_nombre', normalizar_nombre(nombre))
+    if not clave:
+        return []
+    consulta = _consulta_trigramas(conn, clave, columna, {} if frecuencias is None else frecuencias, umbral)
+    if consulta is None:
+        return []
+    filtro_id = 'AND t.rowid < ?' if antes_de_id is not None else ''
+    params = [consulta] + ([antes_de_id] if antes_de_id is not None else [])
+    # Las especies borradas siguen en el índice (se pueden restaurar) pero no son candidatas
+    sql = (f'SELECT t.rowid, e.nombre, e.{columna} FROM especies_trigramas t JOIN especies e ON e.id = t.rowid '
+           f'WHERE especies_trigramas MATCH ? {filtro_id} AND e.borrado IS NULL')
+    # Lo habitual es que haya pocos candidatos y se comprueban todos; solo si hay más de
+    # CANDIDATOS_POR_FILA se ordenan por relevancia (bm25), que es más caro
+    candidatos = conn.execute(f'{sql} LIMIT ?', params + [CANDIDATOS_POR_FILA + 1]).fetchall()
+    if len(candidatos) > CANDIDATOS_POR_FILA:
+        candidatos = conn.execute(f'{sql} ORDER BY t.rank LIMIT ?', params + [CANDIDATOS_POR_FILA]).fetchall()
+    motivo = "nombre científico parecido" if columna == 'clave_cientifica' else "nombre común parecido"
+    parecidas = []
+    for candidato_id, candidato_nombre, candidato_texto in candidatos:
+        s = similitud(clave, candidato_texto)
+        if s >= umbral:
+            parecidas.append((candidato_id, candidato_nombre, round(s, 3), motivo))
+    return sorted(parecidas, key=lambda p: -p[2])
+
+
+def _anotar_duplicados(conn, especies, frecuencias, umbral):
+    # Compara cada (id, nombre, nombre científico) con las especies anteriores y anota los pares.
+    # Devuelve el número de especies marcadas.
+    pares = []
+    for especie_id, nombre, nombre_cientifico in especies:
+        for candidato_id, _, s, motivo in buscar_parecidas(conn, nombre, nombre_cientifico, frecuencias, umbral, especie_id):
+            pares.append((especie_id, candidato_id, s, motivo))
+    conn.executemany('INSERT OR IGNORE INTO posibles_duplicados (especie_id, candidato_id, similitud, motivo) '
+                     'VALUES (?, ?, ?, ?)', pares)
+    return len({p[0] for p in pares})
+
+
+def detectar_duplicados(conn, desde_id, umbral=UMBRAL_SIMILITUD):
+    # Compara cada especie con id > desde_id con las anteriores y anota los casi duplicados.
+    # Pensado para pocas filas (guardar una especie); para una importación grande, detectar_por_tramos.
+    # No hace commit. Devuelve el número de especies marcadas.
+    especies = conn.execute('SELECT id, nombre, nombre_cientifico FROM especies WHERE id > ? AND borrado IS NULL',
+                            (desde_id,)).fetchall()
+    return _anotar_duplicados(conn, especies, {}, umbral)
+
+
+def detectar_por_tramos(conn, desde_id=0, tamano_lote=5000, umbral=UMBRAL_SIMILITUD):
+    # Generador: pasada de detección aparte de la importación (cada fila cuesta una consulta al
+    # índice de trigramas). Recorre por tramos de id (> desde_id) y cede (último id, especies
+    # marcadas) tras cada uno. No hace commit (ver clasificacion.reclasificar_por_tramos).
+    frecuencias = {}
+    while True:
+        especies = conn.execute('SELECT id, nombre, nombre_cientifico FROM especies WHERE id > ? AND borrado IS NULL '
+                                'ORDER BY id LIMIT ?', (desde_id, tamano_lote)).fetchall()
+        if not especies:
+            return
+        marcadas = _anotar_duplicados(conn, especies, frecuencias, umbral)
+        desde_id = especies[-1][0]
+        yield desde_id, marcadas
+
+
+def duplicados_de(conn, ids):
+    # id -> [(id del candidato, nombre, similitud, motivo)] para mostrar en la app
+    if not ids:
+        return {}
+    marcadores = ", ".join("?" for _ in ids)
+    resultado = {}
+    for especie_id, candidato_id, nombre, s, motivo in conn.execute(f'''
+        SELECT d.especie_id, d.candidato_id, e.nombre, d.similitud, d.motivo
+        FROM posibles_duplicados d JOIN especies e ON e.id = d.candidato_id
+        WHERE d.especie_id IN ({marcadores}) AND e.borrado IS NULL
+        ORDER BY d.similitud DESC
+    ''', list(ids)):
+        resultado.setdefault(especie_id, []).append((candidato_id, nombre, s, motivo))
+    return resultado
+
+
+# --- Migración ---
+def asignar_claves(conn, tamano_lote=10000):
+    # Calcula clave_cientifica de las especies existentes. Si varias comparten clave, la más
+    # antigua se la queda y las demás quedan sin clave y anotadas como duplicado exacto.
+    primeras = {}
+    actualizaciones, pares = [], []
+    cursor = conn.execute('SELECT id, nombre_cientifico FROM especies ORDER BY id')
+    while True:
+        lote = cursor.fetchmany(tamano_lote)
+        if not lote:
+            break
+        for especie_id, nombre_cientifico in lote:
+            clave = normalizar_nombre(nombre_cientifico)
+            if clave is None:
+                continue
+            if clave in primeras:
+                pares.append((especie_id, primeras[clave], 1.0, "mismo nombre científico"))
+            else:
+                primeras[clave] = especie_id
+                actualizaciones.append((clave, especie_id))
+    conn.executemany('UPDATE especies SET clave_cientifica = ? WHERE id = ?', actualizaciones)
+    conn.executemany('INSERT OR IGNORE INTO posibles_duplicados (especie_id, candidato_id, similitud, motivo) '
+                     'VALUES (?, ?, ?, ?)', pares)
+    return len(pares)
+
+
+def asignar_claves_nombre(conn, tamano_lote=10000):
+    # Calcula clave_nombre (nombre común normalizado, para el índice de trigramas) de las especies existentes
+    desde_id = 0
+    while True:
+        lote = conn.execute('SELECT id, nombre FROM especies WHERE id > ? ORDER BY id LIMIT ?',
+                            (desde_id, tamano_lote)).fetchall()
+        if not lote:
+            break
+        desde_id = lote[-1][0]
+        conn.executemany('UPDATE especies SET clave_nombre = ? WHERE id = ?',
+                         [(normalizar_nombre(nombre), especie_id) for especie_id, nombre in lote])
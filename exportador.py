@@ -0,0 +1,97 @@
+import csv
+import importlib.util
+import io
+import tempfile
+
+from consultas import consulta_filtrada
+
+# --- Exportación por Lotes (CSV y Parquet) ---
+# Las filas se leen del cursor de SQLite en lotes y se escriben según llegan, así
+# que la memoria depende del tamaño del lote y no del número de especies.
+# Parquet (columnar y comprimido) necesita pyarrow, que es opcional.
+
+TAMANO_LOTE_EXPORTAR = 10000
+
+# formato -> (nombre de archivo, tipo MIME)
+FORMATOS = {
+    "csv": ("especies_bioguard.csv", "text/csv"),
+    "parquet": ("especies_bioguard.parquet", "application/vnd.apache.parquet"),
+}
+
+# Columnas enteras y reales de especies; el resto se exporta como texto
+_COLUMNAS_ENTERAS = {"id", "poblacion_estimada"}
+_COLUMNAS_REALES = {"riesgo"}
+
+
+def parquet_disponible():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _lotes(cursor, tamano_lote):
+    while True:
+        lote = cursor.fetchmany(tamano_lote)
+        if not lote:
+            return
+        yield lote
+
+
+def escribir_csv(conn, salida, sql, params=(), tamano_lote=TAMANO_LOTE_EXPORTAR):
+    # salida: archivo de texto abierto con newline=""
+    cursor = conn.execute(sql, params)
+    escritor = csv.writer(salida, lineterminator="\n")
+    escritor.writerow([columna[0] for columna in cursor.description])
+    filas = 0
+    for lote in _lotes(cursor, tamano_lote):
+        escritor.writerows(lote)
+        filas += len(lote)
+    return filas
+
+
+def escribir_parquet(conn, salida, sql, params=(), tamano_lote=TAMANO_LOTE_EXPORTAR, compresion="zstd"):
+    # salida: ruta o archivo binario. Cada lote se escribe como un row group.
+    if not parquet_disponible():
+        raise RuntimeError("La exportación a Parquet necesita pyarrow (pip install pyarrow).")
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    cursor = conn.execute(sql, params)
+    esquema = pa.schema([(columna[0], pa.int64() if columna[0] in _COLUMNAS_ENTERAS else
+                          pa.float64() if columna[0] in _COLUMNAS_REALES else pa.string())
+                         for columna in cursor.description])
+    filas = 0
+    with pq.ParquetWriter(salida, esquema, compression=compresion) as escritor:
+        for lote in _lotes(cursor, tamano_lote):
+            columnas = [pa.array(valores, type=campo.type) for valores, campo in zip(zip(*lote), esquema)]
+            escritor.write_table(pa.Table.from_arrays(columnas, schema=esquema))
+            filas += len(lote)
+    return filas
+
+
+def exportar_especies(conn, salida, formato="csv", search_query="", estado="Todos", paises=None,
+                      sort_by=None, tamano_lote=TAMANO_LOTE_EXPORTAR, region=None):
+    # Exporta las especies que cumplen los filtros de "Explorar Especies"; devuelve el número de filas
+    sql, params = consulta_filtrada(search_query, estado, paises, sort_by, region)
+    if formato == "parquet":
+        return escribir_parquet(conn, salida, sql, params, tamano_lote)
+    return escribir_csv(conn, salida, sql, params, tamano_lote)
+
+
+def archivo_exportacion(conn, formato="csv", search_query="", estado="Todos", paises=None, sort_by=None,
+                        region=None):
+    # Vuelca la exportación a un archivo temporal (en disco, no en memoria) y lo devuelve
+    # listo para leer desde el principio; se borra solo al cerrarlo, así que quien llama
+    # lo usa con 'with'. Si la exportación falla, se cierra aquí.
+    archivo = tempfile.TemporaryFile()
+    try:
+        if formato == "parquet":
+            exportar_especies(conn, archivo, "parquet", search_query, estado, paises, sort_by, region=region)
+        else:
+            texto = io.TextIOWrapper(archivo, encoding="utf-8", newline="")
+            exportar_especies(conn, texto, "csv", search_query, estado, paises, sort_by, region=region)
+            texto.flush()
+            texto.detach()
+    except BaseException:
+        archivo.close()
+        raise
+    archivo.seek(0)
+    return archivo
@@ -0,0 +1,199 @@
+import argparse
+import os
+import sqlite3
+import sys
+
+import numpy as np
+import pandas as pd
+
+from crear_db import crear_tablas
+from distribucion import COLUMNAS_OCURRENCIA, registrar_ocurrencias
+from importador import COLUMNAS_REQUERIDAS, TAMANO_LOTE, configurar_pragmas, insertar_lote, preparar_lote
+
+# --- Generador de Especies Sintéticas ---
+# Crea N especies con distribuciones realistas (poblaciones log-normales, listas de
+# países y amenazas con frecuencias sesgadas) para medir la app a gran escala.
+#   python generar_datos.py 100000 --csv especies_100k.csv
+#   python generar_datos.py 1000000 --db bench.db
+#   python generar_datos.py 100000 --db bench.db --ocurrencias 5000000   -> además, puntos de ocurrencia
+
+ESTADOS = ["En Peligro Crítico", "En Peligro", "Vulnerable", "Casi Amenazado",
+           "Preocupación Menor", "Datos Insuficientes", "No Evaluado"]
+PESOS_ESTADOS = [0.06, 0.10, 0.14, 0.10, 0.45, 0.10, 0.05]
+
+TENDENCIAS = ["Decreciendo", "Estable", "Creciendo", "Desconocida"]
+PESOS_TENDENCIAS = [0.40, 0.28, 0.12, 0.20]
+
+PAISES = [
+    "Brasil", "Colombia", "Perú", "Ecuador", "México", "Indonesia", "Madagascar", "Australia",
+    "China", "India", "Venezuela", "Bolivia", "Congo", "RDC", "Kenia", "Tanzania", "Sudáfrica",
+    "Filipinas", "Papúa Nueva Guinea", "Malasia", "Estados Unidos", "Canadá", "Rusia", "Argentina",
+    "Chile", "Costa Rica", "Panamá", "Guatemala", "Honduras", "Nicaragua", "Cuba", "Nepal",
+    "Bangladesh", "Myanmar", "Tailandia", "Vietnam", "Camboya", "Laos", "Mongolia", "Kazajistán",
+    "Namibia", "Botsuana", "Zimbabue", "Uganda", "Ruanda", "Etiopía", "Camerún", "Gabón",
+    "Nigeria", "Ghana", "Marruecos", "España", "Portugal", "Francia", "Noruega", "Groenlandia",
+    "Japón", "Nueva Zelanda", "Sri Lanka", "Pakistán",
+]
+
+# Incluye variantes de mayúsculas y acentos, como en los inventarios reales
+AMENAZAS = [
+    "Pérdida de hábitat", "Deforestación", "Caza furtiva", "Cambio climático", "Contaminación",
+    "Especies invasoras", "Agricultura", "Minería", "Tráfico ilegal", "Pesca incidental",
+    "Fragmentación de hábitat", "Incendios", "Urbanización", "Enfermedades", "Represas",
+    "Caza ilegal", "Sobrepesca", "Conflicto con humanos", "Turismo no regulado", "Ganadería",
+    "caza furtiva", "deforestacion", "Perdida de habitat", "Tala ilegal", "Pesticidas",
+]
+
+_GENEROS = ["Panthera", "Ateles", "Bufo", "Rana", "Ara", "Pongo", "Chelonia", "Ursus", "Tapirus",
+            "Lepidochelys", "Crocodylus", "Dendrobates", "Harpia", "Lynx", "Canis", "Vultur"]
+_SILABAS = ["ma", "ri", "to", "la", "ne", "qui", "so", "ta", "ru", "ven", "lo", "ca", "dor", "mi"]
+_TIPOS = ["Rana", "Mono", "Loro", "Tortuga", "Tigre", "Oso", "Tapir", "Águila", "Cocodrilo", "Lince",
+          "Colibrí", "Murciélago", "Salamandra", "Delfín", "Ciervo", "Lagarto"]
+_EPITETOS = ["de Montaña", "Dorado", "Moteado", "del Bosque", "Andino", "de Río", "Gigante",
+             "Enano", "Nocturno", "de Cola Larga", "Rojo", "Costero", "de las Nieves", "Tropical"]
+
+
+def _elegir(rng, opciones, n, pesos=None):
+    return rng.choice(np.array(opciones, dtype=object), n, p=pesos)
+
+
+def _pesos_zipf(k, s=1.1):
+    pesos = 1.0 / np.arange(1, k + 1) ** s
+    return pesos / pesos.sum()
+
+
+def _listas(rng, opciones, n, max_elementos, media):
+    # Cadenas "A, B, C" con entre 1 y max_elementos valores, sesgadas hacia los primeros de la lista
+    cantidad = np.clip(rng.geometric(1.0 / media, n), 1, max_elementos)
+    indices = rng.choice(len(opciones), (n, max_elementos), p=_pesos_zipf(len(opciones)))
+    opciones = np.array(opciones, dtype=object)
+    resultado = pd.Series(opciones[indices[:, 0]])
+    for j in range(1, max_elementos):
+        siguiente = pd.Series(opciones[indices[:, j]])
+        resultado = resultado.where(cantidad <= j, resultado + ", " + siguiente)
+    return resultado
+
+
+def generar_lote(n, rng, desde=0):
+    # DataFrame de n especies con las columnas del CSV de importación
+    ids = pd.Series(np.arange(desde, desde + n)).astype(str)
+    silabas = [pd.Series(_elegir(rng, _SILABAS, n)) for _ in range(3)]
+    epiteto = silabas[0] + silabas[1] + silabas[2] + "us"
+    nombre_cientifico = pd.Series(_elegir(rng, _GENEROS, n)) + " " + epiteto + " " + ids
+    nombre = pd.Series(_elegir(rng, _TIPOS, n)) + " " + pd.Series(_elegir(rng, _EPITETOS, n)) + " " + ids
+
+    poblacion = np.round(rng.lognormal(mean=8.5, sigma=2.2, size=n)).astype("int64")
+    poblacion = pd.Series(poblacion, dtype="Int64").mask(rng.random(n) < 0.05) # 5% sin dato
+
+    amenazas = _listas(rng, AMENAZAS, n, 5, 2.2)
+    paises = _listas(rng, PAISES, n, 6, 1.8)
+    descripcion = ("Especie sintética generada para pruebas de rendimiento. Habita en " + paises
+                   + " y se ve afectada por " + amenazas.str.lower() + ".")
+
+    return pd.DataFrame({
+        'nombre': nombre,
+        'nombre_cientifico': nombre_cientifico,
+        'descripcion': descripcion,
+        'estado_conservacion': _elegir(rng, ESTADOS, n, PESOS_ESTADOS),
+        'estado_sugerido_uicn': None,
+        'poblacion_estimada': poblacion,
+        'tendencia_poblacion': _elegir(rng, TENDENCIAS, n, PESOS_TENDENCIAS),
+        'amenazas': amenazas,
+        'pais': paises,
+    })[COLUMNAS_REQUERIDAS]
+
+
+def generar_especies(n, semilla=42, tamano_lote=TAMANO_LOTE):
+    # Genera los lotes de forma perezosa: la memoria depende del lote, no de n
+    rng = np.random.default_rng(semilla)
+    for desde in range(0, n, tamano_lote):
+        yield generar_lote(min(tamano_lote, n - desde), rng, desde)
+
+
+def escribir_csv(ruta, n, semilla=42, tamano_lote=TAMANO_LOTE):
+    if os.path.exists(ruta):
+        os.remove(ruta)
+    for i, lote in enumerate(generar_especies(n, semilla, tamano_lote)):
+        lote.to_csv(ruta, mode='a', index=False, header=(i == 0))
+
+
+def poblar_db(conn, n, semilla=42, tamano_lote=TAMANO_LOTE):
+    # Inserta directamente con el mismo camino que el importador (validación, clasificación, enlaces)
+    crear_tablas(conn)
+    insertadas = 0
+    try:
+        for lote in generar_especies(n, semilla, tamano_lote):
+            validas, _ = preparar_lote(lote.astype('string'))
+            insertadas += insertar_lote(conn, validas)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return insertadas
+
+
+# --- Ocurrencias sintéticas ---
+def generar_ocurrencias(n, especie_ids, semilla=42, tamano_lote=TAMANO_LOTE):
+    # Lotes de n puntos repartidos entre especie_ids: cada especie tiene un centro y un radio
+    # (log-normal, de pocos km a cientos) y sus puntos se dispersan alrededor del centro
+    rng = np.random.default_rng(semilla)
+    especie_ids = np.asarray(especie_ids)
+    centro_lat = rng.uniform(-50, 65, len(especie_ids))
+    centro_lon = rng.uniform(-180, 180, len(especie_ids))
+    radio_grados = np.clip(rng.lognormal(mean=0.0, sigma=1.2, size=len(especie_ids)), 0.02, 15) / 2
+    pesos = _pesos_zipf(len(especie_ids), s=0.6)[rng.permutation(len(especie_ids))]
+    for desde in range(0, n, tamano_lote):
+        k = min(tamano_lote, n - desde)
+        especie = rng.choice(len(especie_ids), k, p=pesos)
+        latitud = np.clip(centro_lat[especie] + rng.normal(0, 1, k) * radio_grados[especie], -90, 90)
+        longitud = (centro_lon[especie] + rng.normal(0, 1, k) * radio_grados[especie] + 180) % 360 - 180
+        yield pd.DataFrame({'especie_id': especie_ids[especie], 'latitud': latitud.round(5),
+                            'longitud': longitud.round(5), 'fuente': 'sintética'})[COLUMNAS_OCURRENCIA]
+
+
+def poblar_ocurrencias(conn, n, semilla=42, tamano_lote=TAMANO_LOTE):
+    # Inserta n puntos para las especies ya existentes; devuelve cuántos
+    especie_ids = [fila[0] for fila in conn.execute('SELECT id FROM especies ORDER BY id')]
+    if not especie_ids:
+        return 0
+    configurar_pragmas(conn)
+    try:
+        for lote in generar_ocurrencias(n, especie_ids, semilla, tamano_lote):
+            registrar_ocurrencias(conn, lote.itertuples(index=False, name=None))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return n
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera especies sintéticas para pruebas de rendimiento.")
+    parser.add_argument("filas", type=int, help="Número de especies a generar (p. ej. 10000 a 10000000)")
+    parser.add_argument("--csv", help="Escribir las especies en este archivo CSV")
+    parser.add_argument("--db", help="Insertar las especies en esta base de datos SQLite")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--lote", type=int, default=TAMANO_LOTE, help="Filas por lote")
+    parser.add_argument("--ocurrencias", type=int, default=0, help="Puntos de ocurrencia a generar en --db")
+    args = parser.parse_args(argv)
+
+    if not args.csv and not args.db:
+        parser.error("indica --csv y/o --db")
+    if args.csv:
+        escribir_csv(args.csv, args.filas, args.semilla, args.lote)
+        print(f"{args.filas} especies escritas en {args.csv}")
+    if args.db:
+        conn = sqlite3.connect(args.db)
+        try:
+            insertadas = poblar_db(conn, args.filas, args.semilla, args.lote)
+            print(f"{insertadas} especies insertadas en {args.db}", file=sys.stderr)
+            if args.ocurrencias:
+                puntos = poblar_ocurrencias(conn, args.ocurrencias, args.semilla, args.lote)
+                print(f"{puntos} ocurrencias insertadas (python distribucion.py actualizar para calcular EOO/AOO)",
+                      file=sys.stderr)
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+import argparse
+import os
+import sqlite3
+import sys
+
+import pandas as pd
+
+from clasificacion import clasificar_uicn_lote
+from crear_db import DB_PATH, crear_tablas
+from paises import vincular_paises_lote
+from amenazas import vincular_amenazas_lote
+from duplicados import detectar_duplicados, detectar_por_tramos, duplicados_de, normalizar_nombre
+from metricas import medir, volcar
+
+# --- Motor de Importación Masiva de CSV ---
+# Lee el CSV por lotes de tamaño fijo, valida y convierte tipos por columnas,
+# inserta con executemany dentro de una única transacción y acumula las filas
+# rechazadas en un archivo aparte. Las especies cuyo nombre científico normalizado ya
+# existe se actualizan en lugar de duplicarse. La búsqueda de casi duplicados entre las
+# nuevas (índice de trigramas, ver duplicados.py) es una pasada aparte, tras confirmar
+# la importación: con --duplicados aquí, o como trabajo 'detectar_duplicados' desde la app.
+# Se usa desde app.py y desde la línea de comandos:
+#   python importador.py inventario.csv --rechazos rechazadas.csv --duplicados
+
+COLUMNAS_REQUERIDAS = [
+    'nombre', 'nombre_cientifico', 'descripcion', 'estado_conservacion',
+    'estado_sugerido_uicn', 'poblacion_estimada', 'tendencia_poblacion',
+    'amenazas', 'pais'
+]
+
+TAMANO_LOTE = 50000
+
+_SQL_INSERTAR = '''
+    INSERT INTO especies (
+        nombre, nombre_cientifico, descripcion, estado_conservacion,
+        estado_sugerido_uicn, poblacion_estimada, tendencia_poblacion,
+        amenazas, pais, criterios_uicn, clave_nombre, clave_cientifica
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+_SQL_ACTUALIZAR = '''
+    UPDATE especies SET
+        nombre = ?, nombre_cientifico = ?, descripcion = ?, estado_conservacion = ?,
+        estado_sugerido_uicn = ?, poblacion_estimada = ?, tendencia_poblacion = ?,
+        amenazas = ?, pais = ?, criterios_uicn = ?, clave_nombre = ?, borrado = NULL
+    WHERE id = ?
+'''
+# Las requeridas más la explicación del clasificador y las claves de los nombres normalizados,
+# que calcula preparar_lote (la del nombre científico, la última, no cambia al actualizar)
+_COLUMNAS_INSERTAR = COLUMNAS_REQUERIDAS + ['criterios_uicn', 'clave_nombre', 'clave_cientifica']
+
+
+def columnas_faltantes(columnas):
+    columnas = [str(c).lower() for c in columnas]
+    return [col for col in COLUMNAS_REQUERIDAS if col not in columnas]
+
+
+def preparar_lote(df):
+    # Devuelve (DataFrame válido con las columnas de la tabla, DataFrame rechazado con 'motivo')
+    df.columns = df.columns.str.lower()
+    df = df.reindex(columns=COLUMNAS_REQUERIDAS)
+    for col in COLUMNAS_REQUERIDAS:
+        df[col] = df[col].str.strip()
+
+    motivo = pd.Series(pd.NA, index=df.index, dtype="object")
+    poblacion = pd.to_numeric(df['poblacion_estimada'], errors='coerce').astype('float64')
+    motivo = motivo.mask(df['poblacion_estimada'].notna() & poblacion.isna(), "poblacion_estimada no numérica")
+    motivo = motivo.mask(motivo.isna() & (poblacion < 0), "poblacion_estimada negativa")
+    motivo = motivo.mask(df['estado_conservacion'].fillna('') == '', "falta estado_conservacion")
+    motivo = motivo.mask(df['nombre'].fillna('') == '', "falta nombre")
+
+    # Clave de duplicados: si el archivo repite un nombre científico, vale la última fila
+    clave = df['nombre_cientifico'].map(normalizar_nombre, na_action='ignore').astype(object)
+    repetida = clave.notna() & motivo.isna() & clave.where(motivo.isna()).duplicated(keep='last')
+    motivo = motivo.mask(repetida, "nombre científico repetido en el archivo")
+
+    rechazadas = df[motivo.notna()].assign(motivo=motivo[motivo.notna()])
+    validas = df[motivo.isna()].copy()
+
+    validas['clave_cientifica'] = clave[motivo.isna()].where(clave[motivo.isna()].notna(), None)
+    validas['clave_nombre'] = validas['nombre'].map(normalizar_nombre)
+    validas['poblacion_estimada'] = poblacion[motivo.isna()].fillna(0).astype('int64')
+    validas['tendencia_poblacion'] = validas['tendencia_poblacion'].fillna('Desconocida')
+    for col in ['nombre_cientifico', 'descripcion', 'amenazas', 'pais']:
+        validas[col] = validas[col].fillna('')
+
+    # Re-clasificar solo las filas que no traen sugerencia (guardando qué criterios se cumplen)
+    validas['criterios_uicn'] = pd.Series(None, index=validas.index, dtype=object)
+    sin_sugerencia = validas['estado_sugerido_uicn'].isna()
+    if sin_sugerencia.any():
+        pendientes = validas[sin_sugerencia]
+        sugeridos, explicaciones = clasificar_uicn_lote(
+            pendientes['poblacion_estimada'], pendientes['tendencia_poblacion'],
+            pendientes['amenazas'], pendientes['pais'], explicar=True)
+        validas.loc[sin_sugerencia, 'estado_sugerido_uicn'] = sugeridos
+        validas.loc[sin_sugerencia, 'criterios_uicn'] = explicaciones
+    return validas, rechazadas
+
+
+def separar_existentes(conn, validas):
+    # Divide un lote de preparar_lote en (nuevas, existentes); 'existentes' lleva el 'id' de la
+    # especie con la misma clave_cientifica. Una consulta por el índice único cada 500 claves.
+    claves = validas['clave_cientifica'].dropna().unique().tolist()
+    ids = {}
+    for i in range(0, len(claves), 500):
+        trozo = claves[i:i + 500]
+        marcadores = ", ".join("?" for _ in trozo)
+        ids.update(conn.execute(f'SELECT clave_cientifica, id FROM especies WHERE clave_cientifica IN ({marcadores})',
+                                trozo).fetchall())
+    existe = validas['clave_cientifica'].isin(ids.keys())
+    existentes = validas[existe].assign(id=validas.loc[existe, 'clave_cientifica'].map(ids))
+    return validas[~existe], existentes
+
+
+def actualizar_lote(conn, existentes):
+    # Sobrescribe las especies ya registradas con los datos del lote (restaurando las que estaban
+    # borradas) y vuelve a enlazar sus países y amenazas (los triggers mantienen FTS y resúmenes).
+    # No hace commit.
+    if existentes.empty:
+        return 0
+    columnas = _COLUMNAS_INSERTAR[:-1] + ['id']
+    conn.executemany(_SQL_ACTUALIZAR, zip(*(existentes[col].tolist() for col in columnas)))
+    ids = [(i,) for i in existentes['id'].tolist()]
+    conn.executemany('DELETE FROM especie_pais WHERE especie_id = ?', ids)
+    conn.executemany('DELETE FROM especie_amenaza WHERE especie_id = ?', ids)
+    vincular_paises_lote(conn, zip(existentes['id'].tolist(), existentes['pais'].tolist()))
+    vincular_amenazas_lote(conn, zip(existentes['id'].tolist(), existentes['amenazas'].tolist()))
+    return len(existentes)
+
+
+def insertar_lote(conn, validas):
+    # Inserta un lote ya validado por preparar_lote (sin claves existentes, ver
+    # separar_existentes) y enlaza países y amenazas.
+    # No hace commit: la transacción la controla quien llama.
+    if validas.empty:
+        return 0
+    ultimo_id = conn.execute('SELECT IFNULL(MAX(id), 0) FROM especies').fetchone()[0]
+    # Columnas a listas de Python: más rápido de recorrer que itertuples y sin escalares de NumPy
+    conn.executemany(_SQL_INSERTAR, zip(*(validas[col].tolist() for col in _COLUMNAS_INSERTAR)))
+    # Los ids nuevos son los mayores que el último existente (AUTOINCREMENT)
+    nuevos = conn.execute('SELECT id, pais, amenazas FROM especies WHERE id > ?', (ultimo_id,)).fetchall()
+    vincular_paises_lote(conn, [(especie_id, pais) for especie_id, pais, _ in nuevos])
+    vincular_amenazas_lote(conn, [(especie_id, amenazas) for especie_id, _, amenazas in nuevos])
+    return len(validas)
+
+
+def _tamano(origen):
+    try:
+        posicion = origen.tell()
+        origen.seek(0, os.SEEK_END)
+        tamano = origen.tell()
+        origen.seek(posicion)
+        return tamano
+    except (AttributeError, OSError):
+        return None
+
+
+def configurar_pragmas(conn):
+    # Ajustes para carga masiva: menos fsync, caché grande y temporales en memoria
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute('PRAGMA cache_size = -65536')
+    conn.execute('PRAGMA temp_store = MEMORY')
+
+
+def resultado_vacio():
+    # desde_id: id máximo antes de importar; las especies nuevas tienen ids mayores
+    return {"insertadas": 0, "actualizadas": 0, "rechazadas": 0, "posibles_duplicados": 0,
+            "motivos": {}, "ruta_rechazos": None, "desde_id": None}
+
+
+def procesar_lote(conn, lote, resultado, ruta_rechazos=None):
+    # Valida e inserta un lote leído del CSV y acumula los conteos en 'resultado'. No hace commit.
+    faltantes = columnas_faltantes(lote.columns)
+    if faltantes:
+        raise ValueError(f"Faltan las siguientes columnas requeridas: {', '.join(faltantes)}")
+
+    with medir('dataframe', 'preparar_lote') as m:
+        validas, rechazadas = preparar_lote(lote)
+        m['filas'] = len(lote)
+
+    with medir('importacion', 'insertar_lote') as m:
+        nuevas, existentes = separar_existentes(conn, validas)
+        resultado["actualizadas"] += actualizar_lote(conn, existentes)
+        if resultado.get("desde_id") is None:
+            resultado["desde_id"] = conn.execute('SELECT IFNULL(MAX(id), 0) FROM especies').fetchone()[0]
+        resultado["insertadas"] += insertar_lote(conn, nuevas)
+        m['filas'] = len(validas)
+
+    if not rechazadas.empty:
+        if ruta_rechazos:
+            rechazadas.to_csv(ruta_rechazos, mode='a', index=False,
+                              header=resultado["ruta_rechazos"] is None)
+            resultado["ruta_rechazos"] = ruta_rechazos
+        for m, n in rechazadas['motivo'].value_counts().items():
+            resultado["motivos"][m] = resultado["motivos"].get(m, 0) + int(n)
+        resultado["rechazadas"] += len(rechazadas)
+
+
+def guardar_especie(conn, datos):
+    # Alta de una especie (formulario, semillas) por el mismo camino que la importación:
+    # si su nombre científico ya existe se actualiza. datos: dict con COLUMNAS_REQUERIDAS y
+    # 'criterios_uicn'. No hace commit. Devuelve (id, creada, posibles duplicados).
+    fila = pd.DataFrame([{col: datos.get(col) for col in _COLUMNAS_INSERTAR[:-2]}])
+    fila['clave_nombre'] = normalizar_nombre(datos.get('nombre'))
+    fila['clave_cientifica'] = normalizar_nombre(datos.get('nombre_cientifico'))
+    nuevas, existentes = separar_existentes(conn, fila)
+    if not existentes.empty:
+        actualizar_lote(conn, existentes)
+        return int(existentes['id'].iloc[0]), False, []
+    ultimo_id = conn.execute('SELECT IFNULL(MAX(id), 0) FROM especies').fetchone()[0]
+    insertar_lote(conn, nuevas)
+    especie_id = conn.execute('SELECT MAX(id) FROM especies').fetchone()[0]
+    detectar_duplicados(conn, ultimo_id)
+    return especie_id, True, duplicados_de(conn, [especie_id]).get(especie_id, [])
+
+
+def leer_lotes(origen, tamano_lote=TAMANO_LOTE):
+    return pd.read_csv(origen, chunksize=tamano_lote, dtype=str, skipinitialspace=True)
+
+
+def importar_csv(conn, origen, tamano_lote=TAMANO_LOTE, progreso=None, ruta_rechazos=None):
+    # 'origen' puede ser una ruta o un objeto de archivo (p. ej. el de st.file_uploader).
+    # 'progreso(filas_procesadas, fraccion)' se llama tras cada lote; fraccion puede ser None.
+    # Todo se inserta en una sola transacción: si algo falla, no queda nada a medias.
+    cerrar = False
+    if isinstance(origen, (str, os.PathLike)):
+        origen = open(origen, 'rb')
+        cerrar = True
+    tamano = _tamano(origen)
+
+    resultado = resultado_vacio()
+    configurar_pragmas(conn)
+    try:
+        for lote in leer_lotes(origen, tamano_lote):
+            procesar_lote(conn, lote, resultado, ruta_rechazos)
+            if progreso:
+                fraccion = min(origen.tell() / tamano, 1.0) if tamano else None
+                progreso(resultado["insertadas"] + resultado["actualizadas"] + resultado["rechazadas"], fraccion)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if cerrar:
+            origen.close()
+    return resultado
+
+
+def detectar_importadas(conn, resultado, tamano_lote=5000):
+    # Pasada de casi duplicados sobre las especies que insertó una importación ya confirmada.
+    # Confirma tramo a tramo (anotar un par dos veces no tiene efecto). Devuelve las especies marcadas.
+    if not resultado["insertadas"]:
+        return 0
+    with medir('importacion', 'detectar_duplicados') as m:
+        for _, marcadas in detectar_por_tramos(conn, resultado["desde_id"], tamano_lote):
+            resultado["posibles_duplicados"] += marcadas
+            conn.commit()
+        m['filas'] = resultado["insertadas"]
+    return resultado["posibles_duplicados"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa especies desde un CSV a la base de datos de BioGuard.")
+    parser.add_argument("csv", help="Ruta del archivo CSV a importar")
+    parser.add_argument("--db", default=DB_PATH, help=f"Base de datos SQLite (por defecto: {DB_PATH})")
+    parser.add_argument("--lote", type=int, default=TAMANO_LOTE, help="Filas por lote")
+    parser.add_argument("--rechazos", default=None, help="Archivo CSV donde guardar las filas rechazadas")
+    parser.add_argument("--duplicados", action="store_true",
+                        help="Después de importar, buscar casi duplicados entre las especies nuevas (los duplicados "
+                             "exactos se actualizan siempre)")
+    args = parser.parse_args(argv)
+
+    if args.rechazos and os.path.exists(args.rechazos):
+        os.remove(args.rechazos)
+
+    conn = sqlite3.connect(args.db)
+    crear_tablas(conn)
+
+    def mostrar_progreso(filas, fraccion):
+        porcentaje = f" ({fraccion:.0%})" if fraccion is not None else ""
+        print(f"\r{filas} filas procesadas{porcentaje}", end="", file=sys.stderr)
+
+    try:
+        resultado = importar_csv(conn, args.csv, args.lote, mostrar_progreso, args.rechazos)
+        if args.duplicados:
+            print(file=sys.stderr)
+            print("Buscando posibles duplicados...", end="", file=sys.stderr)
+            detectar_importadas(conn, resultado)
+    finally:
+        conn.close()
+        volcar(args.db)
+    print(file=sys.stderr)
+    print(f"Importación completada: {resultado['insertadas']} insertadas, {resultado['actualizadas']} actualizadas, "
+          f"{resultado['rechazadas']} rechazadas.")
+    if resultado["posibles_duplicados"]:
+        print(f"  {resultado['posibles_duplicados']} especies nuevas se parecen a otras ya registradas "
+              f"(ver tabla posibles_duplicados).")
+    for motivo, n in resultado["motivos"].items():
+        print(f"  - {motivo}: {n}")
+    if resultado["ruta_rechazos"]:
+        print(f"Filas rechazadas guardadas en {resultado['ruta_rechazos']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+import pandas as pd
+
+# --- Instrumentación de Caminos Calientes ---
+# medir() y @cronometrado toman el tiempo de un bloque (consulta, transformación de
+# DataFrame, gráfico, importación, exportación) junto con contadores de filas y bytes.
+# Las mediciones se acumulan en memoria y volcar() las escribe en lote en una base
+# SQLite aparte (<base>_metricas.db), para no competir por el bloqueo de escritura con
+# la base de especies; la tabla es circular y guarda las últimas MAX_REGISTROS.
+# ConexionMedida cronometra cada SELECT hecho con esa conexión (incluidos los de
+# pandas) y guarda su SQL y parámetros para poder ver luego su EXPLAIN QUERY PLAN.
+# El tiempo de una consulta es hasta la primera fila (lo que tarda SQLite en
+# resolverla), sin la lectura posterior de los resultados.
+
+MAX_REGISTROS = 50000
+
+# Mediciones aún no volcadas; acotado por si nadie llama a volcar() (p. ej. en la CLI)
+_pendientes = deque(maxlen=10000)
+_hilo = threading.local()
+
+
+def ruta_metricas(ruta_db):
+    return os.path.splitext(ruta_db)[0] + '_metricas.db'
+
+
+# --- Registro ---
+def registrar(categoria, nombre, duracion_ms, filas=None, bytes_=None, detalle=None, parametros=None):
+    if getattr(_hilo, 'desactivado', False):
+        return
+    if parametros is not None and not isinstance(parametros, str):
+        parametros = json.dumps(parametros if isinstance(parametros, dict) else list(parametros),
+                                ensure_ascii=False, default=str)
+    _pendientes.append((time.time(), getattr(_hilo, 'pagina', None), categoria, nombre,
+                        duracion_ms, filas, bytes_, detalle, parametros))
+
+
+@contextmanager
+def medir(categoria, nombre, detalle=None, parametros=None):
+    # Uso: with medir('grafico', 'estados') as m: ...; m['filas'] = n (opcional, igual 'bytes')
+    contadores = {'filas': None, 'bytes': None}
+    inicio = time.perf_counter()
+    try:
+        yield contadores
+    finally:
+        registrar(categoria, nombre, (time.perf_counter() - inicio) * 1000, contadores['filas'],
+                  contadores['bytes'], detalle, parametros)
+
+
+def _filas(resultado):
+    if isinstance(resultado, (list, tuple)) or hasattr(resultado, 'shape'):
+        return len(resultado)
+    return None
+
+
+def cronometrado(categoria, nombre=None):
+    # Decorador: mide cada llamada y cuenta las filas si devuelve una lista o un DataFrame
+    def decorador(funcion):
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with medir(categoria, nombre or funcion.__name__) as m:
+                resultado = funcion(*args, **kwargs)
+                m['filas'] = _filas(resultado)
+            return resultado
+        return envoltura
+    return decorador
+
+
+def iniciar_pagina(nombre):
+    # Las mediciones siguientes de este hilo se atribuyen a la página 'nombre'
+    _hilo.pagina = nombre
+    _hilo.inicio_pagina = time.perf_counter()
+
+
+def terminar_pagina(ruta_db):
+    registrar('pagina', _hilo.pagina, (time.perf_counter() - _hilo.inicio_pagina) * 1000)
+    _hilo.pagina = None
+    volcar(ruta_db)
+
+
+@contextmanager
+def atribuir_a(pagina):
+    # Atribuye a 'pagina' lo medido en el bloque (trabajos, descargas en otro hilo)
+    anterior = getattr(_hilo, 'pagina', None)
+    _hilo.pagina = pagina
+    try:
+        yield
+    finally:
+        _hilo.pagina = anterior
+
+
+@contextmanager
+def sin_medir():
+    # Para sondeos periódicos (p. ej. el panel de trabajos) que no deben contar como carga de página
+    anterior = getattr(_hilo, 'desactivado', False)
+    _hilo.desactivado = True
+    try:
+        yield
+    finally:
+        _hilo.desactivado = anterior
+
+
+# --- Conexión medida ---
+_SIN_MEDIR_SQL = ('PRAGMA', 'EXPLAIN')
+
+
+def _nombre_sql(sql):
+    texto = " ".join(sql.split())
+    return texto if len(texto) <= 70 else texto[:67] + "..."
+
+
+class CursorMedido(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        if sql.lstrip().upper().startswith(_SIN_MEDIR_SQL):
+            return super().execute(sql, parameters)
+        with medir('sql', _nombre_sql(sql), sql, parameters):
+            return super().execute(sql, parameters)
+
+
+class ConexionMedida(sqlite3.Connection):
+    # Se pasa como factory a sqlite3.connect (ver conexion.abrir_conexion)
+    def cursor(self, factory=CursorMedido):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+
+# --- Almacenamiento ---
+def _crear_tabla(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS metricas (
+            id INTEGER PRIMARY KEY,
+            momento REAL NOT NULL,
+            pagina TEXT,
+            categoria TEXT NOT NULL,
+            nombre TEXT,
+            duracion_ms REAL NOT NULL,
+            filas INTEGER,
+            bytes INTEGER,
+            detalle TEXT,
+            parametros TEXT
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_metricas_momento ON metricas (momento)')
+
+
+def volcar(ruta_db):
+    # Escribe en lote las mediciones pendientes de este proceso; devuelve cuántas
+    filas = []
+    while _pendientes:
+        try:
+            filas.append(_pendientes.popleft())
+        except IndexError:
+            break
+    if not filas:
+        return 0
+    conn = sqlite3.connect(ruta_metricas(ruta_db), timeout=5)
+    try:
+        _crear_tabla(conn)
+        conn.executemany('INSERT INTO metricas (momento, pagina, categoria, nombre, duracion_ms, filas, bytes, '
+                         'detalle, parametros) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', filas)
+        conn.execute('DELETE FROM metricas WHERE id <= (SELECT MAX(id) FROM metricas) - ?', (MAX_REGISTROS,))
+        conn.commit()
+    except sqlite3.OperationalError:
+        return 0 # Base de métricas ocupada: se descartan antes que frenar la página
+    finally:
+        conn.close()
+    return len(filas)
+
+
+# --- Lectura (panel de rendimiento) ---
+def leer_metricas(ruta_db, horas=24):
+    ruta = ruta_metricas(ruta_db)
+    if not os.path.exists(ruta):
+        return pd.DataFrame(columns=['momento', 'pagina', 'categoria', 'nombre', 'duracion_ms', 'filas', 'bytes',
+                                     'detalle', 'parametros'])
+    conn = sqlite3.connect(ruta, timeout=5)
+    try:
+        _crear_tabla(conn)
+        return pd.read_sql_query('SELECT momento, pagina, categoria, nombre, duracion_ms, filas, bytes, detalle, parametros '
+                                 'FROM metricas WHERE momento >= ?', conn, params=(time.time() - horas * 3600,))
+    finally:
+        conn.close()
+
+
+def latencias(metricas, por):
+    # p50/p95/máximo en ms por grupo, más número de mediciones y filas/bytes totales
+    if metricas.empty:
+        return pd.DataFrame()
+    grupos = metricas.groupby(por, dropna=False)
+    tabla = grupos['duracion_ms'].quantile([0.5, 0.95]).unstack()
+    tabla.columns = ['p50_ms', 'p95_ms']
+    tabla['max_ms'] = grupos['duracion_ms'].max()
+    tabla['n'] = grupos.size()
+    tabla['filas'] = grupos['filas'].sum(min_count=1)
+    tabla['bytes'] = grupos['bytes'].sum(min_count=1)
+    return tabla.sort_values('p95_ms', ascending=False).reset_index()
+
+
+def consultas_lentas(metricas, n=10):
+    # La ejecución más lenta de cada SQL distinto
+    sql = metricas[metricas['categoria'] == 'sql']
+    return (sql.sort_values('duracion_ms', ascending=False)
+               .drop_duplicates('detalle')
+               .head(n)
+               .reset_index(drop=True))
+
+
+def plan_consulta(conn, sql, parametros=None):
+    # EXPLAIN QUERY PLAN como texto indentado (no ejecuta la consulta)
+    params = json.loads(parametros) if parametros else ()
+    filas = conn.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()
+    nivel = {0: -1}
+    lineas = []
+    for id_, padre, _, detalle in filas:
+        nivel[id_] = nivel.get(padre, -1) + 1
+        lineas.append("  " * nivel[id_] + detalle)
+    return "\n".join(lineas)
@@ -0,0 +1,348 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+from crear_db import DB_PATH, UMBRAL_RIESGO_ALTO, crear_tablas
+from importador import configurar_pragmas
+
+# --- Modelo Predictivo de Riesgo Futuro (regresión logística con NumPy) ---
+# Sustituye la regla fija "población < 1000 y decreciendo". Se entrena fuera de la app
+# con las especies ya evaluadas: la etiqueta es si su estado es de amenaza (Vulnerable,
+# En Peligro, En Peligro Crítico) y las variables salen de especies y sus enlaces:
+# población (log10), tendencia, número de países y una columna por cada amenaza
+# frecuente del catálogo. Las especies con "Datos Insuficientes" o "No Evaluado" no
+# entrenan, pero sí se puntúan: su riesgo es la probabilidad de estar amenazadas.
+# El modelo se guarda en JSON junto a la base (<base>_modelo_riesgo.json); su versión es
+# un hash de los coeficientes. Cada especie guarda la probabilidad en 'riesgo' y la versión
+# que la calculó en 'riesgo_modelo', que un trigger borra cuando cambian sus variables: al
+# puntuar solo se recalculan las especies nuevas o modificadas y, si el modelo cambió, todas,
+# por tramos de id y con un producto de matrices por tramo.
+#   python modelo_riesgo.py entrenar   -> ajusta el modelo, lo guarda y puntúa
+#   python modelo_riesgo.py puntuar    -> puntúa las especies nuevas o desactualizadas
+#   python modelo_riesgo.py info       -> versión, métricas y coeficientes del modelo guardado
+
+ESTADOS_AMENAZADOS = ("En Peligro Crítico", "En Peligro", "Vulnerable")
+ESTADOS_SIN_ETIQUETA = ("Datos Insuficientes", "No Evaluado")
+TENDENCIAS = ("Decreciendo", "Estable", "Creciendo") # "Desconocida" es la referencia
+VARIABLES_BASE = ['log_poblacion', 'poblacion_desconocida'] + \
+    [f'tendencia_{t.lower()}' for t in TENDENCIAS] + ['log_paises']
+# Cambia si cambian las variables: los modelos guardados con otra versión hay que volver a entrenarlos
+VERSION_VARIABLES = 1
+
+# Amenazas con columna propia: las más frecuentes con al menos MIN_ESPECIES_AMENAZA especies
+MAX_AMENAZAS = 40
+MIN_ESPECIES_AMENAZA = 20
+MIN_FILAS_ENTRENAMIENTO = 50
+# Con más especies evaluadas se entrena con una muestra aleatoria de este tamaño
+MAX_FILAS_ENTRENAMIENTO = 200000
+FRACCION_VALIDACION = 0.2
+REGULARIZACION = 1.0
+TAMANO_LOTE_PUNTUAR = 50000
+
+_SQL_VARIABLES = ('SELECT e.id, e.estado_conservacion, e.poblacion_estimada, e.tendencia_poblacion, '
+                  '(SELECT COUNT(*) FROM especie_pais ep WHERE ep.especie_id = e.id) AS n_paises '
+                  'FROM especies e WHERE e.borrado IS NULL')
+
+
+def ruta_modelo(ruta_db=DB_PATH):
+    return os.path.splitext(ruta_db)[0] + '_modelo_riesgo.json'
+
+
+def categoria_riesgo(riesgo):
+    # "Alto" / "Bajo" / "Sin puntuar" por especie (misma regla que crear_db.RIESGO_SQL)
+    riesgo = pd.to_numeric(pd.Series(riesgo), errors='coerce').to_numpy(dtype='float64')
+    with np.errstate(invalid='ignore'):
+        return np.where(np.isnan(riesgo), "Sin puntuar",
+                        np.where(riesgo >= UMBRAL_RIESGO_ALTO, "Alto", "Bajo")).astype(object)
+
+
+# --- Variables ---
+def columnas_amenaza(conn, claves):
+    # amenaza_id -> posición de su columna entre las amenazas del modelo
+    posicion = {clave: j for j, clave in enumerate(claves)}
+    return {amenaza_id: posicion[clave] for amenaza_id, clave in conn.execute('SELECT id, clave FROM amenazas')
+            if clave in posicion}
+
+
+def _enlaces_amenaza(conn, ids):
+    # Pares (especie_id, amenaza_id) de las especies del lote, leídos por el índice de especie_amenaza
+    if len(ids) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    enlaces = np.fromiter(chain.from_iterable(conn.execute(
+        'SELECT especie_id, amenaza_id FROM especie_amenaza WHERE especie_id BETWEEN ? AND ?',
+        (int(ids.min()), int(ids.max())))), dtype=np.int64).reshape(-1, 2)
+    return enlaces[np.isin(enlaces[:, 0], ids)]
+
+
+def matriz_variables(lote, enlaces, columnas, n_amenazas):
+    # Una fila por especie del lote (columnas de _SQL_VARIABLES) con VARIABLES_BASE y después
+    # una columna 0/1 por cada una de las n_amenazas del modelo; 'enlaces' son pares
+    # (especie_id, amenaza_id) y 'columnas' el resultado de columnas_amenaza
+    ids = lote['id'].to_numpy(dtype=np.int64)
+    X = np.zeros((len(lote), len(VARIABLES_BASE) + n_amenazas))
+    poblacion = pd.to_numeric(lote['poblacion_estimada'], errors='coerce').to_numpy(dtype='float64')
+    conocida = ~np.isnan(poblacion)
+    X[conocida, 0] = np.log10(np.maximum(poblacion[conocida], 0) + 1)
+    X[:, 1] = ~conocida
+    tendencia = lote['tendencia_poblacion'].to_numpy(dtype=object)
+    for j, t in enumerate(TENDENCIAS):
+        X[:, 2 + j] = tendencia == t
+    X[:, 5] = np.log1p(lote['n_paises'].to_numpy(dtype='float64'))
+    if columnas and len(enlaces):
+        columna = np.array([columnas.get(a, -1) for a in enlaces[:, 1].tolist()], dtype=np.int64)
+        con_columna = columna >= 0
+        orden = np.argsort(ids)
+        fila = orden[np.searchsorted(ids, enlaces[con_columna, 0], sorter=orden)]
+        X[fila, len(VARIABLES_BASE) + columna[con_columna]] = 1
+    return X
+
+
+def variables_lote(conn, lote, columnas, n_amenazas):
+    return matriz_variables(lote, _enlaces_amenaza(conn, lote['id'].to_numpy(dtype=np.int64)), columnas, n_amenazas)
+
+
+# --- Ajuste ---
+def _sigmoide(z):
+    return np.exp(-np.logaddexp(0, -z))
+
+
+def ajustar_logistica(X, y, regularizacion=REGULARIZACION, iteraciones=50, tolerancia=1e-8):
+    # Newton-Raphson (mínimos cuadrados reponderados) con penalización L2 sobre los coeficientes,
+    # no sobre el intercepto. Con pocas decenas de variables converge en unas pocas iteraciones.
+    A = np.hstack([np.ones((len(X), 1)), X])
+    w = np.zeros(A.shape[1])
+    penalizacion = np.full(A.shape[1], float(regularizacion))
+    penalizacion[0] = 0
+    for _ in range(iteraciones):
+        p = _sigmoide(A @ w)
+        gradiente = A.T @ (p - y) + penalizacion * w
+        hessiana = (A.T * (p * (1 - p))) @ A + np.diag(penalizacion)
+        paso = np.linalg.lstsq(hessiana, gradiente, rcond=None)[0]
+        w -= paso
+        if np.max(np.abs(paso)) < tolerancia:
+            break
+    return w[0], w[1:]
+
+
+def _estandarizar(X):
+    media = X.mean(axis=0)
+    escala = X.std(axis=0)
+    escala[escala == 0] = 1.0
+    return media, escala
+
+
+def _auc(y, p):
+    # Área bajo la curva ROC por rangos (Mann-Whitney); None si solo hay una clase
+    positivos = int(y.sum())
+    negativos = len(y) - positivos
+    if positivos == 0 or negativos == 0:
+        return None
+    rangos = pd.Series(p).rank().to_numpy()
+    return float((rangos[y].sum() - positivos * (positivos + 1) / 2) / (positivos * negativos))
+
+
+def _metricas(y, p):
+    if len(y) == 0:
+        return {}
+    p = np.clip(p, 1e-12, 1 - 1e-12)
+    return {
+        'auc': _auc(y, p),
+        'log_loss': float(-np.mean(y * np.log(p) + (~y) * np.log(1 - p))),
+        'exactitud': float(np.mean((p >= UMBRAL_RIESGO_ALTO) == y)),
+    }
+
+
+def leer_entrenamiento(conn, claves, max_filas=MAX_FILAS_ENTRENAMIENTO, semilla=0, tamano_lote=100000):
+    # (X, y) de las especies evaluadas, por tramos de id; con más de max_filas se toma una
+    # muestra aleatoria de cada tramo, así que nunca se tiene la tabla entera en memoria
+    marcadores = ", ".join("?" for _ in ESTADOS_SIN_ETIQUETA)
+    condicion = f'e.estado_conservacion NOT IN ({marcadores})'
+    etiquetadas = conn.execute(f'SELECT COUNT(*) FROM especies e WHERE e.borrado IS NULL AND {condicion}',
+                               ESTADOS_SIN_ETIQUETA).fetchone()[0]
+    fraccion = min(1.0, max_filas / etiquetadas) if etiquetadas else 1.0
+    rng = np.random.default_rng(semilla)
+    columnas = columnas_amenaza(conn, claves)
+    partes_X, partes_y = [], []
+    desde_id = 0
+    while True:
+        lote = pd.read_sql_query(f'{_SQL_VARIABLES} AND e.id > ? AND {condicion} ORDER BY e.id LIMIT ?', conn,
+                                 params=(desde_id, *ESTADOS_SIN_ETIQUETA, tamano_lote))
+        if lote.empty:
+            break
+        desde_id = int(lote['id'].iloc[-1])
+        if fraccion < 1.0:
+            lote = lote[rng.random(len(lote)) < fraccion]
+        partes_X.append(variables_lote(conn, lote, columnas, len(claves)))
+        partes_y.append(lote['estado_conservacion'].isin(ESTADOS_AMENAZADOS).to_numpy())
+    X = np.vstack(partes_X) if partes_X else np.empty((0, len(VARIABLES_BASE) + len(claves)))
+    y = np.concatenate(partes_y) if partes_y else np.array([], dtype=bool)
+    return X, y
+
+
+def entrenar(conn, regularizacion=REGULARIZACION, max_filas=MAX_FILAS_ENTRENAMIENTO, semilla=0):
+    # Ajusta el modelo con las especies evaluadas y devuelve el dict que guarda guardar_modelo.
+    # Las métricas salen de un FRACCION_VALIDACION de las filas que no entra en ese ajuste;
+    # el modelo final se vuelve a ajustar con todas.
+    claves = [fila[0] for fila in conn.execute(
+        'SELECT a.clave FROM resumen_amenaza r JOIN amenazas a ON a.id = r.amenaza_id '
+        'WHERE r.n >= ? ORDER BY r.n DESC, a.clave LIMIT ?', (MIN_ESPECIES_AMENAZA, MAX_AMENAZAS))]
+    X, y = leer_entrenamiento(conn, claves, max_filas, semilla)
+    if len(y) < MIN_FILAS_ENTRENAMIENTO or y.all() or not y.any():
+        raise ValueError(f"Se necesitan al menos {MIN_FILAS_ENTRENAMIENTO} especies evaluadas, amenazadas y no "
+                         f"amenazadas, para entrenar el modelo (hay {len(y)}).")
+
+    validacion = np.random.default_rng(semilla + 1).random(len(y)) < FRACCION_VALIDACION
+    media, escala = _estandarizar(X[~validacion])
+    intercepto, coeficientes = ajustar_logistica((X[~validacion] - media) / escala, y[~validacion], regularizacion)
+    p = _sigmoide(((X[validacion] - media) / escala) @ coeficientes + intercepto)
+    metricas = _metricas(y[validacion], p)
+
+    media, escala = _estandarizar(X)
+    intercepto, coeficientes = ajustar_logistica((X - media) / escala, y, regularizacion)
+    modelo = {
+        'version_variables': VERSION_VARIABLES,
+        'variables': VARIABLES_BASE + [f'amenaza:{clave}' for clave in claves],
+        'amenazas': claves,
+        'media': media.tolist(),
+        'escala': escala.tolist(),
+        'coeficientes': coeficientes.tolist(),
+        'intercepto': float(intercepto),
+    }
+    modelo['version'] = hashlib.sha1(json.dumps(modelo, sort_keys=True).encode()).hexdigest()[:12]
+    modelo.update({
+        'entrenado': datetime.now().isoformat(timespec='seconds'),
+        'regularizacion': regularizacion,
+        'n_entrenamiento': int(len(y)),
+        'n_validacion': int(validacion.sum()),
+        'tasa_amenazadas': float(y.mean()),
+        'metricas': metricas,
+    })
+    return modelo
+
+
+# --- Persistencia ---
+def guardar_modelo(modelo, ruta):
+    # Se escribe aparte y se reemplaza de una vez: la app nunca lee un archivo a medias
+    temporal = f'{ruta}.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(modelo, f, ensure_ascii=False, indent=2)
+    os.replace(temporal, ruta)
+
+
+def cargar_modelo(ruta):
+    # None si no hay modelo entrenado o si se entrenó con otras variables
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, encoding='utf-8') as f:
+        modelo = json.load(f)
+    return modelo if modelo.get('version_variables') == VERSION_VARIABLES else None
+
+
+# --- Puntuación ---
+def puntuar(modelo, X):
+    # Probabilidad de cada fila: la estandarización se pliega en los pesos, así que el lote
+    # entero es un producto matriz-vector y una sigmoide
+    pesos = np.asarray(modelo['coeficientes']) / np.asarray(modelo['escala'])
+    sesgo = modelo['intercepto'] - float(np.dot(modelo['media'], pesos))
+    return _sigmoide(X @ pesos + sesgo)
+
+
+def _puntuar_lote(conn, modelo, lote, columnas):
+    if lote.empty:
+        return 0
+    riesgo = puntuar(modelo, variables_lote(conn, lote, columnas, len(modelo['amenazas'])))
+    conn.executemany('UPDATE especies SET riesgo = ?, riesgo_modelo = ? WHERE id = ?',
+                     zip(riesgo.tolist(), [modelo['version']] * len(lote), lote['id'].tolist()))
+    return len(lote)
+
+
+def puntuar_por_tramos(conn, modelo, desde_id=0, tamano_lote=TAMANO_LOTE_PUNTUAR):
+    # Generador: puntúa por tramos de id (> desde_id) las especies sin puntuar, desactualizadas
+    # o puntuadas por otra versión del modelo, y cede (último id, filas) tras cada tramo.
+    # No hace commit (ver clasificacion.reclasificar_por_tramos).
+    columnas = columnas_amenaza(conn, modelo['amenazas'])
+    while True:
+        lote = pd.read_sql_query(f'{_SQL_VARIABLES} AND e.id > ? AND e.riesgo_modelo IS NOT ? ORDER BY e.id LIMIT ?',
+                                 conn, params=(desde_id, modelo['version'], tamano_lote))
+        if lote.empty:
+            return
+        _puntuar_lote(conn, modelo, lote, columnas)
+        desde_id = int(lote['id'].iloc[-1])
+        yield desde_id, len(lote)
+
+
+def puntuar_especies(conn, modelo, tamano_lote=TAMANO_LOTE_PUNTUAR):
+    # Todas las pendientes de puntuar, en una sola transacción. Casi todo el tiempo se va en
+    # escribir las filas (y en el trigger de resumen_riesgo), no en el cálculo.
+    puntuadas = 0
+    configurar_pragmas(conn)
+    try:
+        for _, filas in puntuar_por_tramos(conn, modelo, 0, tamano_lote):
+            puntuadas += filas
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return puntuadas
+
+
+def puntuar_ids(conn, modelo, especie_ids, tamano_lote=500):
+    # Solo las especies indicadas; no hace commit (p. ej. tras guardar desde el formulario)
+    columnas = columnas_amenaza(conn, modelo['amenazas'])
+    ids = sorted(set(especie_ids))
+    puntuadas = 0
+    for i in range(0, len(ids), tamano_lote):
+        trozo = ids[i:i + tamano_lote]
+        marcadores = ", ".join("?" for _ in trozo)
+        lote = pd.read_sql_query(f'{_SQL_VARIABLES} AND e.id IN ({marcadores}) ORDER BY e.id', conn, params=trozo)
+        puntuadas += _puntuar_lote(conn, modelo, lote, columnas)
+    return puntuadas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Entrenamiento y puntuación del modelo de riesgo futuro.")
+    parser.add_argument("accion", choices=["entrenar", "puntuar", "info"])
+    parser.add_argument("--todas", action="store_true", help="Volver a puntuar todas las especies")
+    parser.add_argument("--regularizacion", type=float, default=REGULARIZACION, help="Penalización L2 del ajuste")
+    parser.add_argument("--db", default=DB_PATH, help=f"Base de datos SQLite (por defecto: {DB_PATH})")
+    parser.add_argument("--modelo", help="Archivo del modelo (por defecto: <base>_modelo_riesgo.json)")
+    args = parser.parse_args(argv)
+    ruta = args.modelo or ruta_modelo(args.db)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        crear_tablas(conn)
+        if args.accion == "entrenar":
+            modelo = entrenar(conn, args.regularizacion)
+            guardar_modelo(modelo, ruta)
+            print(f"Modelo {modelo['version']} entrenado con {modelo['n_entrenamiento']} especies "
+                  f"(AUC de validación: {modelo['metricas'].get('auc') or 0:.3f}); guardado en {ruta}.")
+        else:
+            modelo = cargar_modelo(ruta)
+            if modelo is None:
+                print(f"No hay un modelo entrenado en {ruta}: ejecuta 'python modelo_riesgo.py entrenar'.")
+                return 1
+        if args.accion == "info":
+            print(json.dumps({k: v for k, v in modelo.items() if k not in ('variables', 'amenazas', 'media', 'escala', 'coeficientes')},
+                             ensure_ascii=False, indent=2))
+            for nombre, coeficiente in sorted(zip(modelo['variables'], modelo['coeficientes']), key=lambda v: -abs(v[1])):
+                print(f"  {nombre:<40} {coeficiente:+.3f}")
+            return 0
+        if args.todas:
+            conn.execute('UPDATE especies SET riesgo_modelo = NULL')
+        print(f"{puntuar_especies(conn, modelo)} especies puntuadas con el modelo {modelo['version']}.")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+# --- Países normalizados (tablas 'paises' y 'especie_pais') ---
+# La columna 'pais' de especies se conserva como texto para mostrar, pero las
+# búsquedas y la lista de opciones del filtro usan estas tablas indexadas.
+
+
+def separar_paises(paises_str):
+    # "Perú, Ecuador ,Brasil" -> ["Perú", "Ecuador", "Brasil"] (sin vacíos ni repetidos)
+    if not paises_str or not isinstance(paises_str, str):
+        return []
+    vistos = []
+    for p in paises_str.split(','):
+        p = p.strip()
+        if p and p not in vistos:
+            vistos.append(p)
+    return vistos
+
+
+def vincular_paises_lote(conn, pares):
+    # pares: iterable de (especie_id, paises_str)
+    enlaces = [(especie_id, p) for especie_id, paises_str in pares for p in separar_paises(paises_str)]
+    if not enlaces:
+        return
+    conn.executemany('INSERT OR IGNORE INTO paises (nombre) VALUES (?)', {(p,) for _, p in enlaces})
+    conn.executemany('''
+        INSERT OR IGNORE INTO especie_pais (especie_id, pais_id)
+        SELECT ?, id FROM paises WHERE nombre = ?
+    ''', enlaces)
+
+
+def vincular_paises(conn, especie_id, paises_str):
+    vincular_paises_lote(conn, [(especie_id, paises_str)])
+
+
+def listar_paises(conn):
+    # Solo los países que tienen al menos una especie asociada
+    rows = conn.execute('''
+        SELECT nombre FROM paises p
+        WHERE EXISTS (SELECT 1 FROM especie_pais ep WHERE ep.pais_id = p.id)
+        ORDER BY nombre
+    ''').fetchall()
+    return [row[0] for row in rows]
+
+
+def reconstruir_paises(conn):
+    # Vuelve a poblar las tablas normalizadas a partir de la columna 'pais'
+    conn.execute('DELETE FROM especie_pais')
+    cursor = conn.execute("SELECT id, pais FROM especies WHERE pais IS NOT NULL AND pais <> '' AND borrado IS NULL")
+    while True:
+        lote = cursor.fetchmany(10000)
+        if not lote:
+            break
+        vincular_paises_lote(conn, lote)
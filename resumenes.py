@@ -0,0 +1,139 @@
+import argparse
+import sqlite3
+import sys
+
+import pandas as pd
+
+from amenazas import separar_amenazas, vincular_amenazas_lote
+from consultas import SQL_CONTEO_ESTADOS, SQL_CONTEO_RIESGO, SQL_CONTEO_TENDENCIA_ESTADO, SQL_TOP_AMENAZAS
+from crear_db import DB_PATH, RIESGO_SQL, crear_tablas
+from modelo_riesgo import categoria_riesgo
+
+# --- Agregados Precalculados para "Análisis y Predicción" ---
+# Las tablas resumen_* guardan los conteos que muestra el dashboard. Los triggers
+# de crear_db.py las mantienen al día en cada INSERT/UPDATE/DELETE, así que la
+# página lee unas pocas filas en lugar de recorrer y tokenizar toda la tabla.
+#   python resumenes.py reconstruir   -> regenera los resúmenes desde cero
+#   python resumenes.py verificar     -> compara los resúmenes con un recálculo completo
+
+TABLAS_RESUMEN = ['resumen_estado', 'resumen_tendencia_estado', 'resumen_amenaza', 'resumen_riesgo']
+
+
+# --- Lecturas para el dashboard ---
+def leer_conteo_estados(conn):
+    return pd.read_sql_query(SQL_CONTEO_ESTADOS, conn)
+
+
+def leer_conteo_tendencia_estado(conn):
+    return pd.read_sql_query(SQL_CONTEO_TENDENCIA_ESTADO, conn)
+
+
+def leer_top_amenazas(conn, limite=5):
+    return pd.read_sql_query(SQL_TOP_AMENAZAS, conn, params=(limite,))
+
+
+def leer_conteo_riesgo(conn):
+    return pd.read_sql_query(SQL_CONTEO_RIESGO, conn)
+
+
+# --- Recalculo completo (para reconstruir y verificar) ---
+def _recalcular(conn, tamano_lote=100000):
+    # Recorre especies por lotes y devuelve {tabla: {clave: n}} calculado en pandas
+    totales = {tabla: {} for tabla in TABLAS_RESUMEN}
+
+    def sumar(tabla, conteos):
+        destino = totales[tabla]
+        for clave, n in conteos.items():
+            destino[clave] = destino.get(clave, 0) + int(n)
+
+    lector = pd.read_sql_query('SELECT id, estado_conservacion, tendencia_poblacion, riesgo, amenazas '
+                               'FROM especies WHERE borrado IS NULL', conn, chunksize=tamano_lote)
+    for lote in lector:
+        sumar('resumen_estado', lote['estado_conservacion'].value_counts())
+        con_tendencia = lote.dropna(subset=['tendencia_poblacion'])
+        sumar('resumen_tendencia_estado', con_tendencia.groupby(['tendencia_poblacion', 'estado_conservacion']).size())
+        amenazas = lote['amenazas'].map(separar_amenazas).explode().dropna()
+        sumar('resumen_amenaza', amenazas.value_counts())
+        riesgo = pd.Series(categoria_riesgo(lote['riesgo']))
+        sumar('resumen_riesgo', riesgo.value_counts())
+    return totales
+
+
+def _leer_resumenes(conn):
+    return {
+        'resumen_estado': dict(conn.execute('SELECT estado, n FROM resumen_estado WHERE n > 0').fetchall()),
+        'resumen_tendencia_estado': {(t, e): n for t, e, n in conn.execute(
+            'SELECT tendencia, estado, n FROM resumen_tendencia_estado WHERE n > 0').fetchall()},
+        'resumen_amenaza': dict(conn.execute('SELECT a.clave, r.n FROM resumen_amenaza r '
+                                             'JOIN amenazas a ON a.id = r.amenaza_id WHERE r.n > 0').fetchall()),
+        'resumen_riesgo': dict(conn.execute('SELECT riesgo, n FROM resumen_riesgo WHERE n > 0').fetchall()),
+    }
+
+
+def reconstruir_resumenes(conn):
+    # Regenera especie_amenaza y todas las tablas resumen_* a partir de especies
+    for tabla in TABLAS_RESUMEN:
+        conn.execute(f'DELETE FROM {tabla}')
+    conn.execute('DELETE FROM especie_amenaza')
+
+    cursor = conn.execute('SELECT id, amenazas FROM especies WHERE borrado IS NULL')
+    while True:
+        lote = cursor.fetchmany(10000)
+        if not lote:
+            break
+        vincular_amenazas_lote(conn, lote)
+
+    conn.execute('INSERT INTO resumen_estado (estado, n) '
+                 'SELECT estado_conservacion, COUNT(*) FROM especies WHERE borrado IS NULL GROUP BY estado_conservacion')
+    conn.execute('INSERT INTO resumen_tendencia_estado (tendencia, estado, n) '
+                 'SELECT tendencia_poblacion, estado_conservacion, COUNT(*) FROM especies '
+                 'WHERE tendencia_poblacion IS NOT NULL AND borrado IS NULL GROUP BY tendencia_poblacion, estado_conservacion')
+    conn.execute(f'INSERT INTO resumen_riesgo (riesgo, n) '
+                 f'SELECT {RIESGO_SQL.format(t="especies")} AS riesgo, COUNT(*) FROM especies '
+                 f'WHERE borrado IS NULL GROUP BY riesgo')
+
+
+def verificar_resumenes(conn):
+    # Devuelve {tabla: [(clave, guardado, recalculado), ...]} solo con las diferencias
+    guardados = _leer_resumenes(conn)
+    esperados = _recalcular(conn)
+    diferencias = {}
+    for tabla in TABLAS_RESUMEN:
+        claves = set(guardados[tabla]) | set(esperados[tabla])
+        difs = [(k, guardados[tabla].get(k, 0), esperados[tabla].get(k, 0)) for k in claves
+                if guardados[tabla].get(k, 0) != esperados[tabla].get(k, 0)]
+        if difs:
+            diferencias[tabla] = sorted(difs, key=str)
+    return diferencias
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mantenimiento de los resúmenes precalculados del dashboard.")
+    parser.add_argument("accion", choices=["reconstruir", "verificar"])
+    parser.add_argument("--db", default=DB_PATH, help=f"Base de datos SQLite (por defecto: {DB_PATH})")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        crear_tablas(conn)
+        if args.accion == "reconstruir":
+            reconstruir_resumenes(conn)
+            conn.commit()
+            print("Resúmenes reconstruidos.")
+        else:
+            diferencias = verificar_resumenes(conn)
+            if not diferencias:
+                print("Los resúmenes coinciden con un recálculo completo.")
+                return 0
+            for tabla, difs in diferencias.items():
+                print(f"{tabla}: {len(difs)} diferencias")
+                for clave, guardado, esperado in difs[:20]:
+                    print(f"  {clave}: guardado={guardado} recalculado={esperado}")
+            return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
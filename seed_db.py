@@ -1,9 +1,12 @@
 import sqlite3
 import random
+from crear_db import crear_tablas
+from importador import guardar_especie
 from datetime import datetime
 
 def seed_database():
     conn = sqlite3.connect('animalitos.db')
+    crear_tablas(conn) # Aplica las migraciones pendientes (p. ej. la clave de nombre científico)
     c = conn.cursor()
 
     # --- Borrar datos existentes (opcional, si quieres empezar de cero cada vez) ---
@@ -80,30 +83,9 @@ def seed_database():
     # st.write(f"Insertando {len(especies_ejemplo)} especies de ejemplo...")
     
     for especie_data in especies_ejemplo:
-        # Preparamos los datos para la inserción
-        data_tuple = (
-            especie_data['nombre'],
-            especie_data['nombre_cientifico'],
-            especie_data['descripcion'],
-            especie_data['estado_conservacion'],
-            especie_data['estado_sugerido_uicn'],
-            especie_data['poblacion_estimada'],
-            especie_data['tendencia_poblacion'],
-            especie_data['amenazas'],
-            especie_data['pais']
-          
-        )
-        
-        # Insertar los datos en la tabla. Usamos IGNORE para no insertar si ya existe por PRIMARY KEY,
-        # pero aquí como no hay UNIQUE constraints en 'nombre', siempre insertará.
-        # Una mejor forma para evitar duplicados sería primero buscar el nombre.
-        c.execute('''
-            INSERT INTO especies (
-                nombre, nombre_cientifico, descripcion, estado_conservacion,
-                estado_sugerido_uicn, poblacion_estimada, tendencia_poblacion,
-                amenazas, pais
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', data_tuple)
+        # Se guarda por nombre científico normalizado (índice UNIQUE): volver a sembrar
+        # actualiza las especies de ejemplo en lugar de duplicarlas.
+        guardar_especie(conn, especie_data)
     
     conn.commit()
     conn.close()
@@ -0,0 +1,33 @@
+import sqlite3
+
+import pytest
+
+from crear_db import crear_tablas
+from importador import COLUMNAS_REQUERIDAS, guardar_especie
+
+
+@pytest.fixture
+def ruta_db(tmp_path):
+    return str(tmp_path / "prueba.db")
+
+
+@pytest.fixture
+def conn(ruta_db):
+    conn = sqlite3.connect(ruta_db)
+    crear_tablas(conn)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def agregar_especie(conn):
+    # Alta por el mismo camino que el formulario; devuelve el id
+    def agregar(nombre, nombre_cientifico=None, **datos):
+        fila = {columna: None for columna in COLUMNAS_REQUERIDAS}
+        fila.update(nombre=nombre, nombre_cientifico=nombre_cientifico, estado_conservacion="Vulnerable",
+                    criterios_uicn=None)
+        fila.update(datos)
+        especie_id = guardar_especie(conn, fila)[0]
+        conn.commit()
+        return especie_id
+    return agregar
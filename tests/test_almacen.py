@@ -0,0 +1,59 @@
+import pandas as pd
+
+from almacen import AlmacenEspecies
+from cambios import borrar_especie, purgar_borradas, restaurar_especie
+from resumenes import leer_conteo_estados, leer_conteo_riesgo, leer_conteo_tendencia_estado, leer_top_amenazas
+
+
+def _agregados(almacen, paises=None):
+    mascara = almacen.mascara_paises(paises) if paises else None
+    return (almacen.conteo_estados(mascara), almacen.conteo_tendencia_estado(mascara),
+            almacen.top_amenazas(5, mascara), almacen.conteo_riesgo(mascara))
+
+
+def _iguales(a, b):
+    for tabla_a, tabla_b in zip(_agregados(a), _agregados(b)):
+        pd.testing.assert_frame_equal(tabla_a, tabla_b)
+    for tabla_a, tabla_b in zip(_agregados(a, ["Chile"]), _agregados(b, ["Chile"])):
+        pd.testing.assert_frame_equal(tabla_a, tabla_b)
+
+
+def _especies(agregar_especie):
+    return [agregar_especie(f"Especie {i}", f"Genero especie{i}", pais="Chile" if i % 2 else "Perú, Chile",
+                            amenazas="Caza" if i % 3 else "Caza, Incendios", poblacion_estimada=str(100 * i),
+                            tendencia_poblacion="Decreciente" if i % 2 else "Estable",
+                            estado_conservacion="Vulnerable" if i % 4 else "En Peligro")
+            for i in range(1, 13)]
+
+
+def test_coincide_con_los_resumenes(conn, agregar_especie):
+    _especies(agregar_especie)
+    almacen = AlmacenEspecies.cargar(conn)
+    for tabla_almacen, tabla_resumen in zip(_agregados(almacen), (
+            leer_conteo_estados(conn), leer_conteo_tendencia_estado(conn), leer_top_amenazas(conn, 5),
+            leer_conteo_riesgo(conn))):
+        assert (tabla_almacen.astype(object).to_numpy() == tabla_resumen.astype(object).to_numpy()).all()
+
+
+def test_actualizar_equivale_a_recargar(conn, agregar_especie):
+    ids = _especies(agregar_especie)
+    almacen = AlmacenEspecies.cargar(conn)
+    agregar_especie("Nueva", "Genero nueva", pais="Argentina, Chile", amenazas="Pesca", poblacion_estimada="7")
+    agregar_especie("Especie 1", "Genero especie1", pais="Perú", estado_conservacion="Extinta")
+    borrar_especie(conn, ids[2])
+    borrar_especie(conn, ids[3])
+    restaurar_especie(conn, ids[3])
+    borrar_especie(conn, ids[4])
+    conn.execute("UPDATE especies SET riesgo = 0.9 WHERE id = ?", (ids[5],))
+    conn.commit()
+    purgar_borradas(conn, dias=-1)
+    conn.commit()
+
+    actualizado = almacen.actualizar(conn)
+    recargado = AlmacenEspecies.cargar(conn)
+    assert actualizado.version == recargado.version > almacen.version
+    assert actualizado.ids.tolist() == recargado.ids.tolist()
+    _iguales(actualizado, recargado)
+    # El almacén anterior no cambia (otra sesión puede estar leyéndolo)
+    assert len(almacen) == 12
+    assert actualizado.actualizar(conn) is actualizado
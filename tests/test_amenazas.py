@@ -0,0 +1,28 @@
+from amenazas import especies_con_grupo, grupos_amenazas, nombre_amenaza, separar_amenazas
+from resumenes import leer_top_amenazas
+
+
+def test_normaliza_sinonimos_acentos_y_repetidas():
+    assert separar_amenazas("Caza ilegal; CACERÍA,  Tala ilegal\nPérdida  de Hábitat, ,") == [
+        "caza furtiva", "deforestacion", "perdida de habitat"]
+    assert separar_amenazas(None) == []
+
+
+def test_grupos_del_clasificador():
+    assert grupos_amenazas("Caza de subsistencia, Deforestación") == {"caza", "deforestacion"}
+    assert grupos_amenazas("Minería, Contaminación") == set()
+
+
+def test_nombre_para_mostrar():
+    assert nombre_amenaza("deforestacion") == "Deforestación"
+    assert nombre_amenaza("ruido submarino", "ruido submarino") == "Ruido submarino"
+
+
+def test_enlaces_por_id_y_top_de_amenazas(conn, agregar_especie):
+    jaguar = agregar_especie("Jaguar", "Panthera onca", amenazas="Caza ilegal, Deforestación")
+    agregar_especie("Huemul", "Hippocamelus bisulcus", amenazas="caza furtiva, Ruido submarino")
+    agregar_especie("Cóndor andino", "Vultur gryphus", amenazas="Envenenamiento")
+    assert especies_con_grupo(conn, "deforestacion") == {jaguar}
+    top = leer_top_amenazas(conn, 2)
+    assert top.values.tolist()[0] == ["Caza furtiva", 2]
+    assert conn.execute('SELECT COUNT(*) FROM amenazas').fetchone()[0] == 4
@@ -0,0 +1,34 @@
+import pandas as pd
+
+from benchmark import comparar, ejecutar
+from generar_datos import escribir_csv, generar_especies, poblar_db
+from importador import COLUMNAS_REQUERIDAS, importar_csv
+
+
+def test_generador_reproducible_y_por_lotes():
+    lotes = list(generar_especies(250, semilla=7, tamano_lote=100))
+    assert [len(lote) for lote in lotes] == [100, 100, 50]
+    assert list(lotes[0].columns) == COLUMNAS_REQUERIDAS
+    assert pd.concat(lotes).equals(pd.concat(generar_especies(250, semilla=7, tamano_lote=100)))
+
+
+def test_los_datos_generados_se_importan_sin_rechazos(conn, tmp_path):
+    ruta = tmp_path / "especies.csv"
+    escribir_csv(str(ruta), 300, tamano_lote=128)
+    resultado = importar_csv(conn, str(ruta), tamano_lote=100)
+    assert resultado["rechazadas"] == 0
+    assert resultado["insertadas"] + resultado["actualizadas"] == 300
+
+
+def test_poblar_db(conn):
+    assert poblar_db(conn, 200, tamano_lote=64) == conn.execute('SELECT COUNT(*) FROM especies').fetchone()[0] > 0
+
+
+def test_ejecucion_completa_y_comparacion():
+    actual = ejecutar(300, repeticiones=1)
+    assert actual["meta"]["filas"] > 0
+    assert {"importacion_csv", "clasificacion.lote", "almacen.carga"} <= set(actual["resultados"])
+    # Contra sí misma no hay regresiones; contra una ejecución el doble de rápida, sí
+    assert comparar(actual, actual) == []
+    rapida = {"resultados": {"clasificacion.lote": {"total_s": actual["resultados"]["clasificacion.lote"]["total_s"] / 2}}}
+    assert [r[0] for r in comparar(actual, rapida)] == ["clasificacion.lote"]
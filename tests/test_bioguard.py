@@ -0,0 +1,50 @@
+import csv
+import json
+import subprocess
+import sys
+
+import bioguard
+from importador import COLUMNAS_REQUERIDAS
+
+_ESPECIES = [
+    ("Jaguar", "Panthera onca", "Felino", "Vulnerable", "", 170000, "Decreciendo", "Caza furtiva, Deforestación", "Brasil, Perú"),
+    ("Huemul", "Hippocamelus bisulcus", "Ciervo", "En Peligro", "", 1500, "Decreciendo", "Caza", "Chile, Argentina"),
+    ("Pudú", "Pudu puda", "Ciervo", "Vulnerable", "", 10000, "Estable", "Deforestación", "Chile"),
+]
+
+
+def _importar(ruta_db, tmp_path):
+    ruta = tmp_path / "especies.csv"
+    with open(ruta, "w", encoding="utf-8", newline="") as f:
+        escritor = csv.writer(f)
+        escritor.writerow(COLUMNAS_REQUERIDAS)
+        escritor.writerows(_ESPECIES)
+    assert bioguard.main(["--db", ruta_db, "importar", str(ruta)]) == 0
+
+
+def test_importar_y_exportar_con_filtros(ruta_db, tmp_path):
+    _importar(ruta_db, tmp_path)
+    salida = tmp_path / "vulnerables.csv"
+    assert bioguard.main(["--db", ruta_db, "exportar", "--estado", "Vulnerable", "--pais", "Chile",
+                          "--salida", str(salida)]) == 0
+    with open(salida, encoding="utf-8") as f:
+        filas = list(csv.DictReader(f))
+    assert [fila["nombre"] for fila in filas] == ["Pudú"]
+
+
+def test_analisis_en_json_y_resumenes(ruta_db, tmp_path, capsys):
+    _importar(ruta_db, tmp_path)
+    capsys.readouterr()
+    assert bioguard.main(["--db", ruta_db, "analisis", "--formato", "json", "--top", "1"]) == 0
+    informe = json.loads(capsys.readouterr().out)
+    assert [list(fila.values()) for fila in informe["estados"]] == [["Vulnerable", 2], ["En Peligro", 1]]
+    assert len(informe["top_amenazas"]) == 1
+    assert bioguard.main(["--db", ruta_db, "resumenes", "verificar"]) == 0
+
+
+def test_no_carga_streamlit_ni_plotly(ruta_db, tmp_path):
+    _importar(ruta_db, tmp_path)
+    codigo = ("import sys, bioguard; bioguard.main(['--db', sys.argv[1], 'analisis']); "
+              "print(sorted(m for m in ('streamlit', 'plotly') if m in sys.modules))")
+    salida = subprocess.run([sys.executable, "-c", codigo, ruta_db], capture_output=True, text=True, check=True)
+    assert salida.stdout.strip().splitlines()[-1] == "[]"
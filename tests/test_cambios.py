@@ -0,0 +1,81 @@
+from cambios import (borrar_especie, cambios_desde, compactar, especies_borradas, historial, restaurar_especie,
+                     version_actual)
+from conexion import abrir_conexion, iniciar_instantanea, terminar_instantanea
+from consultas import contar_especies
+
+
+def _sincronizar(conn, version=0, limite=2):
+    # Réplica de un consumidor: aplica página a página y devuelve {id: nombre} y las páginas leídas
+    replica, paginas = {}, 0
+    while True:
+        version, filas = cambios_desde(conn, version, limite)
+        if not filas:
+            return replica, paginas
+        paginas += 1
+        for fila in filas:
+            if fila['operacion'] == 'guardar':
+                replica[fila['id']] = fila['especie']['nombre']
+            else:
+                replica.pop(fila['id'], None)
+
+
+def _cambiar(conn, agregar_especie):
+    jaguar = agregar_especie("Jaguar", "Panthera onca")
+    huemul = agregar_especie("Huemul", "Hippocamelus bisulcus")
+    condor = agregar_especie("Cóndor", "Vultur gryphus")
+    conn.execute("UPDATE especies SET nombre = 'Cóndor andino' WHERE id = ?", (condor,))
+    borrar_especie(conn, huemul)
+    conn.commit()
+    return jaguar, huemul, condor
+
+
+def test_sincronizar_por_paginas(conn, agregar_especie):
+    jaguar, huemul, condor = _cambiar(conn, agregar_especie)
+    replica, paginas = _sincronizar(conn)
+    assert replica == {jaguar: "Jaguar", condor: "Cóndor andino"}
+    assert paginas > 1
+    # Sin cambios nuevos, la versión no avanza
+    assert cambios_desde(conn, version_actual(conn)) == (version_actual(conn), [])
+
+
+def test_borrado_logico_y_restauracion(conn, agregar_especie):
+    jaguar = agregar_especie("Jaguar", "Panthera onca", pais="Brasil, Perú")
+    assert borrar_especie(conn, jaguar) and not borrar_especie(conn, jaguar)
+    conn.commit()
+    assert contar_especies(conn, "", paises=["Perú"]) == 0
+    assert [fila[0] for fila in especies_borradas(conn)] == [jaguar]
+    version = version_actual(conn)
+
+    assert restaurar_especie(conn, jaguar) and not restaurar_especie(conn, jaguar)
+    conn.commit()
+    assert contar_especies(conn, "", paises=["Perú"]) == 1
+    assert [f['operacion'] for f in cambios_desde(conn, version)[1]] == ['guardar']
+    assert [fila[1] for fila in historial(conn, jaguar)] == ['insertar', 'borrar', 'restaurar']
+
+
+def test_compactar_no_cambia_la_sincronizacion(conn, agregar_especie):
+    _cambiar(conn, agregar_especie)
+    hasta = version_actual(conn)
+    agregar_especie("Pudú", "Pudu puda")
+    antes = {v: _sincronizar(conn, v)[0] for v in range(version_actual(conn) + 1)}
+    assert compactar(conn, hasta) > 0
+    conn.commit()
+    assert {v: _sincronizar(conn, v)[0] for v in antes} == antes
+
+
+def test_la_instantanea_no_ve_escrituras_concurrentes(ruta_db, conn, agregar_especie):
+    agregar_especie("Jaguar", "Panthera onca")
+    lectura = abrir_conexion(ruta_db)
+    escritura = abrir_conexion(ruta_db)
+    try:
+        version = iniciar_instantanea(lectura)
+        escritura.execute("INSERT INTO especies (nombre, estado_conservacion) VALUES ('Pudú', 'Vulnerable')")
+        escritura.commit()
+        assert lectura.execute('SELECT COUNT(*) FROM especies').fetchone()[0] == 1
+        assert cambios_desde(lectura, version) == (version, [])
+        terminar_instantanea(lectura)
+        assert lectura.execute('SELECT COUNT(*) FROM especies').fetchone()[0] == 2
+        assert version_actual(lectura) == version + 1
+    finally:
+        lectura.close()
+        escritura.close()
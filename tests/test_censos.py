@@ -0,0 +1,58 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from censos import actualizar_tendencias, calcular_tendencias, importar_censos, registrar_censos
+
+
+def _serie(especie_id, conteos, desde=2010):
+    return [(especie_id, f"{desde + i}-06-01", conteo, None) for i, conteo in enumerate(conteos)]
+
+
+def test_la_regresion_recupera_la_tasa_de_cambio():
+    # 12 censos anuales perdiendo un 10% por año; otra especie crece y otra tiene un solo censo
+    filas = (_serie(1, [round(10000 * 0.9 ** i) for i in range(12)])
+             + _serie(2, [100 + 10 * i for i in range(5)]) + _serie(3, [50]))
+    censos = pd.DataFrame(filas, columns=['especie_id', 'fecha', 'conteo', 'fuente'])
+    tendencias = calcular_tendencias(censos.sample(frac=1, random_state=1)).set_index('especie_id')
+
+    assert tendencias.loc[1, 'n_censos'] == 12
+    assert tendencias.loc[1, 'ultimo_conteo'] == round(10000 * 0.9 ** 11)
+    assert np.exp(tendencias.loc[1, 'pendiente_10']) == pytest.approx(0.9, abs=0.01)
+    assert tendencias.loc[1, 'declive_10'] == pytest.approx(1 - 0.9 ** 10, abs=0.02)
+    assert tendencias.loc[1, 'varianza_10'] < 1e-3
+    assert tendencias.loc[[1, 2], 'tendencia'].tolist() == ["Decreciendo", "Creciendo"]
+    assert tendencias.loc[3, ['pendiente_3', 'varianza_10', 'tendencia']].isna().all()
+
+
+def test_actualizar_solo_las_pendientes_y_reclasifica(conn, agregar_especie):
+    lince = agregar_especie("Lince ibérico", "Lynx pardinus", poblacion_estimada=5000, tendencia_poblacion="Estable")
+    oso = agregar_especie("Oso pardo", "Ursus arctos", poblacion_estimada=300, tendencia_poblacion="Estable")
+    registrar_censos(conn, _serie(lince, [5000, 3000, 1800, 1000]))
+    conn.commit()
+    assert actualizar_tendencias(conn) == 1
+    assert conn.execute('SELECT COUNT(*) FROM censos_pendientes').fetchone()[0] == 0
+
+    poblacion, tendencia, sugerido = conn.execute(
+        'SELECT poblacion_estimada, tendencia_poblacion, estado_sugerido_uicn FROM especies WHERE id = ?',
+        (lince,)).fetchone()
+    assert (poblacion, tendencia) == (1000, "Decreciendo")
+    assert sugerido.startswith("En Peligro Crítico")
+    # La especie sin censos no se toca
+    assert conn.execute('SELECT poblacion_estimada, tendencia_poblacion FROM especies WHERE id = ?',
+                        (oso,)).fetchone() == (300, "Estable")
+
+
+def test_importar_descarta_filas_invalidas_y_censos_es_de_solo_insercion(conn, agregar_especie, tmp_path):
+    lince = agregar_especie("Lince ibérico", "Lynx pardinus")
+    ruta = tmp_path / "censos.csv"
+    ruta.write_text("especie_id,fecha,conteo,fuente\n"
+                    f"{lince},2020-01-01,400,Censo nacional\n"
+                    f"{lince},2021-13-01,410,\n"
+                    f"{lince + 99},2021-01-01,410,\n"
+                    f"{lince},2022-01-01,-5,\n", encoding="utf-8")
+    assert importar_censos(conn, str(ruta)) == (1, 3)
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute('UPDATE censos SET conteo = 1')
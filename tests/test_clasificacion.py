@@ -0,0 +1,21 @@
+import numpy as np
+
+from benchmark import datos_aleatorios
+from clasificacion import clasificar_uicn, clasificar_uicn_lote
+
+
+def test_lote_igual_que_una_a_una():
+    df = datos_aleatorios(300)
+    columnas = [df['poblacion_estimada'], df['tendencia_poblacion'], df['amenazas'], df['pais']]
+    sugeridos, explicaciones = clasificar_uicn_lote(*columnas, explicar=True)
+    una_a_una = [clasificar_uicn(*fila, explicar=True) for fila in zip(*columnas)]
+    assert list(sugeridos) == [s for s, _ in una_a_una]
+    assert list(explicaciones) == [e for _, e in una_a_una]
+
+
+def test_valores_vacios_y_lote_vacio():
+    sugeridos = clasificar_uicn_lote([None, "abc", 30], ["Estable", None, "Decreciendo"], [None, "", "Caza"], ["", None, "Chile"])
+    assert list(sugeridos) == ["Datos Insuficientes (Sugerido)", "Datos Insuficientes (Sugerido)",
+                               "En Peligro Crítico (Sugerido)"]
+    assert len(clasificar_uicn_lote([], [], [], [])) == 0
+    assert isinstance(sugeridos, np.ndarray)
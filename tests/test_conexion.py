@@ -0,0 +1,50 @@
+import sqlite3
+
+import pytest
+
+import conexion
+from conexion import PoolConexiones, escribir
+
+
+def _insertar(conn, nombre):
+    conn.execute("INSERT INTO paises (nombre) VALUES (?)", (nombre,))
+    return nombre
+
+
+def test_el_pool_no_devuelve_transacciones_a_medias(ruta_db):
+    pool = PoolConexiones(ruta_db, tamano=1)
+    with pool.conexion() as conn:
+        _insertar(conn, "Chile")
+        assert conn.in_transaction
+    with pool.conexion() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM paises").fetchone()[0] == 0
+
+
+def test_escribir_reintenta_si_la_base_esta_ocupada(conn, monkeypatch):
+    monkeypatch.setattr(conexion.time, "sleep", lambda segundos: None)
+    intentos = []
+
+    def ocupada_la_primera_vez(conn, nombre):
+        intentos.append(1)
+        _insertar(conn, nombre)
+        if len(intentos) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return nombre
+    assert escribir(conn, ocupada_la_primera_vez, "Perú") == "Perú"
+    assert len(intentos) == 2
+    assert conn.execute("SELECT nombre FROM paises").fetchall() == [("Perú",)]
+
+
+def test_escribir_deshace_y_no_reintenta_otros_errores(conn):
+    intentos = []
+
+    def falla(conn):
+        intentos.append(1)
+        _insertar(conn, "Perú")
+        raise ValueError("dato inválido")
+    with pytest.raises(ValueError):
+        escribir(conn, falla)
+    assert len(intentos) == 1
+    assert not conn.in_transaction
+    assert conn.execute("SELECT COUNT(*) FROM paises").fetchone()[0] == 0
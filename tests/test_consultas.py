@@ -0,0 +1,68 @@
+import pytest
+
+from consultas import OPCIONES_ORDEN, contar_especies, obtener_pagina_especies
+
+
+@pytest.fixture
+def especies(agregar_especie):
+    datos = [("Jaguar", "En Peligro", 170000), ("Ajolote", "En Peligro Crítico", 1000),
+             ("Cóndor andino", "Vulnerable", 6700), ("Zorro culpeo", "Preocupación Menor", None),
+             ("Bufeo", "En Peligro", 3000)]
+    return {nombre: agregar_especie(nombre, f"Genero {nombre.lower()}", estado_conservacion=estado,
+                                    poblacion_estimada=poblacion)
+            for nombre, estado, poblacion in datos}
+
+
+def _nombres(conn, **filtros):
+    return [fila[1] for fila in obtener_pagina_especies(conn, items_por_pagina=10, **filtros)]
+
+
+def test_filtra_por_estado(conn, especies):
+    assert contar_especies(conn, estado="En Peligro") == 2
+    assert _nombres(conn, estado="En Peligro") == ["Bufeo", "Jaguar"]
+    assert contar_especies(conn) == 5
+
+
+@pytest.mark.parametrize("orden, esperado", [
+    (OPCIONES_ORDEN[0], ["Ajolote", "Bufeo", "Cóndor andino", "Jaguar", "Zorro culpeo"]),
+    (OPCIONES_ORDEN[1], ["Zorro culpeo", "Jaguar", "Cóndor andino", "Bufeo", "Ajolote"]),
+    (OPCIONES_ORDEN[2], ["Ajolote", "Jaguar", "Bufeo", "Cóndor andino", "Zorro culpeo"]),
+    (OPCIONES_ORDEN[3], ["Ajolote", "Bufeo", "Cóndor andino", "Jaguar", "Zorro culpeo"]),
+])
+def test_ordena_en_sql(conn, especies, orden, esperado):
+    assert _nombres(conn, sort_by=orden) == esperado
+
+
+def test_pagina_con_limit_y_offset(conn, especies):
+    paginas = [[fila[1] for fila in obtener_pagina_especies(conn, sort_by=OPCIONES_ORDEN[0], pagina=p, items_por_pagina=2)]
+               for p in (1, 2, 3, 4)]
+    assert paginas == [["Ajolote", "Bufeo"], ["Cóndor andino", "Jaguar"], ["Zorro culpeo"], []]
+
+
+def test_las_borradas_no_se_listan(conn, especies):
+    conn.execute("UPDATE especies SET borrado = '2026-01-01' WHERE id = ?", (especies["Jaguar"],))
+    assert contar_especies(conn, estado="En Peligro") == 1
+    assert "Jaguar" not in _nombres(conn)
+
+
+def test_busqueda_sin_acentos_y_por_prefijo(conn, agregar_especie):
+    agregar_especie("Cóndor andino", "Vultur gryphus", amenazas="Pérdida de hábitat")
+    agregar_especie("Jaguar", "Panthera onca", descripcion="Felino de la selva")
+    assert _nombres(conn, search_query="condor") == ["Cóndor andino"]
+    assert _nombres(conn, search_query="perdida habitat") == ["Cóndor andino"]
+    assert _nombres(conn, search_query="panth") == ["Jaguar"]
+    assert _nombres(conn, search_query='selva "OR" x*') == []
+
+
+def test_busqueda_ordena_por_relevancia_sin_orden_elegido(conn, agregar_especie):
+    agregar_especie("Ave del bosque", "Genero uno", descripcion="Vive cerca del jaguar")
+    agregar_especie("Jaguar", "Panthera onca")
+    assert _nombres(conn, search_query="jaguar") == ["Jaguar", "Ave del bosque"]
+    assert _nombres(conn, search_query="jaguar", sort_by=OPCIONES_ORDEN[0]) == ["Ave del bosque", "Jaguar"]
+
+
+def test_el_indice_sigue_a_las_actualizaciones(conn, agregar_especie):
+    agregar_especie("Jaguar", "Panthera onca", descripcion="Felino")
+    agregar_especie("Yaguareté", "Panthera onca", descripcion="Felino")
+    assert _nombres(conn, search_query="jaguar") == []
+    assert _nombres(conn, search_query="yaguarete") == ["Yaguareté"]
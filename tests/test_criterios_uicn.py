@@ -0,0 +1,56 @@
+import numpy as np
+
+from benchmark import _clasificar_regla_original, _reglas_coinciden, datos_aleatorios
+from clasificacion import clasificar_uicn_lote
+from criterios_uicn import SIN_DATOS, compilar_reglas, evaluar_criterios, probabilidad_extincion
+
+
+def test_coincide_con_la_regla_original_donde_debe():
+    df = datos_aleatorios(2000)
+    coinciden = _reglas_coinciden(df)
+    assert coinciden.sum() > 0
+    original = np.array([_clasificar_regla_original(*fila) for fila in df[
+        ['poblacion_estimada', 'tendencia_poblacion', 'amenazas']].itertuples(index=False)], dtype=object)
+    motor = clasificar_uicn_lote(df['poblacion_estimada'], df['tendencia_poblacion'], df['amenazas'], df['pais'])
+    assert (original[coinciden] == motor[coinciden]).all()
+
+
+def test_categoria_mas_grave_y_explicacion():
+    categorias, explicaciones = evaluar_criterios({
+        "poblacion": [100000, 200, np.nan, np.nan],
+        "declive_10": [0.85, np.nan, np.nan, 0.1],
+    })
+    assert categorias.tolist() == ["En Peligro Crítico", "En Peligro", SIN_DATOS, "Preocupación Menor"]
+    assert explicaciones[0] == "A2: reducción ≥ 80% en 10 años"
+    assert explicaciones[1] == "D: < 250 individuos maduros"
+    assert explicaciones[2].startswith("sin población")
+
+
+def test_b1_necesita_dos_de_a_b_c():
+    categorias, explicaciones = evaluar_criterios({
+        "poblacion": [100000] * 3,
+        "eoo_km2": [50, 50, 50],
+        "declive_continuo": [True, True, False],
+        "n_localidades": [20, 1, 1],
+    })
+    assert categorias.tolist() == ["Preocupación Menor", "En Peligro Crítico", "Preocupación Menor"]
+    assert explicaciones[1].startswith("B1ab:")
+
+
+def test_criterio_e_desde_la_serie_de_censos():
+    # Mitad por año desde 1.000 individuos: el umbral se alcanza en 10 años; estable y sin ruido, nunca
+    datos = {"poblacion": [1000, 100000], "pendiente_10": [np.log(0.5), 0.0], "varianza_10": [0.5, 1e-4]}
+    categorias, explicaciones = evaluar_criterios(datos)
+    assert categorias[0] == "En Peligro Crítico" and "E: probabilidad" in explicaciones[0]
+    assert categorias[1] == "Preocupación Menor"
+    assert np.isnan(probabilidad_extincion([0.5], [0.0], [0.1], 10)[0])
+
+
+def test_reglas_propias_y_variables_ausentes():
+    reglas = compilar_reglas([{"criterio": "X", "categoria": "Vulnerable", "texto": "prueba",
+                               "todas": [("inexistente", ">", 0)]},
+                              {"criterio": "Y", "categoria": "En Peligro", "texto": "pocos",
+                               "todas": [("poblacion", "<", 10)]}])
+    categorias, explicaciones = evaluar_criterios({"poblacion": [5, 500]}, reglas)
+    assert categorias.tolist() == ["En Peligro", "Preocupación Menor"]
+    assert explicaciones[0] == "Y: pocos"
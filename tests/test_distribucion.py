@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+
+from consultas import filtro_region
+from distribucion import actualizar_distribucion, area_envolvente, calcular_distribucion, registrar_rango
+
+
+def _especies_en(conn, region):
+    condicion, params = filtro_region(region)
+    return {fila[0] for fila in conn.execute(f'SELECT e.id FROM especies e WHERE {condicion}', params)}
+
+
+def _eoo(conn, especie_id):
+    return conn.execute('SELECT eoo_km2 FROM distribucion_especie WHERE especie_id = ?', (especie_id,)).fetchone()[0]
+
+
+def test_area_envolvente_descarta_puntos_interiores():
+    assert area_envolvente([0, 2, 2, 0, 1], [0, 0, 2, 2, 1]) == pytest.approx(4.0)
+
+
+def test_aoo_cuenta_celdas_de_2_km():
+    puntos = pd.DataFrame({'especie_id': [1, 1, 1], 'latitud': [0.001, 0.002, 5.0], 'longitud': [0.001, 0.002, 5.0]})
+    fila = calcular_distribucion(puntos).iloc[0]
+    assert fila['aoo_km2'] == 8.0
+    assert fila['n_ocurrencias'] == 3
+
+
+def test_eoo_no_cambia_al_cruzar_los_180(conn, agregar_especie):
+    cruza = agregar_especie("Cruza", "Especie cruza")
+    centrada = agregar_especie("Centrada", "Especie centrada")
+    registrar_rango(conn, cruza, [(170, -10), (-170, -10), (-170, 10), (170, 10)])
+    registrar_rango(conn, centrada, [(-10, -10), (10, -10), (10, 10), (-10, 10)])
+    actualizar_distribucion(conn)
+    assert _eoo(conn, cruza) == pytest.approx(_eoo(conn, centrada))
+    assert _eoo(conn, cruza) < 1e7 # La franja de 340° de ancho daría unos 84 millones de km²
+
+
+def test_region_y_rango_que_cruzan_los_180(conn, agregar_especie):
+    cruza = agregar_especie("Cruza", "Especie cruza")
+    otra = agregar_especie("Otra", "Especie otra")
+    registrar_rango(conn, cruza, [(170, -10), (-170, -10), (-170, 10), (170, 10)])
+    registrar_rango(conn, otra, [(-60, -10), (-50, -10), (-50, 0)])
+    conn.commit()
+    assert _especies_en(conn, (175, -5, -175, 5)) == {cruza}
+    assert _especies_en(conn, (-178, -5, -172, 5)) == {cruza}
+    # Antes el rectángulo iba de -170 a 170 y cubría estas dos regiones
+    assert _especies_en(conn, (0, -5, 10, 5)) == set()
+    assert _especies_en(conn, (-55, -5, -52, -1)) == {otra}
+
+
+def test_borrar_un_rango_lo_quita_del_indice(conn, agregar_especie):
+    cruza = agregar_especie("Cruza", "Especie cruza")
+    registrar_rango(conn, cruza, [(170, -10), (-170, -10), (-170, 10), (170, 10)])
+    conn.execute('DELETE FROM rangos WHERE especie_id = ?', (cruza,))
+    assert conn.execute('SELECT COUNT(*) FROM rangos_rtree').fetchone()[0] == 0
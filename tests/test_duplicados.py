@@ -0,0 +1,56 @@
+import pytest
+
+from duplicados import buscar_parecidas, detectar_por_tramos, normalizar_nombre, similitud
+from importador import guardar_especie
+
+
+def test_normalizar_nombre_quita_acentos_y_signos():
+    assert normalizar_nombre("  Rhéa  Américana (Linnaeus)") == "rhea americana linnaeus"
+    assert normalizar_nombre(" ¿? ") is None
+
+
+@pytest.mark.parametrize("existente, variante", [("Bufo bufo", "Búfo búfo"), ("Rhea americana", "Rhéa américana")])
+def test_variantes_con_acentos_son_candidatas(conn, agregar_especie, existente, variante):
+    especie_id = agregar_especie("Original", existente)
+    assert similitud(existente, variante) == 1.0
+    assert buscar_parecidas(conn, "Otra", variante) == [(especie_id, "Original", 1.0, "nombre científico parecido")]
+
+
+def test_casi_duplicado_con_acentos_al_guardar(conn, agregar_especie):
+    original = agregar_especie("Jaguar", "Panthera onca")
+    fila = {"nombre": "Yaguareté", "nombre_cientifico": "Pantéra onca", "estado_conservacion": "Vulnerable"}
+    especie_id, creada, parecidas = guardar_especie(conn, fila)
+    assert creada and especie_id != original
+    assert [p[0] for p in parecidas] == [original]
+
+
+def test_sin_nombre_cientifico_compara_el_nombre_comun(conn, agregar_especie):
+    original = agregar_especie("Ñandú común")
+    assert [p[0] for p in buscar_parecidas(conn, "Nandu comun", None)] == [original]
+    assert buscar_parecidas(conn, "Nandu comun", None)[0][3] == "nombre común parecido"
+
+
+def test_numeros_distintos_no_son_duplicado(conn, agregar_especie):
+    agregar_especie("Población", "Bufo bufo 101")
+    assert buscar_parecidas(conn, "Otra", "Bufo bufo 102") == []
+
+
+def test_borradas_no_son_candidatas(conn, agregar_especie):
+    especie_id = agregar_especie("Sapo", "Bufo bufo")
+    conn.execute("UPDATE especies SET borrado = '2026-01-01' WHERE id = ?", (especie_id,))
+    assert buscar_parecidas(conn, "Otra", "Búfo búfo") == []
+
+
+def test_cambiar_el_nombre_reindexa(conn, agregar_especie):
+    especie_id = agregar_especie("Sapo", "Bufo bufo")
+    agregar_especie("Sápo común", "Bufo bufo")
+    assert [p[0] for p in buscar_parecidas(conn, "Sapo comun", None)] == [especie_id]
+    assert buscar_parecidas(conn, "Sapo", None) == []
+
+
+def test_detectar_por_tramos_anota_los_pares(conn, agregar_especie):
+    primera = agregar_especie("Ñandú", "Rhea americana")
+    segunda = agregar_especie("Ñandú", "Rhéa américanus")
+    conn.execute('DELETE FROM posibles_duplicados')
+    assert list(detectar_por_tramos(conn)) == [(segunda, 1)]
+    assert conn.execute('SELECT especie_id, candidato_id FROM posibles_duplicados').fetchall() == [(segunda, primera)]
@@ -0,0 +1,56 @@
+import csv
+import io
+
+import pytest
+
+import exportador
+from consultas import COLUMNAS_EXPORTAR
+from exportador import archivo_exportacion, exportar_especies
+
+
+@pytest.fixture
+def especies(conn, agregar_especie):
+    agregar_especie("Jaguar", "Panthera onca", pais="Brasil", poblacion_estimada=170000)
+    agregar_especie("Ñandú", "Rhea americana", pais="Argentina", poblacion_estimada=None)
+    conn.execute("UPDATE especies SET riesgo = 0.25 WHERE nombre = 'Jaguar'")
+    conn.commit()
+
+
+def test_csv_con_las_columnas_exportadas(conn, especies):
+    with archivo_exportacion(conn, "csv", paises=["Brasil"]) as archivo:
+        filas = list(csv.DictReader(io.TextIOWrapper(archivo, encoding="utf-8", newline="")))
+    assert list(filas[0].keys()) == COLUMNAS_EXPORTAR
+    assert [(f["nombre"], f["poblacion_estimada"], f["riesgo"]) for f in filas] == [("Jaguar", "170000", "0.25")]
+
+
+def test_csv_por_lotes_mantiene_el_orden(conn, especies):
+    salida = io.StringIO(newline="")
+    assert exportar_especies(conn, salida, "csv", tamano_lote=1) == 2
+    assert [fila[1] for fila in csv.reader(io.StringIO(salida.getvalue()))] == ["nombre", "Jaguar", "Ñandú"]
+
+
+def test_si_la_exportacion_falla_se_cierra_el_archivo(conn, monkeypatch):
+    abiertos = []
+    temporal = exportador.tempfile.TemporaryFile
+
+    def registrar():
+        abiertos.append(temporal())
+        return abiertos[-1]
+    monkeypatch.setattr(exportador.tempfile, "TemporaryFile", registrar)
+    with pytest.raises(ValueError):
+        archivo_exportacion(conn, "csv", region=(1, 2))
+    assert abiertos and abiertos[0].closed
+
+
+def test_parquet_con_tipos(conn, especies, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    ruta = tmp_path / "especies.parquet"
+    assert exportar_especies(conn, str(ruta), "parquet", tamano_lote=1) == 2
+    tabla = pq.read_table(ruta)
+    assert tabla.column_names == COLUMNAS_EXPORTAR
+    assert str(tabla.schema.field("id").type) == "int64"
+    assert str(tabla.schema.field("riesgo").type) == "double"
+    assert tabla.column("nombre").to_pylist() == ["Jaguar", "Ñandú"]
+    assert tabla.column("riesgo").to_pylist() == [0.25, None]
+    with archivo_exportacion(conn, "parquet") as archivo:
+        assert pq.read_table(archivo).num_rows == 2
@@ -0,0 +1,60 @@
+import io
+
+import pytest
+
+import importador
+from importador import importar_csv
+
+CABECERA = "nombre,nombre_cientifico,descripcion,estado_conservacion,estado_sugerido_uicn,poblacion_estimada,tendencia_poblacion,amenazas,pais\n"
+
+
+def _csv(*filas):
+    return io.BytesIO((CABECERA + "".join(fila + "\n" for fila in filas)).encode("utf-8"))
+
+
+def test_importa_por_lotes_y_rechaza_filas_invalidas(conn, tmp_path):
+    ruta_rechazos = tmp_path / "rechazos.csv"
+    origen = _csv("Jaguar,Panthera onca,,En Peligro,,170000,Decreciente,Caza,\"Brasil, Perú\"",
+                  "Sin estado,Genero uno,,,,10,Estable,,Chile",
+                  "Negativa,Genero dos,,Vulnerable,,-5,Estable,,Chile",
+                  "Texto,Genero tres,,Vulnerable,,muchos,Estable,,Chile",
+                  "Cóndor,Vultur gryphus,,Vulnerable,,6700,,,Chile")
+    resultado = importar_csv(conn, origen, tamano_lote=2, ruta_rechazos=str(ruta_rechazos))
+    assert (resultado["insertadas"], resultado["rechazadas"]) == (2, 3)
+    assert resultado["motivos"] == {"falta estado_conservacion": 1, "poblacion_estimada negativa": 1,
+                                    "poblacion_estimada no numérica": 1}
+    assert ruta_rechazos.read_text(encoding="utf-8").count("\n") == 4
+    filas = conn.execute('SELECT nombre, poblacion_estimada, tendencia_poblacion, estado_sugerido_uicn, criterios_uicn '
+                         'FROM especies ORDER BY id').fetchall()
+    assert [f[:3] for f in filas] == [("Jaguar", 170000, "Decreciente"), ("Cóndor", 6700, "Desconocida")]
+    # Sin sugerencia en el archivo, la calcula el clasificador por lotes
+    assert all(f[3] for f in filas)
+
+
+def test_reimportar_actualiza_en_vez_de_duplicar(conn):
+    importar_csv(conn, _csv("Jaguar,Panthera onca,,En Peligro,,170000,Decreciente,,Brasil"))
+    resultado = importar_csv(conn, _csv("Yaguareté,PANTHERA  ONCA,,Vulnerable,,150000,Estable,,Argentina",
+                                        "Yaguar,Panthera onca,,Vulnerable,,140000,Estable,,Perú"))
+    assert (resultado["insertadas"], resultado["actualizadas"], resultado["rechazadas"]) == (0, 1, 1)
+    assert resultado["motivos"] == {"nombre científico repetido en el archivo": 1}
+    assert conn.execute('SELECT nombre, pais FROM especies').fetchall() == [("Yaguar", "Perú")]
+
+
+def test_un_error_no_deja_nada_a_medias(conn, monkeypatch):
+    insertar_lote = importador.insertar_lote
+    llamadas = []
+
+    def falla_en_el_segundo(*args):
+        llamadas.append(1)
+        if len(llamadas) == 2:
+            raise RuntimeError("disco lleno")
+        return insertar_lote(*args)
+    monkeypatch.setattr(importador, "insertar_lote", falla_en_el_segundo)
+    with pytest.raises(RuntimeError):
+        importar_csv(conn, _csv("Uno,Genero uno,,Vulnerable,,1,,,", "Dos,Genero dos,,Vulnerable,,2,,,"), tamano_lote=1)
+    assert conn.execute('SELECT COUNT(*) FROM especies').fetchone()[0] == 0
+
+
+def test_faltan_columnas(conn):
+    with pytest.raises(ValueError, match="estado_conservacion"):
+        importar_csv(conn, io.BytesIO("nombre,nombre_cientifico\nJaguar,Panthera onca\n".encode("utf-8")))
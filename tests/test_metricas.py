@@ -0,0 +1,62 @@
+import sqlite3
+
+import pytest
+
+import metricas
+from metricas import (ConexionMedida, consultas_lentas, cronometrado, iniciar_pagina, latencias, leer_metricas, medir,
+                      plan_consulta, sin_medir, terminar_pagina, volcar)
+
+
+@pytest.fixture(autouse=True)
+def sin_pendientes():
+    metricas._pendientes.clear()
+    yield
+    metricas._pendientes.clear()
+
+
+def test_pagina_con_consultas_medidas(ruta_db):
+    conn = sqlite3.connect(ruta_db, factory=ConexionMedida)
+    conn.execute('CREATE TABLE t (x INTEGER)')
+    conn.executemany('INSERT INTO t VALUES (?)', [(i,) for i in range(5)])
+    metricas._pendientes.clear()
+
+    @cronometrado('transformacion')
+    def pares():
+        return conn.execute('SELECT x FROM t WHERE x % ? = 0', (2,)).fetchall()
+
+    iniciar_pagina("Inicio")
+    assert len(pares()) == 3
+    with medir('grafico', 'estados') as m:
+        m['filas'] = 7
+    with sin_medir():
+        conn.execute('SELECT COUNT(*) FROM t')
+    conn.execute('PRAGMA user_version')
+    terminar_pagina(ruta_db)
+    conn.close()
+
+    leidas = leer_metricas(ruta_db)
+    assert sorted(leidas['categoria']) == ['grafico', 'pagina', 'sql', 'transformacion']
+    assert set(leidas['pagina']) == {"Inicio"}
+    assert leidas.set_index('categoria').loc['grafico', 'filas'] == 7
+    assert leidas.set_index('categoria').loc['transformacion', ['nombre', 'filas']].tolist() == ['pares', 3]
+
+    tabla = latencias(leidas, 'categoria')
+    assert set(tabla.columns) >= {'p50_ms', 'p95_ms', 'max_ms', 'n'} and tabla['n'].sum() == 4
+    lenta = consultas_lentas(leidas).iloc[0]
+    assert lenta['parametros'] == '[2]'
+    plan = plan_consulta(sqlite3.connect(ruta_db), lenta['detalle'], lenta['parametros'])
+    assert "SCAN t" in plan
+
+
+def test_la_tabla_es_circular(ruta_db, monkeypatch):
+    monkeypatch.setattr(metricas, "MAX_REGISTROS", 3)
+    for i in range(5):
+        metricas.registrar('sql', f"consulta {i}", 1.0)
+    assert volcar(ruta_db) == 5
+    assert volcar(ruta_db) == 0
+    assert leer_metricas(ruta_db)['nombre'].tolist() == ["consulta 2", "consulta 3", "consulta 4"]
+
+
+def test_sin_base_de_metricas(ruta_db):
+    assert leer_metricas(ruta_db).empty
+    assert latencias(leer_metricas(ruta_db), 'pagina').empty
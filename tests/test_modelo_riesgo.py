@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from generar_datos import poblar_db
+from modelo_riesgo import (_sigmoide, ajustar_logistica, cargar_modelo, entrenar, guardar_modelo, leer_entrenamiento,
+                           puntuar, puntuar_especies)
+
+
+def test_irls_recupera_los_coeficientes():
+    rng = np.random.default_rng(3)
+    X = rng.normal(size=(20000, 3))
+    verdaderos = np.array([1.5, -2.0, 0.0])
+    y = rng.random(len(X)) < _sigmoide(0.5 + X @ verdaderos)
+    intercepto, coeficientes = ajustar_logistica(X, y, regularizacion=0)
+    assert intercepto == pytest.approx(0.5, abs=0.1)
+    assert coeficientes == pytest.approx(verdaderos, abs=0.1)
+    # La penalización L2 encoge los coeficientes pero no el intercepto
+    _, penalizados = ajustar_logistica(X, y, regularizacion=5000)
+    assert np.all(np.abs(penalizados) < np.abs(coeficientes) + 1e-9)
+
+
+def test_puntuar_pliega_la_estandarizacion():
+    modelo = {'coeficientes': [0.7, -1.2], 'media': [10.0, 0.5], 'escala': [2.0, 0.25], 'intercepto': -0.3}
+    X = np.array([[12.0, 0.0], [8.0, 1.0]])
+    esperado = _sigmoide(((X - modelo['media']) / modelo['escala']) @ modelo['coeficientes'] + modelo['intercepto'])
+    assert puntuar(modelo, X) == pytest.approx(esperado)
+
+
+def test_entrenar_guardar_y_puntuar_solo_lo_pendiente(conn, tmp_path):
+    # Los estados generados son casi aleatorios: se planta una señal conocida (amenazada si decrece)
+    poblar_db(conn, 1500, semilla=5)
+    conn.execute("UPDATE especies SET estado_conservacion = CASE WHEN tendencia_poblacion = 'Decreciendo' "
+                 "THEN 'Vulnerable' ELSE 'Preocupación Menor' END")
+    conn.commit()
+    modelo = entrenar(conn)
+    X, y = leer_entrenamiento(conn, modelo['amenazas'])
+    assert len(modelo['coeficientes']) == X.shape[1] == len(modelo['variables'])
+    assert modelo['metricas']['auc'] > 0.95
+    pesos = dict(zip(modelo['variables'], modelo['coeficientes']))
+    assert max(pesos, key=lambda v: abs(pesos[v])) == 'tendencia_decreciendo' and pesos['tendencia_decreciendo'] > 0
+
+    ruta = str(tmp_path / "modelo.json")
+    guardar_modelo(modelo, ruta)
+    assert cargar_modelo(ruta)['version'] == modelo['version']
+    total = conn.execute('SELECT COUNT(*) FROM especies').fetchone()[0]
+    assert puntuar_especies(conn, modelo) == total
+    assert puntuar_especies(conn, modelo) == 0
+    conn.execute("UPDATE especies SET tendencia_poblacion = 'Creciendo' WHERE id = 1")
+    conn.commit()
+    assert puntuar_especies(conn, modelo) == 1
+
+
+def test_sin_suficientes_especies_no_entrena(conn, agregar_especie):
+    agregar_especie("Jaguar", "Panthera onca")
+    with pytest.raises(ValueError):
+        entrenar(conn)
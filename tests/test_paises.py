@@ -0,0 +1,31 @@
+from consultas import contar_especies
+from paises import listar_paises, reconstruir_paises, separar_paises
+
+
+def test_separar_paises_sin_vacios_ni_repetidos():
+    assert separar_paises("Perú, Ecuador ,,Perú, Brasil ") == ["Perú", "Ecuador", "Brasil"]
+    assert separar_paises(None) == []
+
+
+def test_filtro_por_paises_usa_las_tablas_normalizadas(conn, agregar_especie):
+    agregar_especie("Jaguar", "Panthera onca", pais="Brasil, Perú")
+    agregar_especie("Cóndor andino", "Vultur gryphus", pais="Perú, Chile")
+    agregar_especie("Huemul", "Hippocamelus bisulcus", pais="Chile")
+    assert listar_paises(conn) == ["Brasil", "Chile", "Perú"]
+    assert contar_especies(conn, paises=["Perú"]) == 2
+    assert contar_especies(conn, paises=["Brasil", "Chile"]) == 3
+    # "Per" no es "Perú": el filtro compara el país completo, no una subcadena del texto
+    assert contar_especies(conn, paises=["Per"]) == 0
+
+
+def test_actualizar_una_especie_vuelve_a_enlazar_sus_paises(conn, agregar_especie):
+    agregar_especie("Jaguar", "Panthera onca", pais="Brasil, Perú")
+    agregar_especie("Jaguar", "Panthera onca", pais="México")
+    assert listar_paises(conn) == ["México"]
+
+
+def test_reconstruir_desde_la_columna_de_texto(conn, agregar_especie):
+    agregar_especie("Jaguar", "Panthera onca", pais="Brasil, Perú")
+    conn.execute('DELETE FROM especie_pais')
+    reconstruir_paises(conn)
+    assert contar_especies(conn, paises=["Perú"]) == 1
@@ -0,0 +1,84 @@
+import sqlite3
+
+from cambios import borrar_especie, purgar_borradas, restaurar_especie
+from consultas import contar_especies
+from crear_db import VERSION_ESQUEMA, crear_tablas
+from duplicados import buscar_parecidas
+from resumenes import leer_conteo_estados, reconstruir_resumenes, verificar_resumenes
+
+# Tabla especies de la primera versión de la app (sin user_version ni tablas auxiliares)
+_ESQUEMA_INICIAL = '''
+    CREATE TABLE especies (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nombre TEXT NOT NULL,
+        nombre_cientifico TEXT,
+        descripcion TEXT,
+        estado_conservacion TEXT NOT NULL,
+        estado_sugerido_uicn TEXT,
+        poblacion_estimada INTEGER,
+        tendencia_poblacion TEXT,
+        amenazas TEXT,
+        pais TEXT
+    )
+'''
+
+
+def test_los_triggers_mantienen_los_resumenes(conn, agregar_especie):
+    jaguar = agregar_especie("Jaguar", "Panthera onca", amenazas="Caza furtiva, Deforestación",
+                             tendencia_poblacion="Decreciendo", poblacion_estimada=170000)
+    condor = agregar_especie("Cóndor andino", "Vultur gryphus", amenazas="Envenenamiento", estado_conservacion="En Peligro")
+    huemul = agregar_especie("Huemul", "Hippocamelus bisulcus", amenazas="Caza", tendencia_poblacion="Estable")
+    agregar_especie("Jaguar", "Panthera onca", amenazas="Deforestación", estado_conservacion="En Peligro")
+    conn.execute("UPDATE especies SET riesgo = 0.8 WHERE id = ?", (condor,))
+    borrar_especie(conn, huemul)
+    borrar_especie(conn, condor)
+    restaurar_especie(conn, condor)
+    conn.commit()
+    assert verificar_resumenes(conn) == {}
+    assert leer_conteo_estados(conn).values.tolist() == [["En Peligro", 2]]
+
+    purgar_borradas(conn, dias=-1)
+    conn.execute('DELETE FROM especies WHERE id = ?', (jaguar,))
+    conn.commit()
+    assert verificar_resumenes(conn) == {}
+
+
+def test_verificar_detecta_y_reconstruir_corrige(conn, agregar_especie):
+    agregar_especie("Jaguar", "Panthera onca", amenazas="Caza")
+    conn.execute("UPDATE resumen_estado SET n = n + 5")
+    assert list(verificar_resumenes(conn)) == ['resumen_estado']
+    reconstruir_resumenes(conn)
+    assert verificar_resumenes(conn) == {}
+
+
+def test_migrar_desde_la_version_inicial(ruta_db):
+    conn = sqlite3.connect(ruta_db)
+    conn.execute(_ESQUEMA_INICIAL)
+    conn.executemany('INSERT INTO especies (nombre, nombre_cientifico, descripcion, estado_conservacion, '
+                     'poblacion_estimada, tendencia_poblacion, amenazas, pais) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', [
+                         ("Jaguar", "Panthera onca", "Felino", "Casi Amenazado", 170000, "Decreciendo",
+                          "caza furtiva, deforestación", "Brasil, Perú"),
+                         ("Yaguareté", "Panthera  onca", "", "Vulnerable", 200, "Decreciendo", "caza", "Argentina"),
+                         ("Ñandú", "Rhéa américana", "", "Casi Amenazado", 5000, "Estable", "", "Argentina"),
+                     ])
+    conn.commit()
+
+    crear_tablas(conn)
+    conn.commit()
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == VERSION_ESQUEMA
+    assert verificar_resumenes(conn) == {}
+    assert contar_especies(conn, "felino", paises=["Perú"]) == 1
+    # Duplicado exacto ya existente: la más antigua conserva la clave y la otra queda anotada
+    assert conn.execute('SELECT especie_id, candidato_id FROM posibles_duplicados').fetchall() == [(2, 1)]
+    assert [p[0] for p in buscar_parecidas(conn, "Ñandú", "Rhea americana")] == [3]
+    assert conn.execute("SELECT COUNT(*) FROM cambios WHERE operacion = 'insertar'").fetchone()[0] == 3
+
+    # El esquema migrado tiene las mismas columnas que uno nuevo, y migrar otra vez no hace nada
+    nueva = sqlite3.connect(":memory:")
+    crear_tablas(nueva)
+    columnas = [fila[1] for fila in nueva.execute('PRAGMA table_info(especies)')]
+    assert sorted(fila[1] for fila in conn.execute('PRAGMA table_info(especies)')) == sorted(columnas)
+    version = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'cambios'").fetchone()
+    crear_tablas(conn)
+    assert conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'cambios'").fetchone() == version
+    conn.close()
@@ -0,0 +1,76 @@
+import csv
+
+import importador
+import trabajos
+from cambios import borrar_especie
+from importador import COLUMNAS_REQUERIDAS
+from trabajos import encolar, ejecutar_trabajo, reanudar, tomar_siguiente
+
+
+def _csv(ruta, filas):
+    with open(ruta, "w", newline="", encoding="utf-8") as f:
+        escritor = csv.writer(f)
+        escritor.writerow(COLUMNAS_REQUERIDAS)
+        for nombre, poblacion in filas:
+            escritor.writerow([nombre, f"Genero {nombre.lower()}", "", "Vulnerable", "", poblacion, "Estable", "", "Chile"])
+
+
+def _estado(conn, trabajo_id):
+    return conn.execute('SELECT estado, resultado FROM trabajos WHERE id = ?', (trabajo_id,)).fetchone()
+
+
+def test_reanudar_importacion_recorta_los_rechazos(conn, ruta_db, tmp_path, monkeypatch):
+    # Tres lotes de dos filas, cada uno con una rechazada; el tercero escribe sus rechazos y falla
+    ruta, ruta_rechazos = tmp_path / "especies.csv", tmp_path / "rechazos.csv"
+    _csv(ruta, [("Uno", "10"), ("Dos", "-5"), ("Tres", "30"), ("Cuatro", "-5"), ("Cinco", "50"), ("Seis", "-5")])
+    procesar_lote = importador.procesar_lote
+    llamadas = []
+
+    def falla_en_el_tercero(*args, **kwargs):
+        procesar_lote(*args, **kwargs)
+        llamadas.append(1)
+        if len(llamadas) == 3:
+            raise RuntimeError("proceso interrumpido")
+    monkeypatch.setattr(importador, "procesar_lote", falla_en_el_tercero)
+
+    trabajo_id = encolar(conn, 'importar_csv', {'ruta': str(ruta), 'tamano_lote': 2, 'ruta_rechazos': str(ruta_rechazos)})
+    ejecutar_trabajo(ruta_db, tomar_siguiente(conn))
+    assert _estado(conn, trabajo_id)[0] == 'fallido'
+    assert conn.execute('SELECT COUNT(*) FROM especies').fetchone()[0] == 2
+
+    monkeypatch.setattr(importador, "procesar_lote", procesar_lote)
+    reanudar(conn, trabajo_id)
+    ejecutar_trabajo(ruta_db, tomar_siguiente(conn))
+    assert _estado(conn, trabajo_id)[0] == 'completado'
+    assert [fila[0] for fila in conn.execute('SELECT nombre FROM especies ORDER BY id')] == ["Uno", "Tres", "Cinco"]
+    with open(ruta_rechazos, newline="", encoding="utf-8") as f:
+        rechazadas = [fila['nombre'] for fila in csv.DictReader(f)]
+    assert rechazadas == ["Dos", "Cuatro", "Seis"]
+
+
+def test_importacion_subida_se_borra_al_completar(conn, ruta_db, tmp_path):
+    ruta = tmp_path / "subida.csv"
+    _csv(ruta, [("Uno", "10")])
+    trabajo_id = encolar(conn, 'importar_csv', {'ruta': str(ruta), 'borrar_al_terminar': True})
+    ejecutar_trabajo(ruta_db, tomar_siguiente(conn))
+    assert _estado(conn, trabajo_id)[0] == 'completado'
+    assert not ruta.exists()
+
+
+def test_reclasificar_cuenta_solo_las_especies_activas(conn, ruta_db, agregar_especie, monkeypatch):
+    ids = [agregar_especie(f"Especie {i}", f"Genero especie{i}", poblacion_estimada=100) for i in range(4)]
+    borrar_especie(conn, ids[0])
+    borrar_especie(conn, ids[1])
+    conn.commit()
+    progresos = []
+    avance = trabajos.Contexto.avance
+
+    def registrar(self, progreso, mensaje, punto_control=None):
+        progresos.append(progreso)
+        return avance(self, progreso, mensaje, punto_control)
+    monkeypatch.setattr(trabajos.Contexto, "avance", registrar)
+
+    trabajo_id = encolar(conn, 'reclasificar', {'tamano_lote': 1})
+    ejecutar_trabajo(ruta_db, tomar_siguiente(conn))
+    assert _estado(conn, trabajo_id)[0] == 'completado'
+    assert progresos == [0.5, 1.0]
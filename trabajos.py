@@ -0,0 +1,389 @@
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from conexion import abrir_conexion
+from crear_db import DB_PATH, crear_tablas
+from metricas import atribuir_a, medir, volcar
+
+# --- Cola de Trabajos en Segundo Plano ---
+# Las tareas largas (importar un CSV, buscar casi duplicados, reclasificar todo, reconstruir
+# resúmenes, entrenar y aplicar el modelo de riesgo) se
+# guardan como filas de la tabla 'trabajos' y las ejecuta un proceso trabajador con
+# un pool de procesos, así la sesión de Streamlit no queda bloqueada y el trabajo
+# sobrevive a una recarga del navegador. Cada lote se confirma junto con su punto de
+# control (número de lote o último id), de modo que un trabajo interrumpido o
+# fallido se reanuda donde quedó. La interfaz consulta 'trabajos' para el progreso.
+#   python trabajos.py trabajador                     -> ejecuta la cola indefinidamente
+#   python trabajos.py encolar importar_csv --csv inventario.csv --duplicados
+#   python trabajos.py listar
+#   python trabajos.py cancelar 12
+
+ESTADOS_ACTIVOS = ('pendiente', 'en_curso')
+ESTADOS_REANUDABLES = ('fallido', 'cancelado')
+# Un trabajo 'en_curso' sin latidos durante este tiempo se da por interrumpido y vuelve a la cola.
+# El latido lo renueva un hilo cada INTERVALO_LATIDO segundos mientras el proceso vive, por
+# mucho que tarde un lote.
+SEGUNDOS_SIN_LATIDO = 600
+INTERVALO_LATIDO = 30
+DIR_CARGAS = 'cargas' # CSV subidos desde la app, para que el trabajador los lea
+# SQLite admite un solo escritor a la vez y los trabajos se ejecutan en orden de llegada
+# (reclasificar tras importar), así que por defecto hay un proceso; con más, los
+# trabajos corren a la vez y se turnan la escritura lote a lote.
+PROCESOS = 1
+
+
+class TrabajoCancelado(Exception):
+    pass
+
+
+# --- Cola ---
+def encolar(conn, tipo, parametros=None):
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de trabajo desconocido: {tipo}")
+    cursor = conn.execute('INSERT INTO trabajos (tipo, parametros) VALUES (?, ?)',
+                          (tipo, json.dumps(parametros or {}, ensure_ascii=False)))
+    conn.commit()
+    return cursor.lastrowid
+
+
+def listar_trabajos(conn, limite=20):
+    return conn.execute('SELECT id, tipo, estado, progreso, mensaje, resultado, creado, iniciado, terminado '
+                        'FROM trabajos ORDER BY id DESC LIMIT ?', (limite,)).fetchall()
+
+
+def hay_trabajos_activos(conn):
+    return conn.execute("SELECT 1 FROM trabajos WHERE estado IN ('pendiente', 'en_curso') LIMIT 1").fetchone() is not None
+
+
+def cancelar(conn, trabajo_id):
+    # Un trabajo pendiente se cancela al momento; uno en curso, al terminar su lote actual
+    conn.execute("UPDATE trabajos SET estado = 'cancelado', terminado = datetime('now'), mensaje = 'Cancelado antes de empezar' "
+                 "WHERE id = ? AND estado = 'pendiente'", (trabajo_id,))
+    conn.execute("UPDATE trabajos SET cancelar = 1 WHERE id = ? AND estado = 'en_curso'", (trabajo_id,))
+    conn.commit()
+
+
+def reanudar(conn, trabajo_id):
+    # Vuelve a la cola desde su último punto de control
+    conn.execute(f"UPDATE trabajos SET estado = 'pendiente', cancelar = 0, terminado = NULL "
+                 f"WHERE id = ? AND estado IN {ESTADOS_REANUDABLES}", (trabajo_id,))
+    conn.commit()
+
+
+def tomar_siguiente(conn):
+    fila = conn.execute('''
+        UPDATE trabajos SET estado = 'en_curso', latido = datetime('now'), iniciado = COALESCE(iniciado, datetime('now'))
+        WHERE id = (SELECT id FROM trabajos WHERE estado = 'pendiente' ORDER BY id LIMIT 1)
+        RETURNING id
+    ''').fetchone()
+    conn.commit()
+    return fila[0] if fila else None
+
+
+def recuperar_interrumpidos(conn, segundos=SEGUNDOS_SIN_LATIDO):
+    conn.execute("UPDATE trabajos SET estado = 'pendiente' WHERE estado = 'en_curso' "
+                 "AND latido < datetime('now', ?)", (f'-{segundos} seconds',))
+    conn.commit()
+
+
+# --- Ejecución de un trabajo ---
+class Contexto:
+    # Lo que ve la función de un trabajo: parámetros, punto de control y resultado acumulado
+    def __init__(self, conn, fila, ruta_db=DB_PATH):
+        self.conn = conn
+        self.ruta_db = ruta_db
+        self.id = fila['id']
+        self.parametros = json.loads(fila['parametros'])
+        self.punto_control = fila['punto_control']
+        self.resultado = json.loads(fila['resultado']) if fila['resultado'] else None
+
+    def avance(self, progreso, mensaje, punto_control=None):
+        # Confirma lo escrito desde el último avance junto con el punto de control: si el
+        # proceso muere, al reanudar no se repite ni se pierde ningún lote
+        if punto_control is not None:
+            self.punto_control = punto_control
+        self.conn.execute("UPDATE trabajos SET progreso = ?, mensaje = ?, punto_control = ?, resultado = ?, "
+                          "latido = datetime('now') WHERE id = ?",
+                          (progreso, mensaje, self.punto_control,
+                           json.dumps(self.resultado, ensure_ascii=False) if self.resultado is not None else None,
+                           self.id))
+        self.conn.commit()
+        if self.conn.execute('SELECT cancelar FROM trabajos WHERE id = ?', (self.id,)).fetchone()[0]:
+            raise TrabajoCancelado()
+
+
+def _terminar(conn, trabajo_id, estado, mensaje, progreso=None):
+    conn.execute("UPDATE trabajos SET estado = ?, mensaje = ?, progreso = COALESCE(?, progreso), "
+                 "terminado = datetime('now') WHERE id = ?", (estado, mensaje, progreso, trabajo_id))
+    conn.commit()
+
+
+def _latir(ruta_db, trabajo_id, parar):
+    # Hilo que renueva el latido con su propia conexión hasta que 'parar' se activa. Mientras el
+    # trabajo tiene el bloqueo de escritura (escribiendo un lote) el latido no puede escribirse,
+    # pero recuperar_interrumpidos tampoco: se reintenta en la siguiente vuelta.
+    conn = abrir_conexion(ruta_db, timeout=1)
+    try:
+        while not parar.wait(INTERVALO_LATIDO):
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.execute("UPDATE trabajos SET latido = datetime('now') WHERE id = ? AND estado = 'en_curso'",
+                             (trabajo_id,))
+                conn.commit()
+            except sqlite3.OperationalError:
+                if conn.in_transaction:
+                    conn.rollback()
+    finally:
+        conn.close()
+
+
+def ejecutar_trabajo(ruta_db, trabajo_id):
+    # Punto de entrada en cada proceso del pool: abre su propia conexión
+    conn = abrir_conexion(ruta_db)
+    parar = threading.Event()
+    latidos = threading.Thread(target=_latir, args=(ruta_db, trabajo_id, parar), daemon=True)
+    latidos.start()
+    try:
+        fila = conn.execute('SELECT * FROM trabajos WHERE id = ?', (trabajo_id,)).fetchone()
+        contexto = Contexto(conn, fila, ruta_db)
+        try:
+            with atribuir_a(f"Trabajo: {fila['tipo']}"), medir('trabajo', fila['tipo']):
+                mensaje = TIPOS[fila['tipo']](conn, contexto)
+        except TrabajoCancelado:
+            conn.rollback()
+            _terminar(conn, trabajo_id, "cancelado", "Cancelado; al reanudarlo sigue desde el último lote confirmado")
+        except Exception as e:
+            conn.rollback()
+            _terminar(conn, trabajo_id, 'fallido', f"{type(e).__name__}: {e}")
+        else:
+            _terminar(conn, trabajo_id, 'completado', mensaje, 1.0)
+            ruta = contexto.parametros.get('ruta')
+            if contexto.parametros.get('borrar_al_terminar') and ruta and os.path.exists(ruta):
+                os.remove(ruta) # Copia subida desde la app: ya completado, no hará falta para reanudar
+    finally:
+        parar.set()
+        latidos.join()
+        conn.close()
+        volcar(ruta_db)
+
+
+# --- Tipos de trabajo ---
+# Cada función recibe (conn, contexto), llama a contexto.avance() tras cada lote y
+# devuelve el mensaje final.
+def _trabajo_importar_csv(conn, contexto):
+    from importador import TAMANO_LOTE, configurar_pragmas, leer_lotes, procesar_lote, resultado_vacio
+    ruta = contexto.parametros['ruta']
+    tamano_lote = contexto.parametros.get('tamano_lote', TAMANO_LOTE)
+    ruta_rechazos = contexto.parametros.get('ruta_rechazos')
+    contexto.resultado = contexto.resultado or resultado_vacio()
+    tamano = os.path.getsize(ruta) or 1
+    if ruta_rechazos and os.path.exists(ruta_rechazos):
+        # Las filas rechazadas se escriben antes de confirmar su lote: se recorta lo que escribieron
+        # lotes no confirmados (al reanudar se vuelven a procesar) o una ejecución anterior
+        with open(ruta_rechazos, 'r+b') as f:
+            f.truncate(contexto.resultado.get('bytes_rechazos', 0))
+    configurar_pragmas(conn)
+    with open(ruta, 'rb') as origen:
+        # El punto de control es el número de lotes ya confirmados: se leen y se saltan
+        for numero, lote in enumerate(leer_lotes(origen, tamano_lote)):
+            if numero < contexto.punto_control:
+                continue
+            procesar_lote(conn, lote, contexto.resultado, ruta_rechazos)
+            if contexto.resultado['ruta_rechazos']:
+                contexto.resultado['bytes_rechazos'] = os.path.getsize(ruta_rechazos)
+            filas = contexto.resultado['insertadas'] + contexto.resultado['actualizadas'] + contexto.resultado['rechazadas']
+            contexto.avance(min(origen.tell() / tamano, 1.0), f"{filas} filas procesadas", numero + 1)
+    # Las especies nuevas o modificadas se puntúan con el modelo de riesgo, si hay uno entrenado
+    from modelo_riesgo import cargar_modelo, puntuar_especies, ruta_modelo
+    modelo = cargar_modelo(ruta_modelo(contexto.ruta_db))
+    if modelo is not None:
+        contexto.avance(1.0, "Puntuando el riesgo de las especies importadas")
+        puntuar_especies(conn, modelo)
+    r = contexto.resultado
+    mensaje = f"Se insertaron {r['insertadas']} especies, se actualizaron {r['actualizadas']} y se omitieron {r['rechazadas']}."
+    if contexto.parametros.get('detectar_duplicados') and r['insertadas']:
+        # La búsqueda de casi duplicados va en su propio trabajo, detrás de este en la cola
+        siguiente = encolar(conn, 'detectar_duplicados', {'desde_id': r['desde_id']})
+        mensaje += f" Los posibles duplicados se buscan en el trabajo #{siguiente}."
+    return mensaje
+
+
+def _trabajo_detectar_duplicados(conn, contexto):
+    # Compara las especies con id > desde_id con las anteriores. El punto de control es el
+    # último id revisado; el progreso, su posición en el tramo de ids.
+    from duplicados import detectar_por_tramos
+    desde_id = contexto.parametros.get('desde_id', 0)
+    ultimo = conn.execute('SELECT IFNULL(MAX(id), 0) FROM especies').fetchone()[0]
+    contexto.resultado = contexto.resultado or {"posibles_duplicados": 0}
+    for ultimo_id, marcadas in detectar_por_tramos(conn, max(desde_id, contexto.punto_control),
+                                                   contexto.parametros.get('tamano_lote', 5000)):
+        contexto.resultado['posibles_duplicados'] += marcadas
+        contexto.avance(min((ultimo_id - desde_id) / max(ultimo - desde_id, 1), 1.0),
+                        f"Revisadas las especies hasta el id {ultimo_id}", ultimo_id)
+    return f"{contexto.resultado['posibles_duplicados']} especies se parecen a otras ya registradas."
+
+
+def _trabajo_reclasificar(conn, contexto):
+    from clasificacion import reclasificar_por_tramos
+    total = conn.execute('SELECT COUNT(*) FROM especies WHERE borrado IS NULL').fetchone()[0] or 1
+    contexto.resultado = contexto.resultado or {"reclasificadas": 0}
+    # El punto de control es el último id reclasificado
+    for ultimo_id, filas in reclasificar_por_tramos(conn, contexto.punto_control,
+                                                    contexto.parametros.get('tamano_lote', 50000)):
+        contexto.resultado['reclasificadas'] += filas
+        hechas = contexto.resultado['reclasificadas']
+        contexto.avance(min(hechas / total, 1.0), f"{hechas} especies reclasificadas", ultimo_id)
+    return f"Se reclasificaron {contexto.resultado['reclasificadas']} especies."
+
+
+def _trabajo_reconstruir_resumenes(conn, contexto):
+    # Una sola transacción: los resúmenes no pueden quedar a medio reconstruir
+    from resumenes import reconstruir_resumenes
+    reconstruir_resumenes(conn)
+    contexto.avance(1.0, "Resúmenes reconstruidos")
+    return "Resúmenes reconstruidos."
+
+
+def _puntuar_riesgo(conn, contexto, modelo):
+    # El punto de control es el último id revisado; el progreso, su posición entre los ids
+    from modelo_riesgo import TAMANO_LOTE_PUNTUAR, puntuar_por_tramos
+    ultimo = conn.execute('SELECT IFNULL(MAX(id), 0) FROM especies').fetchone()[0] or 1
+    contexto.resultado = contexto.resultado or {}
+    contexto.resultado.setdefault('puntuadas', 0)
+    for ultimo_id, filas in puntuar_por_tramos(conn, modelo, contexto.punto_control,
+                                               contexto.parametros.get('tamano_lote', TAMANO_LOTE_PUNTUAR)):
+        contexto.resultado['puntuadas'] += filas
+        contexto.avance(min(ultimo_id / ultimo, 1.0), f"{contexto.resultado['puntuadas']} especies puntuadas", ultimo_id)
+    return f"Se puntuaron {contexto.resultado['puntuadas']} especies con el modelo {modelo['version']}."
+
+
+def _trabajo_entrenar_riesgo(conn, contexto):
+    # Entrena y guarda el modelo y después puntúa. Al reanudar no se vuelve a entrenar:
+    # se sigue puntuando con el modelo ya guardado.
+    from modelo_riesgo import cargar_modelo, entrenar, guardar_modelo, ruta_modelo
+    ruta = ruta_modelo(contexto.ruta_db)
+    modelo = cargar_modelo(ruta) if contexto.punto_control else None
+    if modelo is None:
+        modelo = entrenar(conn)
+        guardar_modelo(modelo, ruta)
+        contexto.resultado = {'version': modelo['version'], 'auc': modelo['metricas'].get('auc')}
+        contexto.avance(0.0, f"Modelo {modelo['version']} entrenado con {modelo['n_entrenamiento']} especies; puntuando")
+    return _puntuar_riesgo(conn, contexto, modelo)
+
+
+def _trabajo_puntuar_riesgo(conn, contexto):
+    from modelo_riesgo import cargar_modelo, ruta_modelo
+    modelo = cargar_modelo(ruta_modelo(contexto.ruta_db))
+    if modelo is None:
+        raise ValueError("No hay un modelo de riesgo entrenado: encola antes 'entrenar_riesgo'.")
+    return _puntuar_riesgo(conn, contexto, modelo)
+
+
+TIPOS = {
+    'importar_csv': _trabajo_importar_csv,
+    'detectar_duplicados': _trabajo_detectar_duplicados,
+    'reclasificar': _trabajo_reclasificar,
+    'reconstruir_resumenes': _trabajo_reconstruir_resumenes,
+    'entrenar_riesgo': _trabajo_entrenar_riesgo,
+    'puntuar_riesgo': _trabajo_puntuar_riesgo,
+}
+
+
+# --- Proceso trabajador ---
+def ejecutar_trabajador(ruta_db=DB_PATH, procesos=PROCESOS, intervalo=1.0, hasta_vaciar=False):
+    # Reparte los trabajos pendientes entre 'procesos' procesos; con hasta_vaciar termina
+    # cuando no queda nada pendiente ni en curso
+    conn = abrir_conexion(ruta_db)
+    crear_tablas(conn)
+    en_curso = set()
+    try:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            while True:
+                en_curso = {f for f in en_curso if not f.done()}
+                try:
+                    recuperar_interrumpidos(conn)
+                    while len(en_curso) < procesos:
+                        trabajo_id = tomar_siguiente(conn)
+                        if trabajo_id is None:
+                            break
+                        en_curso.add(pool.submit(ejecutar_trabajo, ruta_db, trabajo_id))
+                except sqlite3.OperationalError:
+                    conn.rollback() # Base ocupada por un trabajo largo: se reintenta en la próxima vuelta
+                if hasta_vaciar and not en_curso and not hay_trabajos_activos(conn):
+                    return
+                time.sleep(intervalo)
+    finally:
+        conn.close()
+
+
+def lanzar_trabajador(ruta_db=DB_PATH, procesos=PROCESOS):
+    # Inicia 'python trabajos.py trabajador --hasta-vaciar' como proceso independiente
+    ruta_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'trabajos.py')
+    return subprocess.Popen([sys.executable, ruta_script, '--db', ruta_db, 'trabajador',
+                             '--procesos', str(procesos), '--hasta-vaciar'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cola de trabajos en segundo plano de BioGuard.")
+    parser.add_argument("--db", default=DB_PATH, help=f"Base de datos SQLite (por defecto: {DB_PATH})")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    p = subparsers.add_parser("trabajador", help="Ejecuta los trabajos de la cola")
+    p.add_argument("--procesos", type=int, default=PROCESOS, help="Trabajos simultáneos")
+    p.add_argument("--hasta-vaciar", action="store_true", help="Terminar cuando la cola quede vacía")
+
+    p = subparsers.add_parser("encolar", help="Añade un trabajo a la cola")
+    p.add_argument("tipo", choices=list(TIPOS))
+    p.add_argument("--csv", help="CSV a importar (importar_csv)")
+    p.add_argument("--rechazos", help="Archivo CSV donde guardar las filas rechazadas (importar_csv)")
+    p.add_argument("--duplicados", action="store_true",
+                   help="Al terminar, encolar la búsqueda de casi duplicados entre las especies nuevas (importar_csv)")
+    p.add_argument("--desde-id", type=int, default=0, help="Revisar las especies con id mayor (detectar_duplicados)")
+    p.add_argument("--lote", type=int, help="Filas por lote")
+
+    subparsers.add_parser("listar", help="Muestra los últimos trabajos")
+    for nombre, ayuda in [("cancelar", "Cancela un trabajo"), ("reanudar", "Reanuda un trabajo fallido o cancelado")]:
+        subparsers.add_parser(nombre, help=ayuda).add_argument("id", type=int)
+    args = parser.parse_args(argv)
+
+    if args.comando == "trabajador":
+        ejecutar_trabajador(args.db, args.procesos, hasta_vaciar=args.hasta_vaciar)
+        return 0
+
+    conn = abrir_conexion(args.db)
+    try:
+        crear_tablas(conn)
+        if args.comando == "encolar":
+            parametros = {}
+            if args.tipo == "importar_csv":
+                if not args.csv:
+                    parser.error("importar_csv necesita --csv")
+                parametros = {"ruta": os.path.abspath(args.csv),
+                              "ruta_rechazos": os.path.abspath(args.rechazos) if args.rechazos else None,
+                              "detectar_duplicados": args.duplicados}
+            elif args.tipo == "detectar_duplicados":
+                parametros = {"desde_id": args.desde_id}
+            if args.lote:
+                parametros["tamano_lote"] = args.lote
+            print(f"Trabajo {encolar(conn, args.tipo, parametros)} encolado.")
+        elif args.comando == "listar":
+            for t in listar_trabajos(conn):
+                print(f"{t['id']:>5}  {t['tipo']:<22} {t['estado']:<10} {t['progreso']:>5.0%}  {t['mensaje'] or ''}")
+        elif args.comando == "cancelar":
+            cancelar(conn, args.id)
+        else:
+            reanudar(conn, args.id)
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())